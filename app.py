@@ -1,23 +1,324 @@
-import gradio as gr
-from utils.api_config import setup_gemini_api
-from utils.audio_utils import generate_audio
-from utils.file_utils import generate_video
-from utils.srt_utils import transcribe_audio
-from static.custom_css import custom_css
+import os
+import threading
+import uuid
+from utils.startup_profiler import profile_step, print_startup_report
+
+# Les moteurs lourds (whisper, diffusers, elevenlabs, google.generativeai) sont importés
+# paresseusement par les modules utilitaires : seuls l'interface et les utilitaires sont chargés ici
+with profile_step("gradio"):
+    import gradio as gr
+with profile_step("utils"):
+    from utils.api_config import setup_gemini_api
+    from utils.audio_utils import alignment_path, audio_state, clean_script, generate_audio_incremental, generate_audio_stream
+    from utils.file_utils import generate_video, list_images
+    from utils.caption_compositor import CaptionStyle
+    from utils.filtergraph import overlay_settings
+    from utils.srt_utils import align_script_to_audio, language_code_from_label, stream_subtitles, warmup_whisper_model
+    from utils.subtitle_writer import SUBTITLE_FORMATS, SUBTITLE_FORMAT_LABELS, subtitle_format_from_label
+    from utils.project_store import get_project_store, hash_file, hash_text, project_choices, project_name
+    from utils.scheduler import get_scheduler_stats, scheduled
+    from utils import metrics
+    from static.custom_css import custom_css
 
 # Import des onglets
-from tabs.ideas_tab import create_ideas_tab
-from tabs.legend_tab import create_legend_tab
-from tabs.style_tab import create_style_tab
-from tabs.images_tab import create_images_tab
-from tabs.overlay_tab import create_overlay_tab
-from tabs.hooks_tab import create_hooks_tab
+with profile_step("tabs"):
+    from tabs.ideas_tab import create_ideas_tab
+    from tabs.legend_tab import create_legend_tab
+    from tabs.style_tab import create_style_tab
+    from tabs.images_tab import create_images_tab, diffusion_service, get_image_generator
+    from tabs.overlay_tab import create_overlay_tab
+    from tabs.hooks_tab import create_hooks_tab
 
-def main():
+# Préchargement du pipeline de diffusion après le lancement (SHORTGEN_WARMUP_DIFFUSION=0 pour désactiver)
+WARMUP_DIFFUSION = os.getenv("SHORTGEN_WARMUP_DIFFUSION", "1") == "1"
+
+def warmup_engines():
+    """
+    Initialise les moteurs lourds en arrière-plan une fois l'interface servie.
+    """
+    with profile_step("whisper", category="warmup"):
+        warmup_whisper_model()
+    with profile_step("gemini", category="warmup"):
+        setup_gemini_api()
+    with profile_step("elevenlabs", category="warmup"):
+        import elevenlabs.client  # noqa: F401
+    with profile_step("templates", category="warmup"):
+        from utils.template_index import get_template_index
+        from utils.video_renderer import RATIO_RESOLUTIONS
+        get_template_index().build(RATIO_RESOLUTIONS.values())
+    if WARMUP_DIFFUSION:
+        with profile_step("diffusers", category="warmup"):
+            try:
+                get_image_generator()
+            except Exception as e:
+                print(f"Échec du préchargement du pipeline de diffusion : {e}")
+    print_startup_report("Profil de démarrage (après préchargement)")
+
+def register_metrics_collectors():
+    """
+    Exporte l'état des files d'attente, des caches et des pools sous forme de jauges Prometheus.
+    """
+    from utils.asr_pool import get_asr_pool_stats
+    from utils.audio_utils import get_tts_cache_stats
+    from utils.srt_utils import get_model_registry_stats
+
+    metrics.register_collector("shortgen_scheduler", get_scheduler_stats, label="resource",
+                               help_text="État des classes de ressources du planificateur")
+    metrics.register_collector("shortgen_whisper_registry", get_model_registry_stats,
+                               help_text="Registre des modèles Whisper")
+    metrics.register_collector("shortgen_tts_cache", get_tts_cache_stats, help_text="Cache des fichiers audio TTS")
+    metrics.register_collector("shortgen_asr_pool", get_asr_pool_stats, help_text="Pool de processus de transcription")
+    metrics.register_collector("shortgen_diffusion", diffusion_service.stats, help_text="Service de génération d'images")
+
+@scheduled("network")
+def process_audio_generation(script, voix, parallel=False, langue=None, previous=None, subtitle_format="SRT", project=None):
+    """
+    Génère la voix off d'un script (événement du bouton « Générer l'audio », première étape).
+
+    Après une modification du script, seules les phrases modifiées sont resynthétisées. Une voix off
+    dont le texte et la voix n'ont pas changé est reprise du magasin de projets (utils/project_store.py).
+    Les sous-titres sont produits ensuite par process_subtitles_generation, dans la classe « asr » :
+    l'emplacement réseau est libéré dès la fin de la synthèse.
+
+    Args:
+        script (str): Script à lire.
+        voix (str): Nom de la voix ElevenLabs.
+        parallel (bool, optional): Synthèse parallèle par phrase. Par défaut: False.
+        langue (str, optional): Libellé de la langue de l'onglet Idées.
+        previous (dict, optional): État de l'audio généré précédemment (gr.State).
+        subtitle_format (str, optional): Libellé du format des sous-titres ("SRT", "WebVTT", "ASS (karaoké)").
+        project (dict, optional): Projet courant (gr.State), créé au premier appel.
+
+    Returns:
+        tuple: (chemin du MP3, message de statut, nouvel état de l'audio, projet, script du projet).
+    """
+    store = get_project_store()
+    script_manifest = store.record_text("script", script)
+    project = store.save_project(project, "script", script_manifest, name=project_name(script),
+                                 settings={"voice": voix, "language": langue, "subtitle_format": subtitle_format})
+
+    # La voix off ne dépend que du texte lu (sans la mise en forme Markdown) et de la voix
+    audio_inputs = {"script": hash_text(clean_script(script))}
+    audio_params = {"voice": voix}
+    audio_manifest = store.lookup("audio", audio_inputs, audio_params)
+    if audio_manifest:
+        audio_data, status_message = audio_manifest["path"], "Audio repris du projet (script et voix inchangés)."
+    else:
+        # Génération de l'audio (incrémentale si un audio précédent existe)
+        audio_data, status_message, state = generate_audio_incremental(script, voix, previous, parallel=parallel)
+        if not audio_data:
+            # En cas d'échec de la génération audio
+            return None, status_message, state, project, script
+        audio_manifest = store.record("audio", audio_inputs, audio_params, audio_data, companions=(alignment_path(audio_data),))
+        audio_data = audio_manifest["path"]
+    project = store.save_project(project, "audio", audio_manifest)
+    return audio_data, status_message, audio_state(script, voix, audio_data), project, script
+
+@scheduled("asr")
+def process_subtitles_generation(audio_path, script, langue=None, subtitle_format="SRT", state=None, project=None, status_message=""):
+    """
+    Génère les sous-titres de la voix off (événement du bouton « Générer l'audio », seconde étape).
+
+    Les sous-titres sont calculés à partir de l'alignement du script, sans transcription, et repris
+    du magasin de projets si l'audio, le script, le format et la langue n'ont pas changé.
+
+    Args:
+        audio_path (str): Voix off affichée (None si la synthèse a échoué).
+        script (str): Script lu par la voix off.
+        langue (str, optional): Libellé de la langue de l'onglet Idées.
+        subtitle_format (str, optional): Libellé du format des sous-titres.
+        state (dict, optional): État de l'audio retourné par process_audio_generation.
+        project (dict, optional): Projet courant.
+        status_message (str, optional): Message de statut de la synthèse, complété ici.
+
+    Returns:
+        tuple: (message de statut, chemin du fichier de sous-titres, projet).
+    """
+    if not audio_path or not state:
+        return status_message, None, project
+
+    store = get_project_store()
+    # Le MP3 du magasin (et son alignement) plutôt que la copie servie par Gradio
+    audio_data = state["audio_path"]
+    audio_manifest = store.manifest(project["stages"].get("audio")) if project else None
+    fmt = subtitle_format_from_label(subtitle_format)
+    subtitles_inputs = {
+        "audio": audio_manifest["hash"] if audio_manifest else hash_file(audio_data),
+        "script": hash_text(script),
+    }
+    subtitles_params = {"format": fmt, "language": language_code_from_label(langue)}
+    subtitles_manifest = store.lookup("subtitles", subtitles_inputs, subtitles_params)
+    if subtitles_manifest:
+        status_message += "<br>✅ Timestamps repris du projet."
+    else:
+        # Générer les sous-titres à partir de l'alignement du script connu
+        # (transcription Whisper dans la langue choisie uniquement en dernier recours)
+        os.makedirs(os.path.join(os.getcwd(), "temp_audio"), exist_ok=True)
+        srt_output_path = os.path.join(os.getcwd(), "temp_audio", f"{subtitles_inputs['audio']}{SUBTITLE_FORMATS[fmt]}")
+        # Écriture dans un fichier temporaire unique puis remplacement atomique :
+        # un fichier déjà servi ou conservé dans le magasin n'est jamais réécrit en place
+        tmp_path = f"{srt_output_path}.{uuid.uuid4().hex}.part"
+        try:
+            srt_content = align_script_to_audio(
+                audio_data,
+                script_text=script,
+                language=language_code_from_label(langue),
+                output_file=tmp_path,
+                model_size="base",
+                quiet=True,
+                format=fmt
+            )
+            if srt_content:
+                os.replace(tmp_path, srt_output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        if not srt_content:
+            status_message += "<br>❌ Échec de la génération des timestamps."
+            return status_message, None, project
+        status_message += "<br>✅ Timestamps générés avec succès!"
+        subtitles_manifest = store.record("subtitles", subtitles_inputs, subtitles_params, srt_output_path)
+    project = store.save_project(project, "subtitles", subtitles_manifest)
+    return status_message, subtitles_manifest["path"], project
+
+@scheduled("render")
+def process_video_generation(ratio, duration, audio_path, uploaded_image, music_path, subtitles_path,
+                             burn_captions=True, legend_style="Standard", legend_size=16, legend_color="#FFFFFF", legend_position="Bas",
+                             overlay_type="Aucun", overlay_position="Coin inférieur droit", overlay_opacity=0.8, overlay_file=None,
+                             encoder_preset="Équilibré", project=None, draft=False):
+    """
+    Génère la vidéo (événement du bouton « Générer la vidéo ») avec les réglages des onglets
+    Style (encodage), Légende (sous-titres incrustés) et Overlay (logo, filigrane, sous-titres animés).
+
+    Le rendu final ne ré-encode que les segments modifiés depuis le rendu précédent, et une
+    vidéo déjà rendue avec les mêmes entrées et réglages est reprise du magasin de projets ;
+    avec draft=True, un aperçu basse résolution est rendu en quelques secondes.
+
+    Returns:
+        tuple: (chemin de la vidéo générée ou None en cas d'échec, projet).
+    """
+    caption_style = CaptionStyle(legend_style, legend_size, legend_color, legend_position)
+    animated = overlay_type == "Sous-titres animés"
+    subtitles_path = subtitles_path if burn_captions or animated else None
+    overlay = overlay_settings(overlay_type, overlay_file, overlay_position, overlay_opacity)
+
+    def render():
+        return generate_video(
+            ratio, duration, audio_path, uploaded_image, music_path,
+            subtitles_path=subtitles_path,
+            caption_style=caption_style,
+            overlay=overlay,
+            animated_subtitles=animated,
+            encoder_preset=encoder_preset,
+            draft=draft
+        )
+
+    if draft:
+        # L'aperçu brouillon n'est pas conservé dans le projet
+        return render(), project
+
+    store = get_project_store()
+    image_paths = ([uploaded_image] if uploaded_image else []) + list_images()
+    inputs = {
+        "audio": hash_file(audio_path) if audio_path else None,
+        "subtitles": hash_file(subtitles_path) if subtitles_path else None,
+        "images": hash_text(" ".join(hash_file(path) for path in image_paths)),
+        "music": hash_file(music_path) if music_path else None,
+        "overlay": hash_file(overlay["path"]) if overlay else None,
+    }
+    settings = {
+        "ratio": ratio, "duration": duration, "burn_captions": burn_captions, "legend_style": legend_style,
+        "legend_size": legend_size, "legend_color": legend_color, "legend_position": legend_position,
+        "overlay_type": overlay_type, "overlay_position": overlay_position, "overlay_opacity": overlay_opacity,
+        "encoder_preset": encoder_preset,
+    }
+    manifest = store.lookup("video", inputs, settings)
+    if manifest is None:
+        video_path = render()
+        if video_path is None:
+            return None, project
+        manifest = store.record("video", inputs, settings, video_path)
+    project = store.save_project(project, "video", manifest, settings=settings)
+    return manifest["path"], project
+
+def process_video_preview(*args):
+    """Aperçu brouillon de la vidéo (événement du bouton « Aperçu rapide »), mêmes entrées que process_video_generation."""
+    video_path, _ = process_video_generation(*args, draft=True)
+    return video_path
+
+def refresh_projects():
+    """Met à jour la liste des projets enregistrés."""
+    return gr.update(choices=project_choices(get_project_store().list_projects()))
+
+def load_project(project_id):
+    """
+    Recharge un projet enregistré : script, voix off, sous-titres, vidéo et réglages (événement du bouton « Ouvrir »).
+
+    Returns:
+        tuple: Valeurs des composants restaurés (gr.skip() pour ceux que le projet ne renseigne pas).
+    """
+    project, artifacts = get_project_store().load_project(project_id)
+    if project is None:
+        raise gr.Error("Projet introuvable")
+    script = ""
+    if "script" in artifacts:
+        with open(artifacts["script"], "r", encoding="utf-8") as f:
+            script = f.read()
+    settings = project.get("settings", {})
+    audio_path = artifacts.get("audio")
+
+    def setting(name):
+        return settings[name] if name in settings else gr.skip()
+
+    return (
+        project, script, script, script or gr.skip(),
+        audio_path, artifacts.get("subtitles"), artifacts.get("video"),
+        audio_state(script, settings["voice"], audio_path) if audio_path and "voice" in settings else None,
+        f"📁 Projet « {project.get('name', 'Projet sans titre')} » rechargé.",
+        setting("voice"), setting("language"), setting("subtitle_format"),
+        setting("ratio"), setting("duration"), setting("encoder_preset"),
+    )
+
+@scheduled("asr")
+def process_subtitles_streaming(audio_path, langue=None, subtitle_format="SRT"):
+    """
+    Transcrit l'audio courant et affiche ses sous-titres au fur et à mesure du décodage
+    (événement du bouton « Transcrire l'audio »).
+
+    Args:
+        audio_path (str): Chemin du fichier audio.
+        langue (str, optional): Libellé de la langue de l'onglet Idées.
+        subtitle_format (str, optional): Libellé du format des sous-titres.
+
+    Yields:
+        tuple: (sous-titres écrits jusqu'ici, fichier de sous-titres une fois terminé).
+    """
+    if not audio_path:
+        raise gr.Error("Générez ou chargez d'abord un audio.")
+    fmt = subtitle_format_from_label(subtitle_format)
+    output_path = os.path.splitext(audio_path)[0] + SUBTITLE_FORMATS[fmt]
+    content = ""
+    try:
+        for content in stream_subtitles(audio_path, output_path, fmt, language=language_code_from_label(langue)):
+            yield content, gr.skip()
+    except Exception as e:
+        print(f"Erreur lors de la transcription : {e}")
+        raise gr.Error(f"Échec de la transcription : {e}")
+    yield content, output_path
+
+def build_demo():
+    """
+    Construit l'interface Gradio et connecte les événements, sans la lancer.
+
+    Returns:
+        gr.Blocks: L'application.
+    """
     # Vérification initiale de l'API Gemini
-    api_available = setup_gemini_api()
+    with profile_step("gemini", category="init"):
+        api_available = setup_gemini_api(configure=False)
     
-    with gr.Blocks(
+    with profile_step("blocks", category="ui"), gr.Blocks(
         theme=gr.themes.Soft(
             primary_hue="green",
             neutral_hue="zinc",
@@ -26,9 +327,20 @@ def main():
         css=custom_css
     ) as demo:
         gr.Markdown("# 🎬 Générateur de Shorts Vidéo")
+
+        # Projets enregistrés : rechargés instantanément depuis le magasin d'artefacts
+        with gr.Accordion("📁 Projets", open=False):
+            with gr.Row():
+                project_list = gr.Dropdown(choices=[], label="Projets enregistrés", scale=3)
+                open_project_btn = gr.Button("Ouvrir", elem_classes="secondary-button", scale=1)
+                new_project_btn = gr.Button("Nouveau projet", elem_classes="secondary-button", scale=1)
         
-        # État pour stocker le script généré
+        # État pour stocker le script du projet courant (tel qu'enregistré dans le magasin)
         script_raw = gr.State("")
+        # Projet courant (identifiant et manifestes de ses étapes, voir utils/project_store.py)
+        project_state = gr.State(None)
+        # État du dernier audio généré (texte, voix, fichier) pour la mise à jour incrémentale
+        last_audio = gr.State(None)
         
         with gr.Row():
             # Colonne de gauche pour les paramètres (avec tabbed interface)
@@ -36,11 +348,11 @@ def main():
                 # Création des différents onglets
                 with gr.Tabs() as tabs:
                     # Création des onglets à partir des modules dédiés
-                    ideas_tab, script_output, script_editor = create_ideas_tab()
-                    legend_tab = create_legend_tab()
-                    style_tab = create_style_tab()
-                    images_tab = create_images_tab()
-                    overlay_tab = create_overlay_tab()
+                    ideas_tab, script_output, script_editor, language = create_ideas_tab()
+                    legend_tab, legend_style, legend_size, legend_color, legend_position, burn_captions = create_legend_tab()
+                    style_tab, video_ratio, video_duration, encoder_preset = create_style_tab()
+                    images_tab, image_upload = create_images_tab()
+                    overlay_tab, overlay_type, overlay_position, overlay_opacity, overlay_file = create_overlay_tab()
                     hooks_tab = create_hooks_tab()
                 
                 gr.Markdown("---")
@@ -60,6 +372,10 @@ def main():
                         value="George",
                         container=False
                     )
+                    parallel_tts = gr.Checkbox(
+                        label="Synthèse parallèle par phrase",
+                        value=False
+                    )
             
             # Colonne de droite pour la prévisualisation
             with gr.Column(scale=1):
@@ -75,6 +391,10 @@ def main():
                     "Générer la vidéo 60 ⚡",
                     elem_classes="primary-button"
                 )
+                preview_video_btn = gr.Button(
+                    "Aperçu rapide (basse résolution) 👁️",
+                    elem_classes="secondary-button"
+                )
                 
                 # Prévisualisation audio
                 audio_output = gr.Audio(
@@ -84,59 +404,142 @@ def main():
                 )
                 
                 # Ajout d'un élément pour les timestamps (sous-titres)
+                subtitle_format = gr.Radio(
+                    choices=list(SUBTITLE_FORMAT_LABELS),
+                    value="SRT",
+                    label="Format des sous-titres"
+                )
                 timestamps_output = gr.File(
-                    label="Timestamps générés (SRT)",
-                    file_types=[".srt"],
+                    label="Timestamps générés (sous-titres)",
+                    file_types=list(SUBTITLE_FORMATS.values()),
+                    interactive=False
+                )
+
+                # Sous-titres affichés au fil de la transcription Whisper
+                subtitles_preview = gr.Textbox(
+                    label="Sous-titres en direct",
+                    lines=8,
                     interactive=False
                 )
+                transcribe_btn = gr.Button(
+                    "Transcrire l'audio (sous-titres en direct) 📝",
+                    elem_classes="secondary-button"
+                )
 
                 generate_audio_btn = gr.Button(
                     "Générer l'audio 40 ⚡",
                     elem_classes="secondary-button"
                 )
 
+                # Écoute de la voix off pendant sa synthèse
+                audio_stream_output = gr.Audio(
+                    label="Écoute en direct",
+                    streaming=True,
+                    autoplay=True,
+                    elem_classes="audio-preview"
+                )
+                stream_audio_btn = gr.Button(
+                    "Écouter pendant la génération 🎧",
+                    elem_classes="secondary-button"
+                )
+
+                # Charge du serveur par classe de ressources (files d'attente et temps d'attente)
+                with gr.Accordion("📈 Charge du serveur", open=False):
+                    scheduler_stats = gr.JSON(label="Files d'attente")
+                    refresh_stats_btn = gr.Button("Actualiser", elem_classes="secondary-button")
+
         # Événement pour générer la vidéo
+        video_inputs = [video_ratio, video_duration, audio_output, image_upload, music_file, timestamps_output,
+                        burn_captions, legend_style, legend_size, legend_color, legend_position,
+                        overlay_type, overlay_position, overlay_opacity, overlay_file, encoder_preset]
         generate_video_btn.click(
-            fn=generate_video,
+            fn=process_video_generation,
+            inputs=video_inputs + [project_state],
+            outputs=[video_output, project_state]
+        ).then(fn=refresh_projects, outputs=project_list)
+        preview_video_btn.click(
+            fn=process_video_preview,
+            inputs=video_inputs,
             outputs=video_output
         )
 
-        # Événement pour générer l'audio
-        def process_audio_generation(script, voix):
-            # Génération de l'audio
-            audio_data, status_message = generate_audio(script, voix)
-            
-            # Si l'audio a été généré avec succès, générer également les timestamps
-            if audio_data:
-                # Générer les sous-titres SRT à partir de l'audio
-                srt_output_path = audio_data.replace('.mp3', '.srt')
-                srt_content = transcribe_audio(
-                    audio_data, 
-                    model_size="base", 
-                    language="auto", 
-                    output_file=srt_output_path,
-                    format="srt", 
-                    quiet=True
-                )
-                
-                if srt_content:
-                    status_message += "<br>✅ Timestamps générés avec succès!"
-                else:
-                    status_message += "<br>❌ Échec de la génération des timestamps."
-                    srt_output_path = None
-                
-                return audio_data, status_message, srt_output_path
-            
-            # En cas d'échec de la génération audio
-            return None, status_message, None
-            
         generate_audio_btn.click(
             fn=process_audio_generation,
+            inputs=[script_editor, voice_list, parallel_tts, language, last_audio, subtitle_format, project_state],
+            outputs=[audio_output, audio_status, last_audio, project_state, script_raw]
+        ).then(
+            # Sous-titres dans la classe « asr », une fois l'emplacement réseau libéré
+            fn=process_subtitles_generation,
+            inputs=[audio_output, script_raw, language, subtitle_format, last_audio, project_state, audio_status],
+            outputs=[audio_status, timestamps_output, project_state]
+        ).then(fn=refresh_projects, outputs=project_list)
+
+        open_project_btn.click(
+            fn=load_project,
+            inputs=project_list,
+            outputs=[project_state, script_raw, script_editor, script_output,
+                     audio_output, timestamps_output, video_output, last_audio, audio_status,
+                     voice_list, language, subtitle_format, video_ratio, video_duration, encoder_preset]
+        )
+        new_project_btn.click(
+            fn=lambda: (None, "", None),
+            outputs=[project_state, script_raw, last_audio]
+        )
+        demo.load(fn=refresh_projects, outputs=project_list)
+
+        transcribe_btn.click(
+            fn=process_subtitles_streaming,
+            inputs=[audio_output, language, subtitle_format],
+            outputs=[subtitles_preview, timestamps_output]
+        )
+
+        # Événement pour écouter l'audio pendant sa synthèse (le fichier final alimente la prévisualisation)
+        @scheduled("network")
+        async def process_audio_streaming(script, voix):
+            async for chunk, audio_path, status_message in generate_audio_stream(script, voix):
+                if chunk:
+                    yield chunk, gr.skip(), gr.skip()
+                else:
+                    yield gr.skip(), status_message, audio_path
+
+        stream_audio_btn.click(
+            fn=process_audio_streaming,
             inputs=[script_editor, voice_list],
-            outputs=[audio_output, audio_status, timestamps_output]
+            outputs=[audio_stream_output, audio_status, audio_output]
+        )
+
+        refresh_stats_btn.click(
+            fn=get_scheduler_stats,
+            outputs=scheduler_stats
+        )
+
+    # Les limites de concurrence sont gérées par classe de ressources (utils/scheduler.py)
+    # plutôt que par la limite par défaut de Gradio (un seul traitement par événement)
+    demo.queue(default_concurrency_limit=None)
+    return demo
+
+def main():
+    demo = build_demo()
+
+    if metrics.METRICS_ENABLED:
+        # Interface Gradio montée sur une application FastAPI qui sert aussi /metrics
+        import uvicorn
+        register_metrics_collectors()
+        app = metrics.mount_metrics_endpoint(demo)
+        threading.Thread(target=warmup_engines, name="warmup", daemon=True).start()
+        uvicorn.run(
+            app,
+            host=os.getenv("GRADIO_SERVER_NAME", "127.0.0.1"),
+            port=int(os.getenv("GRADIO_SERVER_PORT", "7860"))
         )
+        return
 
-    demo.launch()
+    # L'interface est servie immédiatement, les moteurs lourds sont initialisés en arrière-plan
+    with profile_step("launch", category="ui"):
+        demo.launch(prevent_thread_lock=True)
+    print_startup_report("Profil de démarrage (interface prête)")
+    threading.Thread(target=warmup_engines, name="warmup", daemon=True).start()
+    demo.block_thread()
 
 
 if __name__ == "__main__":
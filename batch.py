@@ -0,0 +1,322 @@
+"""
+Exécution en lot, sans interface, du pipeline de génération de shorts.
+
+Chaque ligne du fichier JSONL décrit une idée :
+    {"id": "motivation-01", "prompt": "La motivation du lundi", "language": "🇫🇷 Français",
+     "style": "Style informatif", "voice": "George", "ratio": "9:16 (Stories/Shorts)", "duration": 30}
+
+Les étapes script → audio → SRT → vidéo s'exécutent dans un pool de processus par étape,
+et chaque étape terminée est enregistrée dans un point de contrôle : une exécution
+interrompue reprend là où elle s'était arrêtée. Une étape dont une sortie amont ou un
+paramètre de l'idée (voix, langue, format...) a changé est recalculée, ainsi que les suivantes.
+
+Exemple :
+    python batch.py idees.jsonl --output-dir batch_output
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from utils.project_store import hash_file
+
+# Ordre des étapes du pipeline
+STAGES = ["script", "audio", "srt", "video"]
+
+# Sorties amont et champs de l'idée utilisés par chaque étape
+STAGE_INPUTS = {"script": (), "audio": ("script",), "srt": ("audio", "script"), "video": ("audio", "srt")}
+STAGE_PARAMS = {
+    "script": ("prompt", "language", "style"),
+    "audio": ("voice",),
+    "srt": ("language",),
+    "video": ("ratio", "duration"),
+}
+
+# Nombre de processus par défaut pour chaque étape
+DEFAULT_WORKERS = {"script": 4, "audio": 4, "srt": 2, "video": 2}
+
+# Valeurs par défaut des champs d'une idée (identiques à celles de l'interface)
+DEFAULT_ITEM = {
+    "language": "🇫🇷 Français",
+    "style": "Style de script personnalisé 📝",
+    "voice": "George",
+    "ratio": "9:16 (Stories/Shorts)",
+    "duration": 30,
+}
+
+def load_items(jsonl_path):
+    """
+    Lit les idées d'un fichier JSONL.
+
+    Args:
+        jsonl_path (str): Chemin du fichier JSONL.
+
+    Returns:
+        list: Idées complétées par les valeurs par défaut et un identifiant stable.
+    """
+    items = []
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = {**DEFAULT_ITEM, **json.loads(line)}
+            if "id" not in item:
+                # Identifiant dérivé du contenu : la même ligne reprend le même point de contrôle
+                item["id"] = hashlib.sha1(line.encode("utf-8")).hexdigest()[:12]
+            items.append(item)
+    return items
+
+def _checkpoint_path(item_dir):
+    return os.path.join(item_dir, "checkpoint.json")
+
+def load_checkpoint(item_dir):
+    """Charge le point de contrôle d'une idée (étapes terminées et fichiers produits)."""
+    path = _checkpoint_path(item_dir)
+    if not os.path.exists(path):
+        return {"stages": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_checkpoint(item_dir, checkpoint):
+    """Enregistre le point de contrôle de manière atomique."""
+    path = _checkpoint_path(item_dir)
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def stage_key(stage, item, checkpoint):
+    """
+    Empreinte de ce dont dépend une étape : empreintes des sorties amont et champs de l'idée utilisés.
+
+    Args:
+        stage (str): Nom de l'étape.
+        item (dict): Paramètres de l'idée.
+        checkpoint (dict): Point de contrôle de l'idée.
+
+    Returns:
+        str: Empreinte SHA-256 hexadécimale, None si une sortie amont manque.
+    """
+    inputs = {}
+    for name in STAGE_INPUTS[stage]:
+        done = checkpoint["stages"].get(name)
+        if not done or "hash" not in done:
+            return None
+        inputs[name] = done["hash"]
+    params = {name: item.get(name) for name in STAGE_PARAMS[stage]}
+    payload = json.dumps([stage, inputs, params], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def next_stage(item, checkpoint):
+    """
+    Retourne la première étape à (re)calculer, ou None si l'idée est terminée.
+
+    Une étape est terminée si sa sortie existe toujours avec le même contenu et si ni ses
+    sorties amont ni les champs de l'idée qu'elle utilise n'ont changé depuis son exécution.
+    """
+    for stage in STAGES:
+        done = checkpoint["stages"].get(stage)
+        if (not done or not os.path.exists(done["output"]) or done.get("key") != stage_key(stage, item, checkpoint)
+                or done.get("hash") != hash_file(done["output"])):
+            return stage
+    return None
+
+def run_stage(stage, item, item_dir, outputs):
+    """
+    Exécute une étape du pipeline pour une idée (dans un processus du pool).
+
+    Args:
+        stage (str): Nom de l'étape ("script", "audio", "srt" ou "video").
+        item (dict): Paramètres de l'idée.
+        item_dir (str): Dossier de sortie de l'idée.
+        outputs (dict): Fichiers produits par les étapes précédentes.
+
+    Returns:
+        tuple: (chemin du fichier produit, durée de l'étape en secondes).
+
+    Raises:
+        RuntimeError: Si l'étape échoue.
+    """
+    start = time.perf_counter()
+
+    if stage == "script":
+        from tabs.ideas_tab import generate_script_with_gemini
+        script = generate_script_with_gemini(item["prompt"], item["language"], item["style"])
+        if not script or script.startswith("Erreur"):
+            raise RuntimeError(script)
+        output = os.path.join(item_dir, "script.md")
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(script)
+
+    elif stage == "audio":
+        from utils.audio_utils import alignment_path, generate_audio
+        with open(outputs["script"], "r", encoding="utf-8") as f:
+            script = f.read()
+        audio_path, status_message = generate_audio(script, item["voice"])
+        if not audio_path:
+            raise RuntimeError(status_message)
+        # Copie hors du cache TTS (qui peut évincer le fichier) avec son alignement
+        output = os.path.join(item_dir, "voice.mp3")
+        shutil.copyfile(audio_path, output)
+        if os.path.exists(alignment_path(audio_path)):
+            shutil.copyfile(alignment_path(audio_path), alignment_path(output))
+
+    elif stage == "srt":
+        from utils.srt_utils import align_script_to_audio, language_code_from_label
+        with open(outputs["script"], "r", encoding="utf-8") as f:
+            script = f.read()
+        output = os.path.join(item_dir, "subtitles.srt")
+        srt_content = align_script_to_audio(
+            outputs["audio"],
+            script_text=script,
+            language=language_code_from_label(item["language"]),
+            output_file=output,
+            quiet=True
+        )
+        if not srt_content:
+            raise RuntimeError("Échec de la génération des sous-titres")
+
+    elif stage == "video":
+        from utils.caption_compositor import load_captions
+        from utils.file_utils import list_images
+        from utils.template_index import get_template_index
+        from utils.video_renderer import render_video, resolution_for_ratio
+        output = os.path.join(item_dir, "video.mp4")
+        size = resolution_for_ratio(item["ratio"])
+        render_video(
+            list_images(),
+            output,
+            size=size,
+            duration=float(item["duration"]),
+            audio_path=outputs["audio"],
+            load_base=get_template_index().load_base,
+            captions=load_captions(outputs["srt"], size)
+        )
+
+    else:
+        raise ValueError(f"Étape inconnue : {stage}")
+
+    return output, time.perf_counter() - start
+
+def percentile(values, q):
+    """Percentile (méthode du rang le plus proche) d'une liste de valeurs."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def print_summary(completed, failed, resumed, elapsed, latencies):
+    """Affiche le débit global et les percentiles de latence de chaque étape."""
+    throughput = completed / (elapsed / 60) if elapsed > 0 else 0.0
+    print(f"\n📊 {completed} idée(s) terminée(s), {failed} échec(s) en {elapsed:.1f}s ({throughput:.2f} idées/minute)")
+    if resumed:
+        print(f"  {resumed} idée(s) déjà terminée(s) lors d'une exécution précédente")
+    for stage in STAGES:
+        values = latencies[stage]
+        if not values:
+            continue
+        print(
+            f"  {stage:<6} n={len(values):<4} "
+            f"p50={percentile(values, 50):6.2f}s  p90={percentile(values, 90):6.2f}s  "
+            f"p99={percentile(values, 99):6.2f}s  max={max(values):6.2f}s"
+        )
+
+def run_batch(items, output_dir, workers=None):
+    """
+    Exécute le pipeline pour toutes les idées, en reprenant les points de contrôle existants.
+
+    Args:
+        items (list): Idées chargées par load_items.
+        output_dir (str): Dossier racine des résultats (un sous-dossier par idée).
+        workers (dict, optional): Nombre de processus par étape. Par défaut: DEFAULT_WORKERS.
+
+    Returns:
+        dict: Nombre d'idées terminées et en échec, durée totale et latences par étape.
+    """
+    workers = {**DEFAULT_WORKERS, **(workers or {})}
+    executors = {stage: ProcessPoolExecutor(max_workers=workers[stage]) for stage in STAGES}
+    latencies = {stage: [] for stage in STAGES}
+    checkpoints = {}
+    futures = {}
+    completed = failed = resumed = 0
+    start = time.perf_counter()
+
+    def submit(item):
+        nonlocal completed
+        item_dir = os.path.join(output_dir, item["id"])
+        checkpoint = checkpoints[item["id"]]
+        stage = next_stage(item, checkpoint)
+        if stage is None:
+            completed += 1
+            return
+        outputs = {name: done["output"] for name, done in checkpoint["stages"].items()}
+        future = executors[stage].submit(run_stage, stage, item, item_dir, outputs)
+        futures[future] = (item, stage, stage_key(stage, item, checkpoint))
+
+    try:
+        for item in items:
+            item_dir = os.path.join(output_dir, item["id"])
+            os.makedirs(item_dir, exist_ok=True)
+            checkpoints[item["id"]] = load_checkpoint(item_dir)
+            if next_stage(item, checkpoints[item["id"]]) is None:
+                # Idée déjà terminée lors d'une exécution précédente
+                resumed += 1
+                continue
+            submit(item)
+
+        # Pipeline : dès qu'une étape se termine, l'étape suivante de la même idée est soumise
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                item, stage, key = futures.pop(future)
+                try:
+                    output, duration = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ {item['id']} : échec de l'étape {stage} : {e}")
+                    continue
+                checkpoint = checkpoints[item["id"]]
+                checkpoint["stages"][stage] = {"output": output, "duration": duration, "key": key, "hash": hash_file(output)}
+                save_checkpoint(os.path.join(output_dir, item["id"]), checkpoint)
+                latencies[stage].append(duration)
+                print(f"✅ {item['id']} : {stage} ({duration:.2f}s)")
+                submit(item)
+    finally:
+        for executor in executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    return {
+        "completed": completed,
+        "failed": failed,
+        "resumed": resumed,
+        "elapsed": time.perf_counter() - start,
+        "latencies": latencies,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Génération de shorts en lot à partir d'un fichier JSONL d'idées")
+    parser.add_argument("ideas", help="Fichier JSONL des idées (une idée par ligne)")
+    parser.add_argument("--output-dir", default="batch_output", help="Dossier des résultats et des points de contrôle")
+    for stage in STAGES:
+        parser.add_argument(f"--{stage}-workers", type=int, default=DEFAULT_WORKERS[stage],
+                            help=f"Nombre de processus pour l'étape {stage}")
+    args = parser.parse_args()
+
+    items = load_items(args.ideas)
+    workers = {stage: getattr(args, f"{stage}_workers") for stage in STAGES}
+    print(f"🎬 {len(items)} idée(s) à traiter")
+
+    result = run_batch(items, args.output_dir, workers)
+    print_summary(result["completed"], result["failed"], result["resumed"], result["elapsed"], result["latencies"])
+    if result["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+"""
+Benchmarks de bout en bout du générateur de shorts (voir benchmarks/run_benchmarks.py).
+"""
@@ -0,0 +1,349 @@
+"""
+Benchmarks de bout en bout du générateur de shorts.
+
+Les appels à ElevenLabs et Gemini sont servis par des serveurs locaux qui rejouent des
+réponses enregistrées avec une latence configurable (benchmarks/stub_servers.py). Chaque
+benchmark s'exécute dans un processus neuf et dans un dossier de travail temporaire
+(caches vides), et mesure les percentiles de latence, le débit et le pic de mémoire (RSS).
+
+Les résultats sont comparés à une référence enregistrée : toute régression au-delà de la
+tolérance fait échouer la commande (code de sortie 1).
+
+Exemples :
+    python -m benchmarks.run_benchmarks --save-baseline
+    python -m benchmarks.run_benchmarks --only tts audio_pipeline --latency-ms 300
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from batch import percentile
+from benchmarks.stub_servers import RECORDINGS_DIR, StubLatency, start_elevenlabs_stub, start_gemini_stub
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_DIR, "benchmarks", "baseline.json")
+
+# Script lu par les benchmarks de synthèse vocale
+BENCH_SCRIPT = (
+    "La motivation ne tombe pas du ciel. Elle se construit une action après l'autre. "
+    "Commence par une petite victoire, puis planifie trois priorités."
+)
+
+# Itérations et requêtes simultanées par défaut de chaque benchmark
+BENCHMARKS = {
+    "gemini_script": {"iterations": 20, "concurrency": 4},
+    "tts": {"iterations": 20, "concurrency": 4},
+    "transcribe": {"iterations": 3, "concurrency": 1},
+    "srt": {"iterations": 200, "concurrency": 1},
+    "load_images": {"iterations": 10, "concurrency": 1},
+    "startup": {"iterations": 3, "concurrency": 1},
+    "audio_pipeline": {"iterations": 20, "concurrency": 4},
+}
+
+# Métriques comparées à la référence : True si une valeur plus élevée est une régression
+COMPARED_METRICS = {"p50_ms": True, "p95_ms": True, "throughput_per_s": False, "peak_rss_mb": True}
+
+def _unique_suffix():
+    """Suffixe unique par appel : chaque itération de synthèse manque le cache TTS."""
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def suffix():
+        with lock:
+            return next(counter)
+    return suffix
+
+def _setup_gemini_script(options):
+    from tabs.ideas_tab import generate_script_with_gemini
+
+    def run():
+        script = generate_script_with_gemini("La motivation du lundi", "🇫🇷 Français", "Style informatif")
+        if script.startswith("Erreur"):
+            raise RuntimeError(script)
+    return run
+
+def _setup_tts(options):
+    from utils.audio_utils import generate_audio
+    suffix = _unique_suffix()
+
+    def run():
+        audio_path, status_message = generate_audio(f"{BENCH_SCRIPT} Essai {suffix()}.", "George")
+        if not audio_path:
+            raise RuntimeError(status_message)
+    return run
+
+def _setup_transcribe(options):
+    from utils.srt_utils import transcribe_audio
+    audio_path = os.path.join(RECORDINGS_DIR, "elevenlabs_voice.mp3")
+
+    def run():
+        if transcribe_audio(audio_path, model_size=options["whisper_model"], language="fr", quiet=True) is None:
+            raise RuntimeError("Échec de la transcription")
+    return run
+
+def _setup_srt(options):
+    from utils.srt_utils import generate_srt
+    segments = [
+        {"start": i * 2.5, "end": i * 2.5 + 2.2, "text": f" Segment numéro {i} du script de la vidéo."}
+        for i in range(300)
+    ]
+
+    def run():
+        generate_srt(segments)
+    return run
+
+def _setup_load_images(options):
+    from utils.file_utils import load_images
+    template_dir = os.path.join(REPO_DIR, "Templates")
+
+    def run():
+        if not load_images(template_dir):
+            raise RuntimeError("Aucune image chargée")
+    return run
+
+def _setup_startup(options):
+    # Démarrage à froid : import de l'application et construction de l'interface, sans lancement
+    command = [sys.executable, "-c", "import app; app.build_demo()"]
+
+    def run():
+        completed = subprocess.run(command, cwd=REPO_DIR, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "Échec du démarrage")
+    return run
+
+def _setup_audio_pipeline(options):
+    from app import process_audio_generation, process_subtitles_generation
+    suffix = _unique_suffix()
+
+    def run():
+        # Les deux étapes du bouton « Générer l'audio » : synthèse puis sous-titres
+        script = f"{BENCH_SCRIPT} Essai {suffix()}."
+        audio_path, status_message, state, project, script = process_audio_generation(script, "George", False, "🇫🇷 Français")
+        status_message, srt_path, _ = process_subtitles_generation(audio_path, script, "🇫🇷 Français", "SRT", state, project, status_message)
+        if not audio_path or not srt_path:
+            raise RuntimeError(status_message)
+    return run
+
+SETUPS = {
+    "gemini_script": _setup_gemini_script,
+    "tts": _setup_tts,
+    "transcribe": _setup_transcribe,
+    "srt": _setup_srt,
+    "load_images": _setup_load_images,
+    "startup": _setup_startup,
+    "audio_pipeline": _setup_audio_pipeline,
+}
+
+def _peak_rss_mb():
+    """Pic de mémoire résidente du processus et de ses enfants terminés (en Mo)."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return max(own, children) / divisor
+
+def run_benchmark(name, iterations, concurrency, warmup, options, work_dir):
+    """
+    Exécute un benchmark (dans un processus dédié) et retourne ses mesures.
+
+    Args:
+        name (str): Nom du benchmark (clé de BENCHMARKS).
+        iterations (int): Nombre d'appels mesurés.
+        concurrency (int): Nombre d'appels simultanés.
+        warmup (int): Nombre d'appels d'échauffement, non mesurés.
+        options (dict): Options des benchmarks (modèle Whisper, affichage des messages de l'application).
+        work_dir (str): Dossier de travail (caches et fichiers générés).
+
+    Returns:
+        dict: Latences (ms), débit (appels/s), pic de RSS (Mo) et nombre d'erreurs.
+    """
+    os.chdir(work_dir)
+    if not options.get("verbose"):
+        # Les messages de l'application (un par fichier généré) masqueraient le rapport
+        sys.stdout = open(os.devnull, "w")
+    run = SETUPS[name](options)
+
+    errors = []
+    for _ in range(warmup):
+        try:
+            run()
+        except Exception as e:
+            errors.append(str(e))
+
+    latencies = []
+    lock = threading.Lock()
+
+    def timed():
+        start = time.perf_counter()
+        try:
+            run()
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(iterations):
+            executor.submit(timed)
+    wall = time.perf_counter() - start
+
+    return {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2) if latencies else 0.0,
+        "throughput_per_s": round(len(latencies) / wall, 3) if wall > 0 else 0.0,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+    }
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Compare les mesures à la référence.
+
+    Args:
+        results (dict): Mesures par benchmark.
+        baseline (dict): Mesures de référence par benchmark.
+        tolerance (float): Écart relatif toléré (0.25 = 25 %).
+
+    Returns:
+        list: Régressions (benchmark, métrique, valeur de référence, valeur mesurée).
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        if result["errors"]:
+            regressions.append((name, "errors", 0, result["errors"]))
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            before, after = reference.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            if higher_is_worse and after > before * (1 + tolerance):
+                regressions.append((name, metric, before, after))
+            elif not higher_is_worse and after < before * (1 - tolerance):
+                regressions.append((name, metric, before, after))
+    return regressions
+
+def print_results(results, baseline):
+    """Affiche le tableau des mesures, avec l'écart à la référence lorsqu'elle existe."""
+    print(f"\n{'Benchmark':<16} {'n':>4} {'conc.':>5} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} "
+          f"{'débit (/s)':>11} {'RSS (Mo)':>9} {'erreurs':>8}")
+    for name, r in results.items():
+        line = (f"{name:<16} {r['iterations']:>4} {r['concurrency']:>5} {r['p50_ms']:>10.1f} {r['p95_ms']:>10.1f} "
+                f"{r['p99_ms']:>10.1f} {r['throughput_per_s']:>11.2f} {r['peak_rss_mb']:>9.1f} {r['errors']:>8}")
+        reference = baseline.get(name)
+        if reference and reference.get("p50_ms"):
+            line += f"  (p50 {100 * (r['p50_ms'] / reference['p50_ms'] - 1):+.0f}% vs référence)"
+        print(line)
+        if r["first_error"]:
+            print(f"    ⚠️ {r['first_error']}")
+
+def main():
+    """Point d'entrée en ligne de commande."""
+    parser = argparse.ArgumentParser(description="Benchmarks de bout en bout avec serveurs ElevenLabs/Gemini locaux")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Benchmarks à exécuter (tous par défaut)")
+    parser.add_argument("--iterations", type=int, help="Nombre d'appels mesurés (remplace les valeurs par défaut)")
+    parser.add_argument("--concurrency", type=int, help="Appels simultanés (remplace les valeurs par défaut)")
+    parser.add_argument("--warmup", type=int, default=1, help="Appels d'échauffement non mesurés")
+    parser.add_argument("--latency-ms", type=float, default=200, help="Latence simulée avant le premier octet")
+    parser.add_argument("--chunk-delay-ms", type=float, default=20, help="Délai simulé entre deux fragments en streaming")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Variation aléatoire relative des latences simulées")
+    parser.add_argument("--whisper-model", default="tiny", help="Modèle Whisper du benchmark de transcription")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Fichier de référence")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistre les mesures comme nouvelle référence")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Écart relatif toléré avant de signaler une régression")
+    parser.add_argument("--output", help="Fichier JSON où enregistrer les mesures")
+    parser.add_argument("--verbose", action="store_true", help="Affiche les messages de l'application pendant les mesures")
+    args = parser.parse_args()
+
+    latency = StubLatency(args.latency_ms / 1000, args.chunk_delay_ms / 1000, args.jitter)
+    elevenlabs_stub = start_elevenlabs_stub(latency)
+    gemini_stub = start_gemini_stub(latency)
+    # Variables héritées par les processus des benchmarks
+    os.environ.update({
+        "ELEVENLABS_API_KEY": "benchmark",
+        "ELEVENLABS_BASE_URL": elevenlabs_stub.url,
+        "GEMINI_API_KEY": "benchmark",
+        "GEMINI_API_ENDPOINT": gemini_stub.url,
+    })
+
+    config = {
+        "latency_ms": args.latency_ms,
+        "chunk_delay_ms": args.chunk_delay_ms,
+        "whisper_model": args.whisper_model,
+    }
+    options = {"whisper_model": args.whisper_model, "verbose": args.verbose}
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    try:
+        for name in args.only or BENCHMARKS:
+            defaults = BENCHMARKS[name]
+            iterations = args.iterations or defaults["iterations"]
+            concurrency = args.concurrency or defaults["concurrency"]
+            print(f"⏱️ {name} ({iterations} appels, {concurrency} simultanés)...", flush=True)
+            # Un processus neuf par benchmark : imports à froid, caches vides et pic de RSS propre
+            with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as work_dir:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    results[name] = executor.submit(
+                        run_benchmark, name, iterations, concurrency, args.warmup, options, work_dir
+                    ).result()
+    finally:
+        elevenlabs_stub.stop()
+        gemini_stub.stop()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        baseline = saved.get("benchmarks", {})
+        if saved.get("config") != config:
+            print(f"⚠️ La référence a été mesurée avec une autre configuration : {saved.get('config')}")
+
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "benchmarks": results}, f, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        merged = dict(baseline, **results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "benchmarks": merged}, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Référence enregistrée dans {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"\nAucune référence ({args.baseline}) : lancez avec --save-baseline pour en créer une.")
+        return 0
+
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ RÉGRESSION ({len(regressions)}) au-delà de la tolérance de {args.tolerance:.0%} :")
+        for name, metric, before, after in regressions:
+            print(f"  {name:<16} {metric:<17} référence={before}  mesuré={after}")
+        return 1
+
+    print(f"\n✅ Aucune régression par rapport à la référence (tolérance {args.tolerance:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
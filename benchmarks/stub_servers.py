@@ -0,0 +1,240 @@
+"""
+Serveurs HTTP locaux qui remplacent ElevenLabs et Gemini pendant les benchmarks.
+
+Ils rejouent des réponses enregistrées (dossier benchmarks/recordings) avec une latence
+configurable : délai avant le premier octet, délai entre deux fragments d'une réponse en
+streaming et variation aléatoire. L'application les cible via ELEVENLABS_BASE_URL et
+GEMINI_API_ENDPOINT, sans aucune modification du code testé.
+"""
+
+import base64
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+
+# Taille des fragments MP3 envoyés par le point d'accès de streaming ElevenLabs
+AUDIO_STREAM_CHUNK_BYTES = 4096
+
+class StubLatency:
+    """
+    Latence simulée d'un serveur de remplacement.
+    """
+
+    def __init__(self, first_byte=0.2, chunk_delay=0.02, jitter=0.0):
+        """
+        Args:
+            first_byte (float, optional): Délai (en secondes) avant le premier octet de la réponse.
+            chunk_delay (float, optional): Délai (en secondes) entre deux fragments d'une réponse en streaming.
+            jitter (float, optional): Variation aléatoire relative (0.1 = ±10 %) appliquée à chaque délai.
+        """
+        self.first_byte = first_byte
+        self.chunk_delay = chunk_delay
+        self.jitter = jitter
+
+    def _sleep(self, delay):
+        if delay > 0:
+            time.sleep(delay * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def wait_first_byte(self):
+        self._sleep(self.first_byte)
+
+    def wait_chunk(self):
+        self._sleep(self.chunk_delay)
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Base des gestionnaires : lecture du corps JSON, réponses et comptage des requêtes."""
+
+    latency = StubLatency()
+    stats = None
+
+    def log_message(self, format, *args):
+        # Pas de journal par requête : il fausserait les mesures
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body) if body else {}
+
+    def _count(self, route):
+        with self.stats["lock"]:
+            self.stats["requests"][route] = self.stats["requests"].get(route, 0) + 1
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, payload, status=200):
+        self._send(status, "application/json", json.dumps(payload).encode("utf-8"))
+
+    def _send_stream(self, content_type, parts):
+        """Envoie une réponse fragment par fragment (connexion fermée à la fin, sans Content-Length)."""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for index, part in enumerate(parts):
+            if index:
+                self.latency.wait_chunk()
+            self.wfile.write(part)
+            self.wfile.flush()
+        self.close_connection = True
+
+class ElevenLabsStubHandler(_StubHandler):
+    """
+    Rejoue la synthèse vocale ElevenLabs : un MP3 enregistré et un alignement des caractères
+    réparti uniformément sur sa durée.
+    """
+
+    audio = b""
+    audio_duration = 0.0
+
+    def _alignment(self, text):
+        step = self.audio_duration / max(len(text), 1)
+        return {
+            "characters": list(text),
+            "character_start_times_seconds": [round(i * step, 3) for i in range(len(text))],
+            "character_end_times_seconds": [round((i + 1) * step, 3) for i in range(len(text))],
+        }
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        match = re.fullmatch(r"/v1/text-to-speech/[^/]+(/stream)?(/with-timestamps)?", path)
+        if not match:
+            self._send_json({"detail": f"Route inconnue : {path}"}, status=404)
+            return
+
+        text = self._read_json().get("text", "")
+        streaming, timestamps = bool(match.group(1)), bool(match.group(2))
+        self._count(path.split("/", 4)[-1] if streaming or timestamps else "convert")
+        self.latency.wait_first_byte()
+
+        if timestamps and not streaming:
+            alignment = self._alignment(text)
+            self._send_json({
+                "audio_base64": base64.b64encode(self.audio).decode("ascii"),
+                "alignment": alignment,
+                "normalized_alignment": alignment,
+            })
+        elif streaming and not timestamps:
+            parts = [self.audio[i:i + AUDIO_STREAM_CHUNK_BYTES] for i in range(0, len(self.audio), AUDIO_STREAM_CHUNK_BYTES)]
+            self._send_stream("audio/mpeg", parts)
+        elif not streaming:
+            self._send(200, "audio/mpeg", self.audio)
+        else:
+            self._send_json({"detail": "Streaming avec horodatage non simulé"}, status=501)
+
+class GeminiStubHandler(_StubHandler):
+    """
+    Rejoue l'API REST Gemini (generateContent et streamGenerateContent) à partir de fragments de texte enregistrés.
+    """
+
+    chunks = []
+
+    @staticmethod
+    def _response(text, finished):
+        candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+        if finished:
+            candidate["finishReason"] = "STOP"
+        return {"candidates": [candidate]}
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        self._read_json()
+        if path.endswith(":streamGenerateContent"):
+            self._count("streamGenerateContent")
+            self.latency.wait_first_byte()
+            # Réponse en tableau JSON diffusé élément par élément (format du transport REST)
+            last = len(self.chunks) - 1
+            parts = [
+                ("[" if i == 0 else ",").encode("utf-8") + json.dumps(self._response(chunk, i == last)).encode("utf-8")
+                for i, chunk in enumerate(self.chunks)
+            ]
+            parts[-1] += b"]"
+            self._send_stream("application/json", parts)
+        elif path.endswith(":generateContent"):
+            self._count("generateContent")
+            self.latency.wait_first_byte()
+            self._send_json(self._response("".join(self.chunks), True))
+        else:
+            self._send_json({"error": {"code": 404, "message": f"Route inconnue : {path}"}}, status=404)
+
+class StubServer:
+    """
+    Serveur de remplacement exécuté dans un thread, sur un port libre de 127.0.0.1.
+    """
+
+    def __init__(self, handler_class, latency=None, **attributes):
+        """
+        Args:
+            handler_class (type): ElevenLabsStubHandler ou GeminiStubHandler.
+            latency (StubLatency, optional): Latence simulée. Par défaut: StubLatency().
+            **attributes: Réponses enregistrées à attacher au gestionnaire (audio, chunks, ...).
+        """
+        self.stats = {"lock": threading.Lock(), "requests": {}}
+        handler = type(handler_class.__name__, (handler_class,), dict(
+            attributes, latency=latency or StubLatency(), stats=self.stats
+        ))
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name=handler_class.__name__, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def request_counts(self):
+        with self.stats["lock"]:
+            return dict(self.stats["requests"])
+
+def start_elevenlabs_stub(latency=None, recording="elevenlabs_voice.mp3"):
+    """
+    Démarre un serveur ElevenLabs de remplacement.
+
+    Args:
+        latency (StubLatency, optional): Latence simulée.
+        recording (str, optional): Fichier MP3 rejoué (dans benchmarks/recordings).
+
+    Returns:
+        StubServer: Le serveur démarré.
+    """
+    # Import local : les processus des benchmarks importent ce module avant de changer de dossier de travail
+    from utils.audio_utils import mp3_audio_frames
+
+    with open(os.path.join(RECORDINGS_DIR, recording), "rb") as f:
+        audio = f.read()
+    _, duration = mp3_audio_frames(audio)
+    return StubServer(ElevenLabsStubHandler, latency, audio=audio, audio_duration=duration).start()
+
+def start_gemini_stub(latency=None, recording="gemini_script.json"):
+    """
+    Démarre un serveur Gemini de remplacement.
+
+    Args:
+        latency (StubLatency, optional): Latence simulée.
+        recording (str, optional): Réponse enregistrée rejouée (dans benchmarks/recordings).
+
+    Returns:
+        StubServer: Le serveur démarré.
+    """
+    with open(os.path.join(RECORDINGS_DIR, recording), "r", encoding="utf-8") as f:
+        chunks = json.load(f)["chunks"]
+    return StubServer(GeminiStubHandler, latency, chunks=chunks).start()
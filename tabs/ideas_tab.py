@@ -1,6 +1,34 @@
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
 import gradio as gr
-import google.generativeai as genai
+from cachetools import TTLCache
+from utils import metrics
 from utils.api_config import setup_gemini_api
+from utils.scheduler import resource_slot, scheduled
+
+# Modèles Gemini : le modèle de secours est utilisé si le principal échoue (ou tarde, en mode « hedged »)
+PRIMARY_MODEL = 'gemini-2.0-flash-exp'
+FALLBACK_MODEL = 'gemini-2.0-flash-thinking-exp-01-21'
+
+# Délai (en millisecondes) avant de lancer une requête de secours en parallèle ; 0 pour désactiver
+GEMINI_HEDGE_AFTER = int(os.getenv("GEMINI_HEDGE_AFTER_MS", "0")) / 1000 or None
+
+# Nombre de variantes de script demandées en un seul appel
+SCRIPT_VARIANTS = int(os.getenv("SCRIPT_VARIANTS", "3"))
+# Durée de conservation (en secondes) des variantes générées pour une même demande
+SCRIPT_CACHE_TTL = int(os.getenv("SCRIPT_CACHE_TTL_SECONDS", "600"))
+
+_gemini_models = {}
+_gemini_models_lock = threading.Lock()
+
+# Variantes récentes et requêtes en cours, par (prompt, langue, style, nombre de variantes)
+_variants_cache = TTLCache(maxsize=128, ttl=SCRIPT_CACHE_TTL)
+_variants_inflight = {}
+_variants_lock = threading.Lock()
 
 # def generate_script_with_gemini(prompt, language, style, sentence_length, subject):
 #     """
@@ -53,18 +81,12 @@ from utils.api_config import setup_gemini_api
 #         return f"Erreur lors de la génération du script: {str(e)}"
 
 
-def generate_script_with_gemini(prompt, language, style):
+def build_script_prompt(language, style):
     """
-    Génère un script avec l'API Gemini basé sur les paramètres fournis.
+    Construit le prompt système utilisé pour la génération du script.
     """
-    # Vérifier si l'API est configurée
-    if not setup_gemini_api():
-        return "Erreur: Clé API Gemini non configurée. Veuillez ajouter une clé API dans le fichier .env"
-    
-    try:
-        # Préparation du prompt pour Gemini
-        lang_text = language.split(" ")[1] if " " in language else language
-        system_prompt = f"""Tu es un expert en création de contenu pour les réseaux sociaux.
+    lang_text = language.split(" ")[1] if " " in language else language
+    return f"""Tu es un expert en création de contenu pour les réseaux sociaux.
         Génère un script court et accrocheur pour une vidéo {lang_text} au format court.
         Le script doit suivre un {style} et être optimisé pour capter l'attention rapidement.
         Format: Introduction accrocheuse, contenu principal avec 3-4 points clés, conclusion avec call-to-action.
@@ -78,22 +100,246 @@ def generate_script_with_gemini(prompt, language, style):
 
         IMPORTANT: Le script doit etre en 1 seul bloc de texte, sans sauts de ligne, juste un paragraphe continu.
         """
-        
-        user_prompt = prompt
 
-        # Utilisation du modèle Gemini Pro (utilisons le modèle standard qui est plus stable)
+
+def get_gemini_model(model_name):
+    """
+    Retourne une instance GenerativeModel mise en cache (une seule par nom de modèle).
+    """
+    with _gemini_models_lock:
+        if model_name not in _gemini_models:
+            # Import paresseux du SDK Gemini (déjà configuré par setup_gemini_api)
+            import google.generativeai as genai
+            _gemini_models[model_name] = genai.GenerativeModel(model_name)
+        return _gemini_models[model_name]
+
+
+def _stream_model(model_name, contents, events):
+    """
+    Diffuse la réponse d'un modèle dans une file d'événements (exécutée dans un thread).
+    """
+    try:
+        with metrics.span("gemini", model=model_name) as span:
+            start = time.perf_counter()
+            received = 0
+            response = get_gemini_model(model_name).generate_content(contents, stream=True)
+            for chunk in response:
+                if not received:
+                    span.set(first_chunk_s=round(time.perf_counter() - start, 3))
+                received += len(chunk.text.encode("utf-8"))
+                events.put((model_name, "chunk", chunk.text))
+            span.set(bytes=received)
+        events.put((model_name, "done", None))
+    except Exception as e:
+        events.put((model_name, "error", e))
+
+
+def iter_script_chunks(contents, hedge_after=None):
+    """
+    Produit les fragments de texte du script au fur et à mesure de leur réception.
+
+    Le modèle principal est interrogé en premier. Le modèle de secours est lancé dès que le
+    principal échoue, ou, en mode « hedged », si le principal n'a produit aucun fragment après
+    hedge_after secondes : le premier modèle qui répond est conservé, l'autre est ignoré.
+
+    Args:
+        contents (list): Prompt système et prompt utilisateur.
+        hedge_after (float, optional): Délai (en secondes) avant de lancer le modèle de secours. None pour désactiver.
+
+    Yields:
+        str: Fragments de texte du modèle retenu.
+    """
+    events = queue.Queue()
+    started = []
+    errors = {}
+    winner = None
+
+    def start(model_name):
+        started.append(model_name)
+        threading.Thread(target=metrics.propagate_context(_stream_model), args=(model_name, contents, events), daemon=True).start()
+
+    start(PRIMARY_MODEL)
+    while True:
+        hedging = winner is None and hedge_after and FALLBACK_MODEL not in started
         try:
-            model = genai.GenerativeModel('gemini-2.0-flash-exp')
-            response = model.generate_content([system_prompt, user_prompt])
-            return response.text
-        except:
-            # Fallback sur un autre modèle si le premier échoue
-            model = genai.GenerativeModel('gemini-2.0-flash-thinking-exp-01-21')
-            response = model.generate_content([system_prompt, user_prompt])
-            return response.text
-            
+            model_name, kind, payload = events.get(timeout=hedge_after if hedging else None)
+        except queue.Empty:
+            # Le modèle principal tarde à répondre : requête de secours en parallèle
+            start(FALLBACK_MODEL)
+            continue
+
+        if winner is not None and model_name != winner:
+            continue
+
+        if kind == "error":
+            if winner == model_name:
+                raise payload
+            errors[model_name] = payload
+            if FALLBACK_MODEL not in started:
+                # Fallback sur un autre modèle si le premier échoue
+                start(FALLBACK_MODEL)
+            elif len(errors) == len(started):
+                raise errors[PRIMARY_MODEL]
+            continue
+
+        winner = model_name
+        if kind == "done":
+            return
+        yield payload
+
+
+def stream_script_with_gemini(prompt, language, style):
+    """
+    Génère un script avec l'API Gemini et le diffuse au fur et à mesure (texte cumulé).
+    """
+    # Vérifier si l'API est configurée
+    if not setup_gemini_api():
+        yield "Erreur: Clé API Gemini non configurée. Veuillez ajouter une clé API dans le fichier .env"
+        return
+
+    script = ""
+    try:
+        for chunk in iter_script_chunks([build_script_prompt(language, style), prompt], GEMINI_HEDGE_AFTER):
+            script += chunk
+            yield script
     except Exception as e:
-        return f"Erreur lors de la génération du script: {str(e)}"
+        yield f"Erreur lors de la génération du script: {str(e)}"
+
+
+def build_variants_prompt(language, style, count):
+    """
+    Construit le prompt système demandant plusieurs variantes du script dans une réponse JSON.
+    """
+    return build_script_prompt(language, style) + f"""
+        Propose {count} variantes différentes de ce script (angle, accroche et ton différents).
+        Réponds uniquement en JSON : une liste de {count} objets {{"titre": "...", "script": "..."}},
+        où "titre" résume l'angle de la variante en quelques mots et "script" contient le script en Markdown.
+        """
+
+
+def parse_variants(text):
+    """
+    Extrait les variantes d'une réponse JSON de Gemini.
+
+    Returns:
+        list: Variantes {"titre", "script"} non vides.
+
+    Raises:
+        ValueError: Si la réponse ne contient aucune variante exploitable.
+    """
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("variantes") or data.get("variants") or [data]
+    variants = []
+    for item in data:
+        if isinstance(item, str):
+            item = {"script": item}
+        script = (item.get("script") or "").strip()
+        if script:
+            variants.append({"titre": (item.get("titre") or "").strip() or f"Variante {len(variants) + 1}", "script": script})
+    if not variants:
+        raise ValueError("La réponse de Gemini ne contient aucune variante")
+    return variants
+
+
+def _request_variants(contents, count):
+    """
+    Demande les variantes en un seul appel (réponse JSON), avec repli sur le modèle de secours.
+    """
+    errors = []
+    for model_name in (PRIMARY_MODEL, FALLBACK_MODEL):
+        try:
+            with metrics.span("gemini", model=model_name, variants=count) as span:
+                response = get_gemini_model(model_name).generate_content(
+                    contents, generation_config={"response_mime_type": "application/json"}
+                )
+                variants = parse_variants(response.text)
+                span.set(bytes=len(response.text.encode("utf-8")))
+            return variants[:count]
+        except Exception as e:
+            errors.append(e)
+    raise errors[0]
+
+
+def generate_script_variants(prompt, language, style, count=SCRIPT_VARIANTS, refresh=False):
+    """
+    Génère plusieurs variantes du script en un seul appel à Gemini.
+
+    Les demandes identiques (prompt, langue, style) reçues pendant qu'un appel est en cours
+    attendent son résultat au lieu de relancer Gemini ; les résultats récents sont gardés
+    SCRIPT_CACHE_TTL secondes. Seul l'appel effectif à Gemini occupe un emplacement de la
+    classe « network » : les demandes servies par le cache ou en attente n'en prennent pas.
+
+    Args:
+        prompt (str): Idée de la vidéo.
+        language (str): Libellé de la langue.
+        style (str): Style du script.
+        count (int, optional): Nombre de variantes. Par défaut: SCRIPT_VARIANTS.
+        refresh (bool, optional): Ignore le cache pour obtenir de nouvelles variantes. Par défaut: False.
+
+    Returns:
+        list: Variantes {"titre", "script"}.
+    """
+    key = ((prompt or "").strip(), language, style, int(count))
+    with _variants_lock:
+        if not refresh and key in _variants_cache:
+            metrics.record_cache("gemini_variants", True)
+            return _variants_cache[key]
+        future = _variants_inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _variants_inflight[key] = Future()
+
+    if not owner:
+        # Une requête identique est déjà en cours : son résultat est partagé
+        metrics.increment("shortgen_coalesced_requests_total", stage="gemini_variants")
+        return future.result()
+
+    metrics.record_cache("gemini_variants", False)
+    try:
+        with resource_slot("network"):
+            variants = _request_variants([build_variants_prompt(language, style, count), prompt], count)
+    except Exception as e:
+        with _variants_lock:
+            del _variants_inflight[key]
+        future.set_exception(e)
+        raise
+    with _variants_lock:
+        _variants_cache[key] = variants
+        del _variants_inflight[key]
+    future.set_result(variants)
+    return variants
+
+
+def propose_script_variants(prompt, language, style, refresh=False):
+    """
+    Propose plusieurs variantes du script (événements des boutons de variantes) ; la première est affichée.
+
+    Returns:
+        tuple: (variantes, mise à jour du choix de variante, script affiché, script de l'éditeur).
+    """
+    # Vérifier si l'API est configurée
+    if not setup_gemini_api():
+        raise gr.Error("Clé API Gemini non configurée. Veuillez ajouter une clé API dans le fichier .env")
+    try:
+        variants = generate_script_variants(prompt, language, style, refresh=refresh)
+    except gr.Error:
+        raise
+    except Exception as e:
+        raise gr.Error(f"Erreur lors de la génération des variantes: {str(e)}")
+    choices = [(f"{i + 1}. {variant['titre']}", str(i)) for i, variant in enumerate(variants)]
+    script = variants[0]["script"]
+    return variants, gr.update(choices=choices, value="0", visible=True), script, script
+
+
+def generate_script_with_gemini(prompt, language, style):
+    """
+    Génère un script avec l'API Gemini basé sur les paramètres fournis.
+    """
+    script = ""
+    for script in stream_script_with_gemini(prompt, language, style):
+        pass
+    return script
 
 
 def create_ideas_tab():
@@ -102,7 +348,7 @@ def create_ideas_tab():
     """
     with gr.TabItem("💡 Idées") as ideas_tab:
         # Notification de statut de l'API
-        api_available = setup_gemini_api()
+        api_available = setup_gemini_api(configure=False)
         if not api_available:
             gr.Markdown("""⚠️ **API Gemini non configurée**. 
             Veuillez créer un fichier `.env` avec votre clé API au format: `GEMINI_API_KEY=votre_clé_api`""", 
@@ -138,6 +384,23 @@ def create_ideas_tab():
                         elem_classes="primary-button"
                     )
 
+        # Variantes du script générées en un seul appel
+        with gr.Row():
+            variants_btn = gr.Button(
+                f"Proposer {SCRIPT_VARIANTS} variantes 10 ⚡",
+                elem_classes="secondary-button"
+            )
+            more_variants_btn = gr.Button(
+                "Autres variantes 🔄",
+                elem_classes="secondary-button"
+            )
+        variants = gr.State([])
+        variant_choice = gr.Radio(
+            choices=[],
+            label="Variantes proposées",
+            visible=False
+        )
+
         # Zone du script en markdown
         gr.Markdown("### Votre script 📄")
         
@@ -157,7 +420,7 @@ def create_ideas_tab():
             apply_edit_btn = gr.Button("Appliquer les modifications", elem_classes="secondary-button")
         
         generate_script_btn.click(
-            fn=generate_script_with_gemini,
+            fn=scheduled("network")(stream_script_with_gemini),
             inputs=[prompt, language, style],
             outputs=script_output
         ).then(
@@ -166,6 +429,29 @@ def create_ideas_tab():
             outputs=[script_output, script_editor]
         )
         
+        variants_btn.click(
+            # Pas de @scheduled : l'emplacement réseau est pris uniquement pour l'appel à Gemini
+            fn=metrics.traced(propose_script_variants),
+            inputs=[prompt, language, style],
+            outputs=[variants, variant_choice, script_output, script_editor]
+        )
+        more_variants_btn.click(
+            fn=metrics.traced(lambda prompt, language, style: propose_script_variants(prompt, language, style, refresh=True)),
+            inputs=[prompt, language, style],
+            outputs=[variants, variant_choice, script_output, script_editor]
+        )
+
+        # Sélection d'une variante : elle remplace le script affiché et celui de l'éditeur
+        def select_variant(variants, choice):
+            script = variants[int(choice)]["script"]
+            return script, script
+
+        variant_choice.input(
+            fn=select_variant,
+            inputs=[variants, variant_choice],
+            outputs=[script_output, script_editor]
+        )
+
         # Événement pour appliquer les modifications manuelles au script
         def apply_script_edit(edited_script):
             return edited_script
@@ -176,4 +462,4 @@ def create_ideas_tab():
             outputs=script_output
         )
         
-    return ideas_tab, script_output, script_editor
\ No newline at end of file
+    return ideas_tab, script_output, script_editor, language
\ No newline at end of file
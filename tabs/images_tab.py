@@ -1,13 +1,32 @@
-from email.mime import image
-from exceptiongroup import catch
+import threading
 import gradio as gr
 from utils.file_utils import load_images
+from utils.diffusion_service import DEFAULT_GUIDANCE, DEFAULT_STEPS, DiffusionService
+from utils.scheduler import scheduled
+from utils.template_index import get_template_index
 
-from diffusers import DiffusionPipeline
+# Le pipeline de diffusion est chargé à la première utilisation (ou par le préchargement
+# en arrière-plan lancé après demo.launch()) plutôt qu'à l'import du module
+_image_generator = None
+_image_generator_lock = threading.Lock()
 
-image_generator = DiffusionPipeline.from_pretrained("CompVis/ldm-text2im-large-256")
-# image_generator.device = "cpu"
-image_generator.to("cpu")
+def get_image_generator():
+    """
+    Retourne le pipeline de diffusion, en le chargeant au premier appel.
+    """
+    global _image_generator
+    with _image_generator_lock:
+        if _image_generator is None:
+            from diffusers import DiffusionPipeline
+
+            image_generator = DiffusionPipeline.from_pretrained("CompVis/ldm-text2im-large-256")
+            # image_generator.device = "cpu"
+            image_generator.to("cpu")
+            _image_generator = image_generator
+        return _image_generator
+
+# Service de génération par micro-lots, avec cache des images déjà générées
+diffusion_service = DiffusionService(get_image_generator)
 
 def create_images_tab():
     """
@@ -17,6 +36,15 @@ def create_images_tab():
         gr.Markdown("## Images et médias")
         
         with gr.Tabs():
+            with gr.TabItem("Modèles"):
+                # Miniatures précalculées par l'index des modèles (chargées à l'ouverture de la page)
+                gr.Gallery(
+                    value=lambda: get_template_index().thumbnails(),
+                    label="Images modèles",
+                    columns=3,
+                    height="auto"
+                )
+
             with gr.TabItem("Télécharger"):
                 image_upload = gr.File(label="Télécharger vos propres images", file_types=["image"])
             
@@ -37,21 +65,29 @@ def create_images_tab():
                             placeholder="Image basse resolution...",
                             elem_classes="input-box"
                         )
+                        # Réglages vitesse/qualité
+                        with gr.Row():
+                            inference_steps = gr.Slider(minimum=5, maximum=100, value=DEFAULT_STEPS, step=5, label="Étapes d'inférence")
+                            guidance_scale = gr.Slider(minimum=1.0, maximum=15.0, value=DEFAULT_GUIDANCE, step=0.5, label="Guidance")
+                            seed = gr.Number(value=-1, precision=0, label="Graine (-1 = aléatoire)")
+                        # Graine effectivement utilisée (à recopier dans le champ Graine pour reproduire l'image)
+                        used_seed_output = gr.Number(precision=0, label="Graine utilisée", interactive=False)
                         generate_image_btn = gr.Button("Générer une image", elem_classes="secondary-button")
                 
                 # Fonction pour générer l'image
-                def generate_image(prompt, negative):
+                @scheduled("diffusion")
+                def generate_image(prompt, negative, steps, guidance, image_seed):
                     try:
-                        image = image_generator(prompt, negative).images[0]
-                        return image
+                        image, used_seed = diffusion_service.generate(prompt, negative, image_seed, steps, guidance)
+                        return image, used_seed
                     except Exception as e:
-                        return f"Erreur lors de la génération de l'image: {str(e)}"
+                        raise gr.Error(f"Erreur lors de la génération de l'image: {str(e)}")
                 
                 # Connection du bouton à la fonction de génération
                 generate_image_btn.click(
                     fn=generate_image, 
-                    inputs=[image_prompt, negative_promt], 
-                    outputs=[generated_image]
+                    inputs=[image_prompt, negative_promt, inference_steps, guidance_scale, seed], 
+                    outputs=[generated_image, used_seed_output]
                 )
    
-    return images_tab
\ No newline at end of file
+    return images_tab, image_upload
\ No newline at end of file
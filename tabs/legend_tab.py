@@ -18,5 +18,6 @@ def create_legend_tab():
             label="Position de la légende",
             value="Bas"
         )
+        burn_captions = gr.Checkbox(label="Incruster les sous-titres dans la vidéo", value=True)
         
-    return legend_tab
\ No newline at end of file
+    return legend_tab, legend_style, legend_size, legend_color, legend_position, burn_captions
\ No newline at end of file
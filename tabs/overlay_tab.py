@@ -17,5 +17,6 @@ def create_overlay_tab():
             value="Coin inférieur droit"
         )
         overlay_opacity = gr.Slider(minimum=0.1, maximum=1.0, value=0.8, step=0.1, label="Opacité")
+        overlay_file = gr.File(label="Image du logo ou du filigrane", file_types=["image"])
         
-    return overlay_tab
\ No newline at end of file
+    return overlay_tab, overlay_type, overlay_position, overlay_opacity, overlay_file
\ No newline at end of file
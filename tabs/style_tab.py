@@ -17,5 +17,10 @@ def create_style_tab():
             value="9:16 (Stories/Shorts)"
         )
         video_duration = gr.Slider(minimum=15, maximum=60, value=30, step=5, label="Durée (secondes)")
+        encoder_preset = gr.Radio(
+            choices=["Rapide", "Équilibré", "Compact"],
+            label="Encodage (vitesse de rendu / taille du fichier)",
+            value="Équilibré"
+        )
         
-    return style_tab
\ No newline at end of file
+    return style_tab, video_ratio, video_duration, encoder_preset
\ No newline at end of file
@@ -1,6 +1,5 @@
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
 
 # Chargement des variables d'environnement
 load_dotenv()
@@ -16,11 +15,23 @@ def setup_elevenlabs_api():
     return True
 
 # Configuration de l'API Gemini
-def setup_gemini_api():
+# configure=False vérifie seulement la présence de la clé, sans importer le SDK (utile au démarrage)
+def setup_gemini_api(configure=True):
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         print("⚠️ Clé API Gemini non trouvée. Veuillez définir GEMINI_API_KEY dans un fichier .env")
         return False
     
-    genai.configure(api_key=api_key)
+    if not configure:
+        return True
+
+    # Import paresseux : le SDK Gemini n'est chargé qu'à la première configuration
+    import google.generativeai as genai
+
+    # GEMINI_API_ENDPOINT permet de cibler un serveur compatible local (tests, benchmarks)
+    endpoint = os.getenv("GEMINI_API_ENDPOINT")
+    if endpoint:
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": endpoint})
+    else:
+        genai.configure(api_key=api_key)
     return True
\ No newline at end of file
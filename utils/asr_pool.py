@@ -0,0 +1,183 @@
+"""
+Ce module gère un pool de processus de transcription Whisper de longue durée.
+
+Chaque processus charge son modèle une seule fois (via le registre de srt_utils) avec un nombre
+de threads PyTorch limité, ce qui sort l'inférence du processus du serveur Gradio (CPU et GIL).
+Les processus sont recyclés après un nombre fixe de transcriptions pour borner la croissance
+de la mémoire. Le pool sert aussi à transcrire en parallèle les morceaux d'un long audio
+découpé sur les silences (voir transcribe_chunks_in_pool).
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+
+# Nombre de processus de transcription (0 = transcription dans le processus courant)
+WHISPER_POOL_SIZE = int(os.getenv("WHISPER_POOL_SIZE", "0"))
+# Nombre de processus démarrés pour la transcription parallèle par morceaux lorsque WHISPER_POOL_SIZE vaut 0
+WHISPER_CHUNK_WORKERS = int(os.getenv("WHISPER_CHUNK_WORKERS", "0")) or max(1, min(4, (os.cpu_count() or 1) // 2))
+# Nombre de processus effectivement démarrés par get_asr_pool
+_POOL_PROCESSES = WHISPER_POOL_SIZE or WHISPER_CHUNK_WORKERS
+# Nombre de threads PyTorch par processus
+WHISPER_POOL_THREADS = int(os.getenv("WHISPER_POOL_THREADS", "0")) or max(1, (os.cpu_count() or 1) // _POOL_PROCESSES)
+# Nombre de transcriptions avant recyclage d'un processus
+WHISPER_POOL_MAX_JOBS = int(os.getenv("WHISPER_POOL_MAX_JOBS", "20"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_worker_stats = {}
+_worker_stats_lock = threading.Lock()
+
+# État propre à chaque processus du pool
+_worker_started = None
+
+def _init_worker(model_size, device, backend, torch_threads):
+    """Initialise un processus du pool : threads PyTorch et préchargement du modèle."""
+    global _worker_started
+    import torch
+    torch.set_num_threads(torch_threads)
+
+    _worker_started = time.time()
+    # Un échec de préchargement ne doit pas lever d'exception : le pool relancerait le processus
+    # indéfiniment. Le modèle sera alors chargé (ou l'erreur remontée) à la première transcription.
+    try:
+        from utils.srt_utils import get_whisper_model
+        get_whisper_model(model_size, device, backend)
+    except Exception as e:
+        print(f"Échec du préchargement du modèle Whisper '{model_size}' dans le processus {os.getpid()} : {e}")
+
+def _transcribe_job(audio_file_path, model_size, device, backend, options):
+    """Transcrit un fichier (ou un signal) dans un processus du pool et retourne le résultat avec le temps d'occupation."""
+    from utils.srt_utils import get_asr_backend, get_whisper_model
+
+    start = time.perf_counter()
+    model = get_whisper_model(model_size, device, backend)
+    result = get_asr_backend(backend).transcribe(model, audio_file_path, **options)
+    return {
+        "pid": os.getpid(),
+        "started": _worker_started,
+        "busy": time.perf_counter() - start,
+        "result": {
+            "text": result["text"],
+            "language": result.get("language"),
+            "segments": result["segments"],
+        },
+    }
+
+def pool_enabled():
+    """Indique si la transcription doit passer par le pool de processus."""
+    return WHISPER_POOL_SIZE > 0
+
+def get_asr_pool(model_size=None, device=None, backend=None):
+    """
+    Retourne le pool de transcription, en le démarrant au premier appel.
+
+    Args:
+        model_size (str, optional): Modèle préchargé dans chaque processus. Par défaut: WHISPER_WARMUP_MODEL.
+        device (str, optional): Périphérique d'inférence. Par défaut: "cpu".
+        backend (str, optional): Backend du modèle préchargé. Par défaut: WHISPER_BACKEND.
+
+    Returns:
+        multiprocessing.pool.Pool: Le pool de processus.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from utils.srt_utils import WHISPER_BACKEND, WHISPER_WARMUP_MODEL
+            # "spawn" évite de dupliquer les threads du serveur Gradio dans les processus enfants
+            context = multiprocessing.get_context("spawn")
+            _pool = context.Pool(
+                processes=_POOL_PROCESSES,
+                initializer=_init_worker,
+                initargs=(model_size or WHISPER_WARMUP_MODEL or "base", device or "cpu", backend or WHISPER_BACKEND, WHISPER_POOL_THREADS),
+                maxtasksperchild=WHISPER_POOL_MAX_JOBS,
+            )
+            atexit.register(shutdown_asr_pool)
+        return _pool
+
+def _record_job(job):
+    with _worker_stats_lock:
+        stats = _worker_stats.setdefault(job["pid"], {"jobs": 0, "busy": 0.0, "started": job["started"]})
+        stats["jobs"] += 1
+        stats["busy"] += job["busy"]
+    return job["result"]
+
+def transcribe_in_pool(audio_file_path, model_size="base", device=None, backend=None, **options):
+    """
+    Soumet une transcription au pool et attend les segments.
+
+    Args:
+        audio_file_path (str): Chemin vers le fichier audio.
+        model_size (str, optional): Taille du modèle Whisper. Par défaut: "base".
+        device (str, optional): Périphérique d'inférence. Par défaut: "cpu".
+        backend (str, optional): Backend de transcription. Par défaut: WHISPER_BACKEND.
+        **options: Options transmises à model.transcribe (language, initial_prompt, ...).
+
+    Returns:
+        dict: Résultat Whisper ("text", "language", "segments").
+    """
+    job = get_asr_pool().apply(_transcribe_job, (audio_file_path, model_size, device or "cpu", backend, options))
+    return _record_job(job)
+
+def transcribe_chunks_in_pool(chunks, model_size="base", device=None, backend=None, initial_prompt=None, **options):
+    """
+    Transcrit plusieurs signaux en parallèle dans le pool.
+
+    Args:
+        chunks (list): Signaux (numpy.ndarray à 16 kHz) à transcrire.
+        model_size (str, optional): Taille du modèle Whisper. Par défaut: "base".
+        device (str, optional): Périphérique d'inférence. Par défaut: "cpu".
+        backend (str, optional): Backend de transcription. Par défaut: WHISPER_BACKEND.
+        initial_prompt (str, optional): Contexte initial du premier signal uniquement (début du texte attendu).
+        **options: Options transmises à model.transcribe pour chaque signal.
+
+    Yields:
+        dict: Résultat Whisper de chaque signal, dans l'ordre des signaux (dès qu'il est disponible).
+    """
+    jobs = [
+        (chunk, model_size, device or "cpu", backend, dict(options, initial_prompt=initial_prompt if i == 0 else None))
+        for i, chunk in enumerate(chunks)
+    ]
+    for job in get_asr_pool(model_size, device, backend).imap(_star_transcribe_job, jobs):
+        yield _record_job(job)
+
+def _star_transcribe_job(args):
+    return _transcribe_job(*args)
+
+def get_asr_pool_stats():
+    """
+    Retourne l'utilisation de chaque processus du pool.
+
+    Returns:
+        dict: Taille du pool, paramètres et, par processus, nombre de transcriptions, temps occupé et taux d'utilisation.
+    """
+    now = time.time()
+    with _worker_stats_lock:
+        workers = {
+            pid: {
+                "jobs": stats["jobs"],
+                "busy_s": round(stats["busy"], 2),
+                "utilization": round(stats["busy"] / max(now - stats["started"], 1e-6), 3) if stats["started"] else None,
+                # Un processus ayant atteint WHISPER_POOL_MAX_JOBS a été recyclé
+                "recycled": stats["jobs"] >= WHISPER_POOL_MAX_JOBS,
+            }
+            for pid, stats in _worker_stats.items()
+        }
+    return {
+        "size": _POOL_PROCESSES,
+        "torch_threads": WHISPER_POOL_THREADS,
+        "max_jobs_per_worker": WHISPER_POOL_MAX_JOBS,
+        "running": _pool is not None,
+        "workers": workers,
+    }
+
+def shutdown_asr_pool():
+    """Arrête les processus du pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.terminate()
+            _pool.join()
+            _pool = None
@@ -0,0 +1,276 @@
+"""
+Ce module mixe la voix off et la musique de fond en flux : les deux pistes sont décodées par
+ffmpeg en blocs PCM (float32), traitées bloc par bloc avec NumPy/SciPy puis envoyées
+directement à un second processus ffmpeg qui encode le résultat en une seule passe.
+
+Traitements appliqués :
+- normalisation de la sonie (mesure BS.1770 : pondération K et fenêtres de 400 ms avec seuils),
+- atténuation de la musique sous la voix (ducking piloté par l'enveloppe de la voix),
+- musique bouclée ou coupée à la durée de la voix, avec fondus d'entrée et de sortie.
+
+Les filtres (pondération K, enveloppe, lissage du gain) gardent leur état d'un bloc à
+l'autre : seul le bloc courant est en mémoire, quelle que soit la durée des pistes.
+"""
+
+import os
+import shutil
+import subprocess
+
+import numpy as np
+from scipy.signal import lfilter
+
+# Format de travail du mixage
+MIX_SAMPLE_RATE = 48000
+MIX_CHANNELS = 2
+BLOCK_SECONDS = 0.4  # Taille d'un bloc (égale à la fenêtre de mesure de la sonie)
+
+# Niveaux par défaut
+VOICE_TARGET_LUFS = float(os.getenv("MIX_VOICE_LUFS", "-16"))
+MUSIC_LEVEL_DB = float(os.getenv("MIX_MUSIC_LEVEL_DB", "-10"))  # Musique par rapport à la voix, hors ducking
+DUCKING_DB = float(os.getenv("MIX_DUCKING_DB", "10"))  # Atténuation supplémentaire sous la voix
+MUSIC_FADE_SECONDS = 1.5
+# Durée maximale de musique analysée pour mesurer sa sonie
+MAX_ANALYSIS_SECONDS = 120
+
+# Détection de la voix pour le ducking : seuil de l'enveloppe et constantes de temps
+DUCK_THRESHOLD_DB = -40.0
+ENVELOPE_SECONDS = 0.05
+DUCK_SMOOTHING_SECONDS = 0.25
+
+# Pondération K de la norme ITU-R BS.1770 à 48 kHz (filtre en plateau puis passe-haut)
+K_WEIGHTING = (
+    (np.array([1.53512485958697, -2.69169618940638, 1.19839281085285]), np.array([1.0, -1.69065929318241, 0.73248077421585])),
+    (np.array([1.0, -2.0, 1.0]), np.array([1.0, -1.99004745483398, 0.99007225036621])),
+)
+
+class PcmReader:
+    """
+    Lecture d'une piste audio décodée par ffmpeg en PCM float32 entrelacé, bloc par bloc.
+    """
+
+    def __init__(self, path, loop=False, sample_rate=MIX_SAMPLE_RATE, channels=MIX_CHANNELS):
+        """
+        Args:
+            path (str): Fichier audio (tout format lu par ffmpeg).
+            loop (bool, optional): Relit la piste indéfiniment. Par défaut: False.
+            sample_rate (int, optional): Fréquence de sortie. Par défaut: 48000.
+            channels (int, optional): Nombre de canaux de sortie. Par défaut: 2.
+        """
+        self.channels = channels
+        command = ["ffmpeg", "-loglevel", "error"]
+        if loop:
+            command += ["-stream_loop", "-1"]
+        command += ["-i", path, "-vn", "-f", "f32le", "-acodec", "pcm_f32le", "-ac", str(channels), "-ar", str(sample_rate), "-"]
+        self._process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.finished = False
+
+    def read(self, frames):
+        """
+        Lit jusqu'à frames échantillons par canal.
+
+        Returns:
+            numpy.ndarray: Bloc (échantillons, canaux) en float32 ; plus court (ou vide) en fin de piste.
+        """
+        buffer = bytearray(frames * self.channels * 4)
+        view = memoryview(buffer)
+        filled = 0
+        while filled < len(buffer):
+            count = self._process.stdout.readinto(view[filled:])
+            if not count:
+                self.finished = True
+                break
+            filled += count
+        filled -= filled % (self.channels * 4)
+        return np.frombuffer(buffer, dtype=np.float32, count=filled // 4).reshape(-1, self.channels)
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.stdout.close()
+        self._process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+class LoudnessMeter:
+    """
+    Mesure de la sonie intégrée (LUFS) selon BS.1770, alimentée bloc par bloc.
+
+    Seule l'énergie de chaque fenêtre de 400 ms est conservée (un nombre par fenêtre).
+    """
+
+    def __init__(self, channels=MIX_CHANNELS):
+        self._states = [np.zeros((2, channels)) for _ in K_WEIGHTING]
+        self._energies = []
+        self.frames = 0
+
+    def add(self, block):
+        """Ajoute un bloc (échantillons, canaux) à la mesure."""
+        if not len(block):
+            return
+        weighted = block
+        for i, (b, a) in enumerate(K_WEIGHTING):
+            weighted, self._states[i] = lfilter(b, a, weighted, axis=0, zi=self._states[i])
+        self._energies.append(float(np.square(weighted).mean(axis=0).sum()))
+        self.frames += len(block)
+
+    def integrated(self):
+        """
+        Retourne la sonie intégrée en LUFS, ou None pour une piste silencieuse.
+
+        Les fenêtres sous -70 LUFS puis celles à plus de 10 LU sous la moyenne sont ignorées.
+        """
+        energies = np.array(self._energies)
+        loudness = -0.691 + 10 * np.log10(energies + 1e-12)
+        gated = energies[loudness > -70]
+        if not len(gated):
+            return None
+        relative = -0.691 + 10 * np.log10(gated.mean()) - 10
+        gated = energies[(loudness > -70) & (loudness > relative)]
+        return float(-0.691 + 10 * np.log10(gated.mean()))
+
+def measure_loudness(path, max_seconds=None):
+    """
+    Mesure la sonie intégrée d'un fichier audio en le lisant bloc par bloc.
+
+    Args:
+        path (str): Fichier audio.
+        max_seconds (float, optional): Durée maximale analysée. Par défaut: toute la piste.
+
+    Returns:
+        tuple: (sonie en LUFS ou None si silencieux, durée analysée en secondes).
+    """
+    block = int(BLOCK_SECONDS * MIX_SAMPLE_RATE)
+    limit = int(max_seconds * MIX_SAMPLE_RATE) if max_seconds else None
+    meter = LoudnessMeter()
+    with PcmReader(path) as reader:
+        while not reader.finished and (limit is None or meter.frames < limit):
+            meter.add(reader.read(block))
+    return meter.integrated(), meter.frames / MIX_SAMPLE_RATE
+
+def _gain_for(loudness, target):
+    """Gain linéaire qui amène une sonie mesurée à la cible (gain unitaire pour une piste silencieuse)."""
+    return 1.0 if loudness is None else 10 ** ((target - loudness) / 20)
+
+def _one_pole(seconds, sample_rate=MIX_SAMPLE_RATE):
+    """Coefficients (b, a) d'un lissage exponentiel de constante de temps donnée."""
+    alpha = 1 - np.exp(-1 / (seconds * sample_rate))
+    return np.array([alpha]), np.array([1.0, alpha - 1])
+
+class Ducker:
+    """
+    Gain de la musique piloté par la voix : atténuation de ducking_db pendant la parole,
+    avec des transitions lissées. L'état des filtres est conservé d'un bloc à l'autre.
+    """
+
+    def __init__(self, ducking_db=DUCKING_DB, threshold_db=DUCK_THRESHOLD_DB):
+        self._envelope = _one_pole(ENVELOPE_SECONDS)
+        self._smoothing = _one_pole(DUCK_SMOOTHING_SECONDS)
+        self._envelope_state = np.zeros(1)
+        self._gain_state = np.array([1.0 - self._smoothing[0][0]])  # Gain initial de 1 (pas d'atténuation)
+        self._threshold = 10 ** (threshold_db / 10)  # Seuil sur la puissance
+        self._ducked = 10 ** (-ducking_db / 20)
+
+    def gains(self, voice):
+        """
+        Calcule le gain de la musique pour chaque échantillon d'un bloc de voix.
+
+        Args:
+            voice (numpy.ndarray): Bloc de voix (échantillons, canaux), déjà normalisé.
+
+        Returns:
+            numpy.ndarray: Gains (échantillons, 1).
+        """
+        power = np.square(voice).mean(axis=1)
+        envelope, self._envelope_state = lfilter(*self._envelope, power, zi=self._envelope_state)
+        target = np.where(envelope > self._threshold, self._ducked, 1.0)
+        gains, self._gain_state = lfilter(*self._smoothing, target, zi=self._gain_state)
+        return gains[:, None]
+
+def _fade(start, count, total, fade):
+    """Enveloppe des fondus d'entrée et de sortie de la musique pour les échantillons [start, start + count)."""
+    positions = np.arange(start, start + count)
+    return np.clip(np.minimum(positions, total - positions) / fade, 0.0, 1.0)[:, None]
+
+def build_encoder_command(output_path, sample_rate=MIX_SAMPLE_RATE, channels=MIX_CHANNELS):
+    """
+    Construit la commande ffmpeg qui encode le mixage reçu en PCM float32 sur l'entrée standard.
+
+    Le codec dépend de l'extension : AAC pour .m4a/.aac, MP3 sinon.
+    """
+    codec = ["-c:a", "aac", "-b:a", "192k"] if output_path.endswith((".m4a", ".aac")) else ["-c:a", "libmp3lame", "-b:a", "192k"]
+    return [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "f32le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "-",
+        *codec, output_path,
+    ]
+
+def mix_voice_and_music(voice_path, music_path, output_path, voice_lufs=VOICE_TARGET_LUFS, music_level_db=MUSIC_LEVEL_DB,
+                        ducking_db=DUCKING_DB, loop_music=True, fade_seconds=MUSIC_FADE_SECONDS):
+    """
+    Mixe une voix off et une musique de fond, à la durée de la voix.
+
+    Args:
+        voice_path (str): Voix off.
+        music_path (str): Musique de fond.
+        output_path (str): Fichier de sortie (.mp3, ou .m4a pour de l'AAC).
+        voice_lufs (float, optional): Sonie cible de la voix (LUFS). Par défaut: -16.
+        music_level_db (float, optional): Niveau de la musique par rapport à la voix, hors ducking. Par défaut: -10.
+        ducking_db (float, optional): Atténuation de la musique pendant la parole. Par défaut: 10.
+        loop_music (bool, optional): Boucle la musique si elle est plus courte que la voix (sinon silence). Par défaut: True.
+        fade_seconds (float, optional): Durée des fondus d'entrée et de sortie de la musique. Par défaut: 1.5.
+
+    Returns:
+        str: Chemin du fichier mixé.
+
+    Raises:
+        RuntimeError: Si ffmpeg est introuvable ou échoue.
+    """
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg est introuvable. Veuillez l'installer et l'ajouter au PATH")
+
+    # Première passe (mesure seule, en flux) : sonie et durée de la voix, sonie de la musique
+    voice_loudness, voice_seconds = measure_loudness(voice_path)
+    music_loudness, _ = measure_loudness(music_path, max_seconds=MAX_ANALYSIS_SECONDS)
+    voice_gain = _gain_for(voice_loudness, voice_lufs)
+    music_gain = _gain_for(music_loudness, voice_lufs + music_level_db)
+
+    total = int(round(voice_seconds * MIX_SAMPLE_RATE))
+    fade = max(1, min(int(fade_seconds * MIX_SAMPLE_RATE), total // 2))
+    block = int(BLOCK_SECONDS * MIX_SAMPLE_RATE)
+    ducker = Ducker(ducking_db)
+
+    encoder = subprocess.Popen(build_encoder_command(output_path), stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    position = 0
+    try:
+        with PcmReader(voice_path) as voice_reader, PcmReader(music_path, loop=loop_music) as music_reader:
+            while not voice_reader.finished:
+                voice = voice_reader.read(block)
+                if not len(voice):
+                    break
+                # La musique est lue au rythme de la voix : elle s'arrête avec elle
+                music = music_reader.read(len(voice))
+                if len(music) < len(voice):
+                    music = np.concatenate([music, np.zeros((len(voice) - len(music), MIX_CHANNELS), dtype=np.float32)])
+
+                voice = voice * voice_gain
+                music = music * (music_gain * ducker.gains(voice) * _fade(position, len(voice), total, fade))
+                mixed = np.clip(voice + music, -1.0, 1.0).astype(np.float32)
+                encoder.stdin.write(mixed.data)
+                position += len(voice)
+        encoder.stdin.close()
+    except BrokenPipeError:
+        # L'encodeur s'est arrêté : l'erreur est remontée ci-dessous via son code de retour
+        pass
+    except Exception:
+        encoder.kill()
+        encoder.wait()
+        raise
+    stderr = encoder.stderr.read().decode("utf-8", errors="replace")
+    if encoder.wait() != 0:
+        raise RuntimeError(f"ffmpeg a échoué : {stderr.strip()}")
+    return output_path
@@ -1,8 +1,52 @@
-from elevenlabs.client import ElevenLabs
-import uuid
+import asyncio
+import base64
+import contextlib
+import difflib
+import glob
+import hashlib
+import json
 import os
+import re
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from utils import metrics
 from utils.api_config import setup_elevenlabs_api
 
+# Paramètres de synthèse ElevenLabs (ils font partie de la clé du cache)
+TTS_MODEL_ID = "eleven_multilingual_v2"
+TTS_OUTPUT_FORMAT = "mp3_44100_128"
+
+# Cache persistant des fichiers audio générés, adressé par le contenu
+TTS_CACHE_DIR = os.path.join(os.getcwd(), "temp_audio")
+# Taille maximale du cache (en Mo) avant éviction des fichiers les moins récemment utilisés
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "500"))
+# Fichiers annexes d'un MP3 du cache (alignement, sous-titres), évincés avec lui
+TTS_CACHE_COMPANIONS = (".alignment.json", ".srt", ".vtt", ".ass", ".txt")
+
+_tts_cache_lock = threading.Lock()
+_tts_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+# Entrées du cache en cours d'utilisation (jamais évincées), avec le nombre d'utilisateurs
+_pinned_cache_paths = Counter()
+
+# Nombre maximal de phrases synthétisées simultanément en mode parallèle
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", "4"))
+
+# Tables des en-têtes de trames MP3 (MPEG-1/2/2.5, couche III)
+_MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+# Taille minimale (en octets) des morceaux MP3 envoyés au lecteur en streaming (~0,5 s à 128 kbit/s)
+STREAM_CHUNK_BYTES = 8 * 1024
+
+_elevenlabs_client = None
+_elevenlabs_client_lock = threading.Lock()
+_async_elevenlabs_client = None
+
 def convert_voice_id(voix: str) -> str:
     """Convertit le nom de la voix en identifiant ElevenLabs."""
     if voix == "River":
@@ -12,57 +56,616 @@ def convert_voice_id(voix: str) -> str:
     elif voix == "George":
         return "JBFqnCBsd6RMkjVDRZzb"
 
-def generate_audio(script, voix):
+def clean_script(script):
+    """Nettoie un script Markdown pour ne garder que le texte à lire."""
+    # Si le script est au format Markdown, extraction du texte brut
+    # Suppression des balises Markdown simples pour une meilleure lecture audio
+    clean_text = script
+    if script.startswith("#") or "**" in script or "- " in script:
+        # Supprimer les titres (#)
+        clean_text = clean_text.replace("#", "")
+        # Supprimer les marqueurs de gras (**)
+        clean_text = clean_text.replace("**", "")
+        # Remplacer les puces par des phrases
+        clean_text = clean_text.replace("- ", ". ")
+        # Supprimer les sauts de ligne excessifs
+        clean_text = " ".join(line.strip() for line in clean_text.splitlines() if line.strip())
+    return clean_text
+
+def tts_cache_key(clean_text, voice_id, model_id=TTS_MODEL_ID, output_format=TTS_OUTPUT_FORMAT):
+    """Calcule la clé du cache TTS à partir du texte nettoyé et des paramètres de synthèse."""
+    payload = json.dumps([clean_text, voice_id, model_id, output_format], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def stream_cache_key(clean_text, voice_id):
+    """
+    Clé du cache des audios diffusés en streaming : sans alignement des caractères, ils ne doivent
+    pas être servis aux générations qui en ont besoin pour les sous-titres.
+    """
+    return tts_cache_key(clean_text, voice_id, output_format=f"{TTS_OUTPUT_FORMAT}+stream")
+
+def _cache_path(key):
+    """Retourne le chemin du fichier MP3 associé à une clé du cache."""
+    return os.path.join(TTS_CACHE_DIR, f"{key}.mp3")
+
+def _lookup_cache(key):
+    """Retourne le chemin du MP3 en cache (et le marque comme récemment utilisé), ou None."""
+    path = _cache_path(key)
+    with _tts_cache_lock:
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            os.utime(path)
+            _tts_cache_stats["hits"] += 1
+            metrics.record_cache("tts", True)
+            return path
+        _tts_cache_stats["misses"] += 1
+    metrics.record_cache("tts", False)
+    return None
+
+def _store_in_cache(key, chunks):
+    """Écrit un flux audio dans le cache de manière atomique et retourne le chemin final."""
+    os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+    path = _cache_path(key)
+    # Nom unique entre processus (les processus d'un pool partagent le même identifiant de thread principal)
+    tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.part"
+    try:
+        with metrics.span("file_write", kind="tts_cache") as span, open(tmp_path, "wb") as f:
+            written = 0
+            for chunk in chunks:
+                if chunk:
+                    f.write(chunk)
+                    written += len(chunk)
+            span.set(bytes=written)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _enforce_cache_quota(keep_path=path)
+    return path
+
+@contextlib.contextmanager
+def _pinned_cache_entries(keys):
+    """Protège des entrées du cache (présentes ou à venir) contre l'éviction pendant leur utilisation."""
+    paths = [_cache_path(key) for key in keys]
+    with _tts_cache_lock:
+        _pinned_cache_paths.update(paths)
+    try:
+        yield paths
+    finally:
+        with _tts_cache_lock:
+            _pinned_cache_paths.subtract(paths)
+            for path in paths:
+                if _pinned_cache_paths[path] <= 0:
+                    del _pinned_cache_paths[path]
+
+def _enforce_cache_quota(keep_path=None):
+    """Évince les entrées les moins récemment utilisées tant que le cache dépasse TTS_CACHE_MAX_MB."""
+    with _tts_cache_lock:
+        entries = []
+        total_bytes = 0
+        for mp3_path in glob.glob(os.path.join(TTS_CACHE_DIR, "*.mp3")):
+            # Les fichiers annexes connus partagent le nom du MP3 et sont évincés avec lui ; les fichiers
+            # temporaires (.part) d'une écriture en cours ne sont jamais touchés
+            stem = os.path.splitext(mp3_path)[0]
+            files = [mp3_path] + [stem + suffix for suffix in TTS_CACHE_COMPANIONS if os.path.exists(stem + suffix)]
+            size = sum(os.path.getsize(p) for p in files if os.path.exists(p))
+            entries.append((os.path.getmtime(mp3_path), mp3_path, files, size))
+            total_bytes += size
+
+        max_bytes = TTS_CACHE_MAX_MB * 1024 * 1024
+        for _, mp3_path, files, size in sorted(entries):
+            if total_bytes <= max_bytes:
+                break
+            if mp3_path == keep_path or _pinned_cache_paths[mp3_path] > 0:
+                continue
+            for p in files:
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            total_bytes -= size
+            _tts_cache_stats["evictions"] += 1
+
+def get_tts_cache_stats():
+    """Retourne les statistiques du cache TTS (hits, misses, évictions, taille)."""
+    with _tts_cache_lock:
+        stats = dict(_tts_cache_stats)
+    mp3_files = glob.glob(os.path.join(TTS_CACHE_DIR, "*.mp3"))
+    stats["entries"] = len(mp3_files)
+    stats["size_mb"] = round(sum(os.path.getsize(p) for p in mp3_files) / (1024 * 1024), 2)
+    stats["max_size_mb"] = TTS_CACHE_MAX_MB
+    return stats
+
+def _get_elevenlabs_client():
+    """Retourne le client ElevenLabs partagé (import paresseux pour accélérer le démarrage)."""
+    global _elevenlabs_client
+    with _elevenlabs_client_lock:
+        if _elevenlabs_client is None:
+            from elevenlabs.client import ElevenLabs
+            # ELEVENLABS_BASE_URL permet de cibler un serveur compatible local (tests, benchmarks)
+            _elevenlabs_client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"), base_url=os.getenv("ELEVENLABS_BASE_URL"))
+        return _elevenlabs_client
+
+def _get_async_elevenlabs_client():
+    """Retourne le client ElevenLabs asynchrone partagé (utilisé depuis la boucle d'événements de Gradio)."""
+    global _async_elevenlabs_client
+    if _async_elevenlabs_client is None:
+        from elevenlabs.client import AsyncElevenLabs
+        _async_elevenlabs_client = AsyncElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"), base_url=os.getenv("ELEVENLABS_BASE_URL"))
+    return _async_elevenlabs_client
+
+def split_sentences(text):
+    """Découpe un texte nettoyé en phrases (sur la ponctuation finale)."""
+    sentences = re.split(r"(?<=[.!?…])\s+", text.strip())
+    return [s.strip() for s in sentences if s.strip() and re.search(r"\w", s)]
+
+def _skip_id3(data):
+    """Retourne la position du premier octet après un éventuel tag ID3v2."""
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        return 10 + size
+    return 0
+
+def _iter_mp3_frames(data):
+    """
+    Parcourt les trames MP3 d'un flux.
+
+    Yields:
+        tuple: (début, fin, nombre d'échantillons, fréquence d'échantillonnage) pour chaque trame.
+    """
+    pos = _skip_id3(data)
+    length = len(data)
+    while pos + 4 <= length:
+        if data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+            pos += 1
+            continue
+        version_bits = (data[pos + 1] >> 3) & 0x03
+        layer_bits = (data[pos + 1] >> 1) & 0x03
+        bitrate_index = data[pos + 2] >> 4
+        rate_index = (data[pos + 2] >> 2) & 0x03
+        padding = (data[pos + 2] >> 1) & 0x01
+        if version_bits == 1 or layer_bits != 1 or bitrate_index in (0, 15) or rate_index == 3:
+            pos += 1
+            continue
+        mpeg1 = version_bits == 3
+        bitrate = _MP3_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+        sample_rate = _MP3_SAMPLE_RATES[version_bits][rate_index]
+        samples = 1152 if mpeg1 else 576
+        frame_length = (samples // 8) * bitrate // sample_rate + padding
+        yield pos, pos + frame_length, samples, sample_rate
+        pos += frame_length
+
+def _is_info_frame(data, start, end):
+    """Indique si une trame est un en-tête Xing/Info (métadonnées, sans audio)."""
+    frame = data[start:end]
+    return b"Xing" in frame[:64] or b"Info" in frame[:64]
+
+def mp3_audio_frames(data):
+    """
+    Extrait les trames audio d'un MP3 (sans tag ID3 ni trame Xing/Info) pour une concaténation sans réencodage.
+
+    Args:
+        data (bytes): Contenu du fichier MP3.
+
+    Returns:
+        tuple: (octets des trames audio, durée en secondes).
+    """
+    parts = []
+    duration = 0.0
+    for index, (start, end, samples, sample_rate) in enumerate(_iter_mp3_frames(data)):
+        if index == 0 and _is_info_frame(data, start, end):
+            continue
+        parts.append(data[start:end])
+        duration += samples / sample_rate
+    return b"".join(parts), duration
+
+def alignment_path(audio_path):
+    """Retourne le chemin du fichier d'alignement (horodatage des caractères) associé à un MP3."""
+    return f"{os.path.splitext(audio_path)[0]}.alignment.json"
+
+def load_alignment(audio_path):
+    """
+    Charge l'alignement caractère par caractère fourni par ElevenLabs pour un MP3.
+
+    Returns:
+        dict: Clés "characters", "character_start_times_seconds" et "character_end_times_seconds", ou None.
+    """
+    path = alignment_path(audio_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_alignment(audio_path, alignment):
+    """Enregistre l'alignement à côté du MP3 (il est évincé du cache avec lui)."""
+    if not alignment:
+        return
+    with open(alignment_path(audio_path), "w", encoding="utf-8") as f:
+        json.dump(alignment, f, ensure_ascii=False)
+
+def _read_timestamped_response(response):
+    """Extrait l'audio et l'alignement d'une réponse convert_with_timestamps (dict ou modèle pydantic)."""
+    if not isinstance(response, dict):
+        response = response.model_dump() if hasattr(response, "model_dump") else dict(response)
+    # Le modèle pydantic du SDK expose le champ sous le nom "audio_base_64" (alias JSON "audio_base64")
+    audio_bytes = base64.b64decode(response.get("audio_base64") or response["audio_base_64"])
+    alignment = response.get("alignment") or response.get("normalized_alignment")
+    if alignment is not None and not isinstance(alignment, dict):
+        alignment = alignment.model_dump() if hasattr(alignment, "model_dump") else dict(alignment)
+    return audio_bytes, alignment
+
+def _synthesize(text, voice_id, key):
+    """Appelle ElevenLabs avec horodatage des caractères, enregistre le MP3 et son alignement dans le cache."""
+    with metrics.span("tts_synthesis", voice_id=voice_id, chars=len(text)) as span:
+        response = _get_elevenlabs_client().text_to_speech.convert_with_timestamps(
+            voice_id=voice_id,
+            output_format=TTS_OUTPUT_FORMAT,
+            text=text,
+            model_id=TTS_MODEL_ID
+        )
+        audio_bytes, alignment = _read_timestamped_response(response)
+        span.set(bytes=len(audio_bytes))
+    saved_audio_path = _store_in_cache(key, [audio_bytes])
+    _save_alignment(saved_audio_path, alignment)
+    return saved_audio_path
+
+def _synthesize_cached(text, voice_id):
+    """Synthétise un texte (ou le récupère du cache) et retourne le chemin du MP3."""
+    key = tts_cache_key(text, voice_id)
+    return _lookup_cache(key) or _synthesize(text, voice_id, key)
+
+def _merge_alignments(chunk_alignments, offsets):
+    """Concatène les alignements de plusieurs phrases en les décalant de leur instant de début."""
+    merged = {"characters": [], "character_start_times_seconds": [], "character_end_times_seconds": []}
+    for alignment, offset in zip(chunk_alignments, offsets):
+        if alignment is None:
+            return None
+        if merged["characters"]:
+            # Espace de séparation entre deux phrases
+            merged["characters"].append(" ")
+            merged["character_start_times_seconds"].append(offset["start"])
+            merged["character_end_times_seconds"].append(offset["start"])
+        merged["characters"].extend(alignment["characters"])
+        merged["character_start_times_seconds"].extend(t + offset["start"] for t in alignment["character_start_times_seconds"])
+        merged["character_end_times_seconds"].extend(t + offset["start"] for t in alignment["character_end_times_seconds"])
+    return merged
+
+def generate_audio_parallel(script, voix, max_workers=None):
+    """
+    Génère l'audio phrase par phrase avec un nombre borné de synthèses simultanées.
+
+    Les MP3 de chaque phrase sont assemblés dans l'ordre, trame par trame, sans réencodage.
+
+    Args:
+        script (str): Script (éventuellement au format Markdown).
+        voix (str): Nom de la voix ("Laura", "George" ou "River").
+        max_workers (int, optional): Nombre maximal de requêtes simultanées. Par défaut: TTS_MAX_WORKERS.
+
+    Returns:
+        tuple: (chemin du MP3, message de statut, liste des phrases avec leurs instants de début et de fin).
+    """
+    try:
+        clean_text = clean_script(script)
+        voix_id = convert_voice_id(voix)
+        sentences = split_sentences(clean_text)
+        if not sentences:
+            return None, "Erreur: Le script est vide.", []
+
+        if not setup_elevenlabs_api():
+            return None, "Erreur: Clé API ElevenLabs non configurée. Veuillez ajouter une clé API dans le fichier .env", []
+
+        # Les MP3 des phrases ne doivent pas être évincés du cache avant d'avoir été assemblés
+        with _pinned_cache_entries([tts_cache_key(s, voix_id) for s in sentences]):
+            # Synthèse concurrente des phrases ; map() conserve l'ordre du script
+            with ThreadPoolExecutor(max_workers=max_workers or TTS_MAX_WORKERS) as executor:
+                synthesize = metrics.propagate_context(_synthesize_cached)
+                chunk_paths = list(executor.map(lambda s: synthesize(s, voix_id), sentences))
+
+            frames = []
+            offsets = []
+            position = 0.0
+            for sentence, chunk_path in zip(sentences, chunk_paths):
+                with open(chunk_path, "rb") as f:
+                    chunk_frames, chunk_duration = mp3_audio_frames(f.read())
+                frames.append(chunk_frames)
+                offsets.append({"text": sentence, "start": position, "end": position + chunk_duration})
+                position += chunk_duration
+            chunk_alignments = [load_alignment(p) for p in chunk_paths]
+
+        # Le fichier assemblé est adressé par les clés des phrases : un même script réutilise le même fichier
+        chunk_keys = [os.path.splitext(os.path.basename(p))[0] for p in chunk_paths]
+        key = hashlib.sha256("+".join(chunk_keys).encode("utf-8")).hexdigest()
+        saved_audio_path = _lookup_cache(key)
+        if not saved_audio_path:
+            saved_audio_path = _store_in_cache(key, frames)
+            _save_alignment(saved_audio_path, _merge_alignments(chunk_alignments, offsets))
+
+        print(f"Audio assemblé à partir de {len(sentences)} phrases: {saved_audio_path}")
+        return saved_audio_path, "Audio généré avec succès!", offsets
+
+    except Exception as e:
+        print(f"Erreur détaillée: {str(e)}")
+        return None, f"Erreur lors de la génération de l'audio: {str(e)}", []
+
+def _sentence_spans(text, sentences):
+    """Positions (début, fin) de chaque phrase dans le texte, ou None si une phrase est introuvable."""
+    spans = []
+    position = 0
+    for sentence in sentences:
+        start = text.find(sentence, position)
+        if start < 0:
+            return None
+        spans.append((start, start + len(sentence)))
+        position = start + len(sentence)
+    return spans
+
+def _split_track(data, alignment, sentences):
+    """
+    Découpe un MP3 et son alignement en morceaux, un par phrase, au milieu des silences entre phrases.
+
+    Args:
+        data (bytes): Contenu du MP3.
+        alignment (dict): Alignement des caractères du MP3.
+        sentences (list): Phrases lues dans le MP3, dans l'ordre.
+
+    Returns:
+        list: Pour chaque phrase, {"frames", "duration", "alignment"} (alignement relatif au début du morceau),
+              ou None si l'alignement ne correspond pas aux phrases.
+    """
+    characters = alignment["characters"]
+    starts = alignment["character_start_times_seconds"]
+    ends = alignment["character_end_times_seconds"]
+    spans = _sentence_spans("".join(characters), sentences)
+    if not spans or any(len(c) != 1 for c in characters):
+        return None
+
+    # Instants de coupe : milieu du silence entre la fin d'une phrase et le début de la suivante
+    cuts = [(ends[end - 1] + starts[next_start]) / 2 for (_, end), (next_start, _) in zip(spans, spans[1:])]
+
+    pieces = [{"frames": [], "start": None, "duration": 0.0} for _ in sentences]
+    index = 0
+    position = 0.0
+    for frame_index, (start, end, samples, sample_rate) in enumerate(_iter_mp3_frames(data)):
+        if frame_index == 0 and _is_info_frame(data, start, end):
+            continue
+        while index < len(cuts) and position >= cuts[index]:
+            index += 1
+        piece = pieces[index]
+        if piece["start"] is None:
+            piece["start"] = position
+        piece["frames"].append(data[start:end])
+        piece["duration"] += samples / sample_rate
+        position += samples / sample_rate
+
+    for piece, (start, end) in zip(pieces, spans):
+        if piece["start"] is None:
+            return None
+        offset = piece["start"]
+        piece["frames"] = b"".join(piece["frames"])
+        piece["alignment"] = {
+            "characters": characters[start:end],
+            "character_start_times_seconds": [t - offset for t in starts[start:end]],
+            "character_end_times_seconds": [t - offset for t in ends[start:end]],
+        }
+    return pieces
+
+def _synthesized_piece(sentence, voice_id):
+    """Synthétise une phrase (ou la récupère du cache) et retourne son morceau {"frames", "duration", "alignment"}."""
+    path = _synthesize_cached(sentence, voice_id)
+    with open(path, "rb") as f:
+        frames, duration = mp3_audio_frames(f.read())
+    return {"frames": frames, "duration": duration, "alignment": load_alignment(path)}
+
+def audio_state(script, voix, audio_path):
+    """
+    Décrit un audio généré, pour une mise à jour incrémentale ultérieure (valeur d'un gr.State).
+
+    Returns:
+        dict: Texte lu, identifiant de la voix et chemin du MP3, ou None si l'audio n'existe pas.
+    """
+    if not audio_path:
+        return None
+    return {"text": clean_script(script), "voice_id": convert_voice_id(voix), "audio_path": audio_path}
+
+def generate_audio_incremental(script, voix, previous=None, parallel=False):
+    """
+    Met à jour l'audio d'un script modifié en ne resynthétisant que les phrases qui ont changé.
+
+    Les phrases du nouveau script sont comparées à celles de l'audio précédent (difflib) ; les phrases
+    inchangées sont découpées dans le MP3 existant grâce à l'alignement des caractères, les phrases
+    nouvelles ou modifiées sont synthétisées, puis les morceaux sont assemblés trame par trame. L'alignement
+    des phrases conservées est décalé de leur nouvelle position : les sous-titres suivent sans transcription.
+
+    Sans audio précédent exploitable (autre voix, alignement manquant), l'audio est généré entièrement.
+
+    Args:
+        script (str): Nouveau script (éventuellement au format Markdown).
+        voix (str): Nom de la voix ("Laura", "George" ou "River").
+        previous (dict, optional): État retourné par la génération précédente (voir audio_state).
+        parallel (bool, optional): Synthèse parallèle par phrase en cas de génération complète. Par défaut: False.
+
+    Returns:
+        tuple: (chemin du MP3, message de statut, nouvel état).
+    """
+    try:
+        clean_text = clean_script(script)
+        voix_id = convert_voice_id(voix)
+        previous_path = previous and previous.get("audio_path")
+        alignment = load_alignment(previous_path) if previous_path and os.path.exists(previous_path) else None
+
+        if not alignment or previous.get("voice_id") != voix_id:
+            audio_path, status_message = generate_audio(script, voix, parallel=parallel)
+            return audio_path, status_message, audio_state(script, voix, audio_path)
+
+        if previous["text"] == clean_text:
+            return previous_path, "Audio inchangé.", previous
+
+        old_sentences = split_sentences(previous["text"])
+        new_sentences = split_sentences(clean_text)
+        with open(previous_path, "rb") as f:
+            old_pieces = _split_track(f.read(), alignment, old_sentences)
+        if old_pieces is None or not new_sentences:
+            audio_path, status_message = generate_audio(script, voix, parallel=parallel)
+            return audio_path, status_message, audio_state(script, voix, audio_path)
+
+        # Phrases à conserver (morceaux de l'ancien audio) ou à synthétiser (None)
+        pieces = [None] * len(new_sentences)
+        matcher = difflib.SequenceMatcher(a=old_sentences, b=new_sentences, autojunk=False)
+        for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+            if tag == "equal":
+                pieces[new_start:new_end] = old_pieces[old_start:old_end]
+
+        changed = [i for i, piece in enumerate(pieces) if piece is None]
+        if changed:
+            if not setup_elevenlabs_api():
+                return None, "Erreur: Clé API ElevenLabs non configurée. Veuillez ajouter une clé API dans le fichier .env", previous
+            with ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS) as executor:
+                synthesize = metrics.propagate_context(_synthesized_piece)
+                for i, piece in zip(changed, executor.map(lambda i: synthesize(new_sentences[i], voix_id), changed)):
+                    pieces[i] = piece
+
+        offsets = []
+        position = 0.0
+        for sentence, piece in zip(new_sentences, pieces):
+            offsets.append({"text": sentence, "start": position, "end": position + piece["duration"]})
+            position += piece["duration"]
+
+        # Le fichier assemblé est adressé par l'audio d'origine et le nouveau texte
+        previous_key = os.path.splitext(os.path.basename(previous_path))[0]
+        key = hashlib.sha256(json.dumps(["splice", previous_key, clean_text, voix_id]).encode("utf-8")).hexdigest()
+        saved_audio_path = _lookup_cache(key)
+        if not saved_audio_path:
+            saved_audio_path = _store_in_cache(key, [piece["frames"] for piece in pieces])
+            _save_alignment(saved_audio_path, _merge_alignments([piece["alignment"] for piece in pieces], offsets))
+
+        print(f"Audio mis à jour ({len(changed)}/{len(new_sentences)} phrases resynthétisées): {saved_audio_path}")
+        status_message = f"Audio mis à jour avec succès! ({len(changed)} phrase(s) resynthétisée(s) sur {len(new_sentences)})"
+        return saved_audio_path, status_message, audio_state(script, voix, saved_audio_path)
+
+    except Exception as e:
+        print(f"Erreur détaillée: {str(e)}")
+        return None, f"Erreur lors de la génération de l'audio: {str(e)}", previous
+
+def generate_audio(script, voix, parallel=False):
     """Génère un fichier audio à partir d'un script en utilisant ElevenLabs."""
+    if parallel:
+        audio_path, status_message, _ = generate_audio_parallel(script, voix)
+        return audio_path, status_message
+
     try:
+        clean_text = clean_script(script)
+        voix_id = convert_voice_id(voix)
+
+        # Un texte déjà synthétisé avec la même voix est servi directement depuis le cache
+        key = tts_cache_key(clean_text, voix_id)
+        cached_path = _lookup_cache(key)
+        if cached_path:
+            print(f"Audio récupéré depuis le cache: {cached_path}")
+            return cached_path, "Audio généré avec succès! (cache)"
+
         # Vérification de l'API ElevenLabs
         if not setup_elevenlabs_api():
             return None, "Erreur: Clé API ElevenLabs non configurée. Veuillez ajouter une clé API dans le fichier .env"
-        
-        # Si le script est au format Markdown, extraction du texte brut
-        # Suppression des balises Markdown simples pour une meilleure lecture audio
-        clean_text = script
-        if script.startswith("#") or "**" in script or "- " in script:
-            # Supprimer les titres (#)
-            clean_text = clean_text.replace("#", "")
-            # Supprimer les marqueurs de gras (**)
-            clean_text = clean_text.replace("**", "")
-            # Remplacer les puces par des phrases
-            clean_text = clean_text.replace("- ", ". ")
-            # Supprimer les sauts de ligne excessifs
-            clean_text = " ".join(line.strip() for line in clean_text.splitlines() if line.strip())
-        
-        # Initialiser le client ElevenLabs
-        api_key = os.getenv("ELEVENLABS_API_KEY")
-        audio_client = ElevenLabs(api_key=api_key)
-        
+
+        # Conversion texte en audio, avec l'horodatage des caractères pour les sous-titres
+        saved_audio_path = _synthesize(clean_text, voix_id, key)
+
+        print(f"Un nouveau fichier audio a été enregistré avec succès: {saved_audio_path}")
+
+        # Return the path of the saved audio file and a success message
+        return saved_audio_path, "Audio généré avec succès!"
+
+    except Exception as e:
+        print(f"Erreur détaillée: {str(e)}")
+        return None, f"Erreur lors de la génération de l'audio: {str(e)}"
+
+def _split_complete_frames(buffer):
+    """Sépare un tampon MP3 en trames complètes et en reste (trame partielle en cours de réception)."""
+    last_end = 0
+    for _, end, _, _ in _iter_mp3_frames(buffer):
+        if end > len(buffer):
+            break
+        last_end = end
+    return buffer[:last_end], buffer[last_end:]
+
+async def generate_audio_stream(script, voix):
+    """
+    Génère l'audio de manière asynchrone et le diffuse au fur et à mesure de la synthèse.
+
+    Les morceaux sont envoyés dès qu'ils contiennent des trames MP3 complètes, tout en étant
+    écrits sans bloquer la boucle d'événements (aiofiles) dans le cache TTS.
+
+    Args:
+        script (str): Script (éventuellement au format Markdown).
+        voix (str): Nom de la voix ("Laura", "George" ou "River").
+
+    Yields:
+        tuple: (morceau MP3, None, None) pendant la synthèse, puis (None, chemin du MP3, message de statut).
+               En cas d'erreur : (None, None, message d'erreur).
+    """
+    import aiofiles
+    import aiofiles.os
+
+    tmp_path = None
+    try:
+        clean_text = clean_script(script)
         voix_id = convert_voice_id(voix)
-        
-        # Conversion texte en audio
-        audio = audio_client.text_to_speech.convert(
+        # Un audio déjà en cache (avec alignement, ou déjà diffusé) est relu par morceaux sans bloquer
+        # la boucle d'événements ; l'audio diffusé n'a pas d'alignement et a sa propre clé
+        key = stream_cache_key(clean_text, voix_id)
+        cached_path = await asyncio.to_thread(_lookup_cache, tts_cache_key(clean_text, voix_id))
+        if not cached_path:
+            cached_path = await asyncio.to_thread(_lookup_cache, key)
+        if cached_path:
+            async with aiofiles.open(cached_path, "rb") as f:
+                while chunk := await f.read(STREAM_CHUNK_BYTES):
+                    yield chunk, None, None
+            yield None, cached_path, "Audio généré avec succès! (cache)"
+            return
+
+        if not setup_elevenlabs_api():
+            yield None, None, "Erreur: Clé API ElevenLabs non configurée. Veuillez ajouter une clé API dans le fichier .env"
+            return
+
+        await aiofiles.os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+        path = _cache_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.part"
+
+        audio = _get_async_elevenlabs_client().text_to_speech.convert_as_stream(
             voice_id=voix_id,
-            output_format="mp3_44100_128",
+            output_format=TTS_OUTPUT_FORMAT,
             text=clean_text,
-            model_id="eleven_multilingual_v2"
+            model_id=TTS_MODEL_ID
         )
 
-        # Generating a unique file name for the output MP3 file
-        temp_dir = os.path.join(os.getcwd(), "temp_audio")
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        saved_audio_path = os.path.join(temp_dir, f"{uuid.uuid4()}.mp3")
-        
-        # Writing the audio stream to the file
-        with open(saved_audio_path, "wb") as f:
-            for chunk in audio:
-                if chunk:
-                    f.write(chunk)
+        buffer = b""
+        with metrics.span("tts_stream", voice_id=voix_id, chars=len(clean_text)) as span:
+            received = 0
+            async with aiofiles.open(tmp_path, "wb") as f:
+                async for chunk in audio:
+                    if not chunk:
+                        continue
+                    await f.write(chunk)
+                    received += len(chunk)
+                    buffer += chunk
+                    if len(buffer) >= STREAM_CHUNK_BYTES:
+                        complete, buffer = _split_complete_frames(buffer)
+                        if complete:
+                            yield complete, None, None
+            span.set(bytes=received)
+        if buffer:
+            yield buffer, None, None
 
-        print(f"Un nouveau fichier audio a été enregistré avec succès: {saved_audio_path}")
+        await aiofiles.os.replace(tmp_path, path)
+        tmp_path = None
+        await asyncio.to_thread(_enforce_cache_quota, path)
 
-        # Return the path of the saved audio file and a success message
-        return saved_audio_path, "Audio généré avec succès!"
+        print(f"Un nouveau fichier audio a été enregistré avec succès: {path}")
+        yield None, path, "Audio généré avec succès!"
 
     except Exception as e:
         print(f"Erreur détaillée: {str(e)}")
-        return None, f"Erreur lors de la génération de l'audio: {str(e)}"
\ No newline at end of file
+        yield None, None, f"Erreur lors de la génération de l'audio: {str(e)}"
+
+    finally:
+        if tmp_path and await aiofiles.os.path.exists(tmp_path):
+            await aiofiles.os.remove(tmp_path)
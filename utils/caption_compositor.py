@@ -0,0 +1,326 @@
+"""
+Ce module incruste les sous-titres dans les trames de la vidéo.
+
+Chaque réplique est dessinée une seule fois par style (PIL) en une vignette RGBA
+prémultipliée, gardée en cache. Pendant le rendu, la réplique active d'une trame est
+retrouvée par recherche dichotomique et seule sa boîte englobante est mélangée à la trame,
+en arithmétique entière NumPy : le coût dépend du nombre de répliques, pas du nombre de
+trames multiplié par le nombre de pixels.
+"""
+
+import bisect
+import html
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Polices essayées dans l'ordre (CAPTION_FONT pour imposer un fichier .ttf)
+CAPTION_FONTS = [
+    os.getenv("CAPTION_FONT", ""),
+    "DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "Arial Bold.ttf",
+    "arialbd.ttf",
+]
+CAPTION_SERIF_FONTS = [
+    "DejaVuSerif-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSerif-Bold.ttf",
+    "Georgia Bold.ttf",
+    "georgiab.ttf",
+]
+
+# Nombre maximal de vignettes gardées en cache (toutes vidéos confondues)
+CAPTION_CACHE_SIZE = int(os.getenv("CAPTION_CACHE_SIZE", "512"))
+
+# Styles de l'onglet Légende : contour, fond et police
+LEGEND_STYLES = {
+    "Standard": {"stroke": 0.08, "box": False, "serif": False, "quotes": False},
+    "Minimaliste": {"stroke": 0.0, "box": False, "serif": False, "quotes": False},
+    "Détaillée": {"stroke": 0.0, "box": True, "serif": False, "quotes": False},
+    "Citation": {"stroke": 0.05, "box": False, "serif": True, "quotes": True},
+}
+
+# Hauteur de référence des tailles de police de l'onglet Légende (mises à l'échelle de la vidéo)
+REFERENCE_HEIGHT = 480
+# Largeur maximale d'une ligne, en proportion de la largeur de la vidéo
+MAX_LINE_WIDTH = 0.85
+
+_sprites = OrderedDict()
+_sprites_lock = threading.Lock()
+
+def parse_color(value, default=(255, 255, 255)):
+    """
+    Convertit une couleur de gr.ColorPicker ("#RRGGBB", "#RGB" ou "rgba(r, g, b, a)") en triplet RGB.
+
+    Args:
+        value (str): Couleur.
+        default (tuple, optional): Couleur retournée si la valeur est illisible.
+
+    Returns:
+        tuple: (rouge, vert, bleu).
+    """
+    value = (value or "").strip()
+    if value.startswith("#"):
+        digits = value[1:]
+        if len(digits) in (3, 4):
+            digits = "".join(c * 2 for c in digits[:3])
+        try:
+            return tuple(int(digits[i:i + 2], 16) for i in (0, 2, 4))
+        except ValueError:
+            return default
+    numbers = re.findall(r"[\d.]+", value)
+    if value.startswith("rgb") and len(numbers) >= 3:
+        return tuple(min(255, int(round(float(n)))) for n in numbers[:3])
+    return default
+
+class CaptionStyle:
+    """
+    Style des sous-titres incrustés, tel que choisi dans l'onglet Légende.
+    """
+
+    def __init__(self, style="Standard", font_size=16, color="#FFFFFF", position="Bas"):
+        """
+        Args:
+            style (str, optional): "Standard", "Minimaliste", "Détaillée" ou "Citation".
+            font_size (int, optional): Taille de police pour une vidéo de 480 px de haut. Par défaut: 16.
+            color (str, optional): Couleur du texte. Par défaut: "#FFFFFF".
+            position (str, optional): "Bas", "Haut", "Centre" ou "Personnalisé" (tiers inférieur).
+        """
+        self.style = style if style in LEGEND_STYLES else "Standard"
+        self.font_size = int(font_size or 16)
+        self.color = parse_color(color)
+        self.position = position or "Bas"
+
+    @property
+    def key(self):
+        """Clé de cache du style."""
+        return (self.style, self.font_size, self.color, self.position)
+
+def _load_font(size, serif=False):
+    for candidate in (CAPTION_SERIF_FONTS if serif else []) + CAPTION_FONTS:
+        if not candidate:
+            continue
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+def _wrap(text, font, max_width):
+    """Répartit le texte sur plusieurs lignes d'au plus max_width pixels."""
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}".strip()
+            if line and font.getlength(candidate) > max_width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        if line:
+            lines.append(line)
+    return lines
+
+def rasterize_caption(text, style, size):
+    """
+    Dessine une réplique en vignette RGBA prémultipliée.
+
+    Args:
+        text (str): Texte de la réplique.
+        style (CaptionStyle): Style des sous-titres.
+        size (tuple): Résolution de la vidéo (largeur, hauteur).
+
+    Returns:
+        tuple: (couleurs prémultipliées (h, l, 3) en uint16 sur 256, opacités complémentaires (h, l, 1)
+               en uint16 sur 256, position (x, y) du coin supérieur gauche dans la trame).
+    """
+    width, height = size
+    options = LEGEND_STYLES[style.style]
+    font_px = max(8, round(style.font_size * height / REFERENCE_HEIGHT))
+    font = _load_font(font_px, options["serif"])
+    stroke = round(font_px * options["stroke"])
+    if options["quotes"]:
+        text = f"« {text.strip()} »"
+
+    lines = _wrap(text, font, width * MAX_LINE_WIDTH - 2 * stroke)
+    line_height = round(font_px * 1.25)
+    text_width = max((font.getlength(line) for line in lines), default=0)
+    padding = round(font_px * 0.4) if options["box"] else 0
+    margin = stroke + padding
+    sprite_w = min(width, int(text_width) + 2 * margin + 2)
+    sprite_h = min(height, line_height * len(lines) + 2 * margin)
+
+    sprite = Image.new("RGBA", (sprite_w, sprite_h), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sprite)
+    if options["box"]:
+        draw.rounded_rectangle((0, 0, sprite_w - 1, sprite_h - 1), radius=padding, fill=(0, 0, 0, 160))
+    for i, line in enumerate(lines):
+        draw.text(
+            (sprite_w / 2, margin + i * line_height + line_height / 2), line, font=font, anchor="mm",
+            fill=style.color + (255,), stroke_width=stroke, stroke_fill=(0, 0, 0, 255)
+        )
+
+    pixels = np.asarray(sprite, dtype=np.uint32)
+    # Opacité ramenée sur 256 pour un mélange par décalage de 8 bits
+    alpha = (pixels[:, :, 3:] * 257 + 128) >> 8
+    premultiplied = (pixels[:, :, :3] * alpha).astype(np.uint16)
+    inverse_alpha = (256 - alpha).astype(np.uint16)
+
+    x = (width - sprite_w) // 2
+    if style.position == "Haut":
+        y = height // 10
+    elif style.position == "Centre":
+        y = (height - sprite_h) // 2
+    elif style.position == "Personnalisé":
+        y = height * 2 // 3 - sprite_h // 2
+    else:
+        y = height - height // 8 - sprite_h
+    y = min(max(0, y), height - sprite_h)
+    return premultiplied, inverse_alpha, (x, y)
+
+def get_caption_sprite(text, style, size):
+    """Retourne la vignette d'une réplique, dessinée au premier appel puis lue dans le cache LRU."""
+    key = (text, style.key, tuple(size))
+    with _sprites_lock:
+        if key in _sprites:
+            _sprites.move_to_end(key)
+            return _sprites[key]
+    sprite = rasterize_caption(text, style, size)
+    with _sprites_lock:
+        _sprites[key] = sprite
+        while len(_sprites) > CAPTION_CACHE_SIZE:
+            _sprites.popitem(last=False)
+    return sprite
+
+_TIME = r"(\d+):(\d{2}):(\d{2})[,.](\d{1,3})"
+
+def _seconds(hours, minutes, seconds, fraction):
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(fraction.ljust(3, "0")) / 1000
+
+def parse_subtitles(content):
+    """
+    Extrait les répliques d'un contenu SRT, WebVTT ou ASS.
+
+    Args:
+        content (str): Contenu du fichier de sous-titres.
+
+    Returns:
+        list: Répliques (début, fin, texte) triées par début, temps en secondes.
+    """
+    cues = []
+    if "[Events]" in content:
+        for line in content.splitlines():
+            if not line.startswith("Dialogue:"):
+                continue
+            fields = line.split(",", 9)
+            start = re.fullmatch(r"(\d+):(\d{2}):(\d{2})\.(\d{2})", fields[1].strip())
+            end = re.fullmatch(r"(\d+):(\d{2}):(\d{2})\.(\d{2})", fields[2].strip())
+            if start and end:
+                text = re.sub(r"\{[^}]*\}", "", fields[9]).replace("\\N", "\n").strip()
+                cues.append((_seconds(*start.groups()), _seconds(*end.groups()), text))
+    else:
+        webvtt = content.lstrip("\ufeff").startswith("WEBVTT")
+        for block in re.split(r"\n\s*\n", content.replace("\r\n", "\n")):
+            lines = block.strip().splitlines()
+            for i, line in enumerate(lines):
+                match = re.match(_TIME + r"\s*-->\s*" + _TIME, line.strip())
+                if match:
+                    text = "\n".join(lines[i + 1:]).strip()
+                    if webvtt:
+                        # Balises de réplique (<c>, <v Nom>, <b>, horodatages) et entités (&amp;, &lt;...)
+                        text = html.unescape(re.sub(r"<[^>]*>", "", text)).strip()
+                    if text:
+                        groups = match.groups()
+                        cues.append((_seconds(*groups[:4]), _seconds(*groups[4:]), text))
+                    break
+    return sorted(cues)
+
+class CaptionCompositor:
+    """
+    Incrustation des répliques actives dans les trames de la vidéo.
+    """
+
+    def __init__(self, cues, size, style=None, fps=30):
+        """
+        Args:
+            cues (list): Répliques (début, fin, texte) retournées par parse_subtitles.
+            size (tuple): Résolution de la vidéo (largeur, hauteur).
+            style (CaptionStyle, optional): Style des sous-titres. Par défaut: CaptionStyle().
+            fps (int, optional): Images par seconde de la vidéo. Par défaut: 30.
+        """
+        self.cues = sorted(cues)
+        self.size = tuple(size)
+        self.style = style or CaptionStyle()
+        self.fps = fps
+        self._starts = [start for start, _, _ in self.cues]
+
+    @classmethod
+    def from_file(cls, path, size, style=None, fps=30):
+        """Crée un compositeur à partir d'un fichier SRT, WebVTT ou ASS."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(parse_subtitles(f.read()), size, style, fps)
+
+    def active_cue(self, frame_index):
+        """
+        Retourne la réplique affichée sur une trame, ou None.
+
+        Args:
+            frame_index (int): Numéro de la trame.
+
+        Returns:
+            tuple: (début, fin, texte) de la réplique, None si aucune.
+        """
+        t = frame_index / self.fps
+        index = bisect.bisect_right(self._starts, t) - 1
+        # En cas de chevauchement de deux répliques, la plus récente l'emporte
+        for i in (index, index - 1):
+            if i >= 0 and t < self.cues[i][1]:
+                return self.cues[i]
+        return None
+
+    def composite(self, frame, frame_index):
+        """
+        Incruste la réplique active dans une trame.
+
+        Args:
+            frame (numpy.ndarray): Trame RGB (hauteur, largeur, 3) en uint8.
+            frame_index (int): Numéro de la trame.
+
+        Returns:
+            numpy.ndarray: La trame (inchangée et non copiée si aucune réplique n'est active).
+        """
+        cue = self.active_cue(frame_index)
+        if cue is None:
+            return frame
+        premultiplied, inverse_alpha, (x, y) = get_caption_sprite(cue[2], self.style, self.size)
+        h, w = inverse_alpha.shape[:2]
+
+        if not frame.flags.writeable:
+            frame = frame.copy()
+        # Mélange limité à la boîte englobante : dst = (dst * (256 - a) + couleur * a) / 256
+        region = frame[y:y + h, x:x + w]
+        region[...] = ((region * inverse_alpha + premultiplied) >> 8).astype(np.uint8)
+        return frame
+
+def load_captions(subtitles_path, size, style=None, fps=30):
+    """
+    Charge les sous-titres à incruster, ou None s'il n'y en a pas.
+
+    Args:
+        subtitles_path (str): Fichier SRT, WebVTT ou ASS.
+        size (tuple): Résolution de la vidéo (largeur, hauteur).
+        style (CaptionStyle, optional): Style des sous-titres.
+        fps (int, optional): Images par seconde de la vidéo.
+
+    Returns:
+        CaptionCompositor: Le compositeur, None si le fichier est absent ou sans réplique.
+    """
+    if not subtitles_path or not os.path.exists(subtitles_path):
+        return None
+    compositor = CaptionCompositor.from_file(subtitles_path, size, style, fps)
+    return compositor if compositor.cues else None
@@ -0,0 +1,172 @@
+"""
+Ce module regroupe les demandes de génération d'images en micro-lots.
+
+Les requêtes qui arrivent pendant une courte fenêtre (et qui partagent le même nombre d'étapes
+et la même guidance) sont envoyées au pipeline de diffusion en un seul appel. Les résultats
+sont mis en cache par (prompt, prompt négatif, graine, étapes, guidance) : un prompt déjà
+généré avec la même graine est renvoyé instantanément.
+"""
+
+import inspect
+import os
+import queue
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from utils import metrics
+
+# Fenêtre de regroupement des requêtes (en millisecondes)
+DIFFUSION_BATCH_WINDOW_MS = int(os.getenv("DIFFUSION_BATCH_WINDOW_MS", "150"))
+# Taille maximale d'un lot
+DIFFUSION_MAX_BATCH = int(os.getenv("DIFFUSION_MAX_BATCH", "4"))
+# Nombre d'images conservées en cache
+DIFFUSION_CACHE_SIZE = int(os.getenv("DIFFUSION_CACHE_SIZE", "128"))
+
+# Réglages vitesse/qualité par défaut
+DEFAULT_STEPS = 25
+DEFAULT_GUIDANCE = 1.0
+
+class DiffusionService:
+    """
+    Service de génération d'images par micro-lots avec cache des résultats.
+    """
+
+    def __init__(self, pipeline_factory, batch_window=DIFFUSION_BATCH_WINDOW_MS / 1000,
+                 max_batch_size=DIFFUSION_MAX_BATCH, cache_size=DIFFUSION_CACHE_SIZE):
+        """
+        Args:
+            pipeline_factory (callable): Retourne le pipeline de diffusion (chargé paresseusement).
+            batch_window (float, optional): Fenêtre de regroupement en secondes.
+            max_batch_size (int, optional): Nombre maximal d'images par appel au pipeline.
+            cache_size (int, optional): Nombre d'images conservées en cache.
+        """
+        self.pipeline_factory = pipeline_factory
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.cache_size = cache_size
+        self._requests = queue.Queue()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._stats = {"requests": 0, "cache_hits": 0, "images": 0, "batches": 0, "busy_s": 0.0}
+
+    def generate(self, prompt, negative_prompt="", seed=-1, steps=DEFAULT_STEPS, guidance=DEFAULT_GUIDANCE):
+        """
+        Génère une image (ou la récupère du cache) et attend le résultat.
+
+        Args:
+            prompt (str): Description de l'image.
+            negative_prompt (str, optional): Ce que l'image ne doit pas contenir.
+            seed (int, optional): Graine aléatoire ; -1 pour une graine tirée au hasard.
+            steps (int, optional): Nombre d'étapes d'inférence (moins = plus rapide).
+            guidance (float, optional): Force de la guidance sans classifieur.
+
+        Returns:
+            tuple: (image PIL, graine utilisée).
+        """
+        seed = random.randint(0, 2**31 - 1) if seed is None or int(seed) < 0 else int(seed)
+        key = (prompt, negative_prompt or "", seed, int(steps), float(guidance))
+
+        with metrics.span("image_generation", steps=int(steps), seed=seed) as span:
+            with self._cache_lock:
+                self._stats["requests"] += 1
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    self._stats["cache_hits"] += 1
+                    span.set(cache_hit=True)
+                    return self._cache[key], seed
+
+            span.set(cache_hit=False)
+            future = Future()
+            self._ensure_worker()
+            self._requests.put((key, future))
+            return future.result(), seed
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="diffusion-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self):
+        """Attend une première requête puis regroupe celles qui arrivent pendant la fenêtre."""
+        batch = [self._requests.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            # Un appel au pipeline partage le nombre d'étapes et la guidance
+            groups = {}
+            for key, future in batch:
+                groups.setdefault((key[3], key[4]), {}).setdefault(key, []).append(future)
+            for (steps, guidance), requests in groups.items():
+                self._run_group(steps, guidance, requests)
+
+    def _run_group(self, steps, guidance, requests):
+        """Exécute un lot (requêtes identiques dédupliquées) et résout les futures."""
+        keys = list(requests)
+        try:
+            import torch
+
+            pipeline = self.pipeline_factory()
+            kwargs = {
+                "prompt": [key[0] for key in keys],
+                "num_inference_steps": steps,
+                "guidance_scale": guidance,
+                "generator": [torch.Generator(device="cpu").manual_seed(key[2]) for key in keys],
+            }
+            # Certains pipelines (dont LDM) n'acceptent pas de prompt négatif
+            if "negative_prompt" in inspect.signature(pipeline.__call__).parameters:
+                kwargs["negative_prompt"] = [key[1] for key in keys]
+
+            start = time.perf_counter()
+            with metrics.span("diffusion_batch", batch_size=len(keys), steps=steps):
+                images = pipeline(**kwargs).images
+            busy = time.perf_counter() - start
+        except Exception as e:
+            for futures in requests.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        with self._cache_lock:
+            self._stats["batches"] += 1
+            self._stats["images"] += len(images)
+            self._stats["busy_s"] += busy
+            for key, image in zip(keys, images):
+                self._cache[key] = image
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        for key, image in zip(keys, images):
+            for future in requests[key]:
+                future.set_result(image)
+
+    def stats(self):
+        """
+        Retourne les statistiques du service.
+
+        Returns:
+            dict: Requêtes, hits du cache, images générées, taille moyenne des lots et débit en images/minute.
+        """
+        with self._cache_lock:
+            stats = dict(self._stats)
+        stats["avg_batch_size"] = round(stats["images"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["images_per_minute"] = round(60 * stats["images"] / stats["busy_s"], 2) if stats["busy_s"] else 0.0
+        stats["busy_s"] = round(stats["busy_s"], 2)
+        return stats
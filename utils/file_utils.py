@@ -1,11 +1,20 @@
 from PIL import Image
 import glob
 import os
+import uuid
+from utils import metrics
+
+# Affiche le graphe de filtres et la commande ffmpeg au lieu de rendre la vidéo
+RENDER_DRY_RUN = os.getenv("SHORTGEN_RENDER_DRY_RUN", "0") == "1"
+
+def list_images(template_dir="Templates"):
+    """Liste les chemins des images jpg du dossier Templates, sans les ouvrir."""
+    return sorted(glob.glob(f'{template_dir}/*.jpg'))
 
 def load_images(template_dir="Templates"):
     """Chargement des images depuis le dossier Templates."""
     # Charger toutes les images jpg dans le dossier Templates
-    image_paths = sorted(glob.glob(f'{template_dir}/*.jpg'))
+    image_paths = list_images(template_dir)
     images = []
     for path in image_paths:
         try:
@@ -15,7 +24,88 @@ def load_images(template_dir="Templates"):
             print(f"Erreur lors du chargement de {path}: {e}")
     return images
 
-def generate_video():
-    """Simulation de la génération de vidéo."""
-    # Fonction à développer pour générer réellement une vidéo
-    return "Vidéo en cours de génération..."
\ No newline at end of file
+def generate_video(ratio="9:16 (Stories/Shorts)", duration=30, audio_path=None, uploaded_image=None, music_path=None, subtitles_path=None, caption_style=None,
+                   overlay=None, animated_subtitles=False, encoder_preset=None, draft=False, template_dir="Templates"):
+    """
+    Génère une vidéo animée à partir des images et de la voix off.
+
+    Args:
+        ratio (str, optional): Ratio d'aspect choisi dans l'onglet Style.
+        duration (float, optional): Durée de la vidéo en secondes. Par défaut: 30.
+        audio_path (str, optional): Chemin de la voix off MP3 générée.
+        uploaded_image (str, optional): Image téléchargée par l'utilisateur, placée en tête de la séquence.
+        music_path (str, optional): Musique de fond, mixée sous la voix off (ou seule piste audio sans voix off).
+        subtitles_path (str, optional): Sous-titres (SRT, WebVTT ou ASS) à incruster dans la vidéo.
+        caption_style (CaptionStyle, optional): Style des sous-titres incrustés (onglet Légende).
+        overlay (dict, optional): Logo ou filigrane de l'onglet Overlay (voir filtergraph.overlay_settings).
+        animated_subtitles (bool, optional): Sous-titres ASS (karaoké) rendus par libass au lieu de l'incrustation statique.
+        encoder_preset (str, optional): Réglage de l'encodeur ("Rapide", "Équilibré", "Compact").
+        draft (bool, optional): Aperçu brouillon en basse résolution et fréquence réduite, au lieu du rendu final par segments en cache.
+        template_dir (str, optional): Dossier des images modèles. Par défaut: "Templates".
+
+    Returns:
+        str: Chemin de la vidéo générée, None en cas d'échec.
+    """
+    # Import local : le moteur de rendu (NumPy, ffmpeg) n'est nécessaire qu'à la génération
+    from utils.template_index import get_template_index
+    from utils.caption_compositor import load_captions
+    from utils.filtergraph import DEFAULT_ENCODER_PRESET
+    from utils.render_cache import DRAFT_ENCODER_PRESET, DRAFT_FPS, draft_size, render_video_segmented
+    from utils.video_renderer import DEFAULT_FPS, render_video, resolution_for_ratio
+
+    try:
+        image_paths = list_images(template_dir)
+        if uploaded_image:
+            image_paths.insert(0, uploaded_image)
+
+        # Generating a unique file name for the output MP4 file
+        temp_dir = os.path.join(os.getcwd(), "temp_video")
+        os.makedirs(temp_dir, exist_ok=True)
+        output_path = os.path.join(temp_dir, f"{uuid.uuid4()}.mp4")
+
+        # Musique de fond : mixée en flux sous la voix off (atténuée pendant la parole)
+        if music_path and audio_path:
+            from utils.audio_mixer import mix_voice_and_music
+            with metrics.span("audio_mix") as span:
+                audio_path = mix_voice_and_music(audio_path, music_path, os.path.splitext(output_path)[0] + ".m4a")
+                span.set(bytes=os.path.getsize(audio_path))
+        elif music_path:
+            audio_path = music_path
+
+        size = resolution_for_ratio(ratio)
+        fps = DEFAULT_FPS
+        encoder_preset = encoder_preset or DEFAULT_ENCODER_PRESET
+        if draft:
+            size, fps, encoder_preset = draft_size(size), DRAFT_FPS, DRAFT_ENCODER_PRESET
+        # Sous-titres animés (ASS karaoké) : rendus par libass dans le graphe de filtres
+        animated = subtitles_path if animated_subtitles and subtitles_path and subtitles_path.endswith(".ass") else None
+        captions = None if animated else load_captions(subtitles_path, size, caption_style, fps)
+        settings = dict(
+            size=size,
+            duration=float(duration),
+            fps=fps,
+            audio_path=audio_path,
+            load_base=get_template_index(template_dir).load_base,
+            captions=captions,
+            overlay=overlay,
+            subtitles_path=animated,
+            encoder_preset=encoder_preset,
+        )
+        with metrics.span("video_render", images=len(image_paths), duration=float(duration), captions=len(captions.cues) if captions else 0,
+                          draft=bool(draft)) as span:
+            if draft or RENDER_DRY_RUN:
+                # L'aperçu brouillon est rendu d'une traite : il ne sert qu'une fois
+                render_video(image_paths, output_path, dry_run=RENDER_DRY_RUN, **settings)
+                if RENDER_DRY_RUN:
+                    return None
+            else:
+                # Rendu final : seuls les segments dont les entrées ont changé sont ré-encodés
+                _, stats = render_video_segmented(image_paths, output_path, **settings)
+                span.set(**stats)
+            span.set(bytes=os.path.getsize(output_path))
+        print(f"Une nouvelle vidéo a été enregistrée avec succès: {output_path}")
+        return output_path
+
+    except Exception as e:
+        print(f"Erreur lors de la génération de la vidéo: {str(e)}")
+        return None
@@ -0,0 +1,226 @@
+"""
+Ce module compile les réglages des onglets Style, Overlay et Légende en une seule commande
+ffmpeg : mise à l'échelle et recadrage, logo ou filigrane avec opacité et sous-titres animés
+(libass) sont décrits dans un unique graphe de filtres, appliqué en une seule passe de décodage
+et d'encodage. La musique de fond est mixée en amont sous la voix off (utils/audio_mixer.py) :
+la piste audio reçue est simplement multiplexée.
+
+Le mode « dry-run » affiche le graphe et la commande sans rien exécuter : render_video(dry_run=True),
+SHORTGEN_RENDER_DRY_RUN=1 pour l'application, ou en ligne de commande :
+
+    python -m utils.filtergraph --ratio 9:16 --overlay Logo --overlay-file logo.png
+"""
+
+import argparse
+
+# Réglages de l'encodeur x264 : vitesse de rendu contre taille de fichier
+ENCODER_PRESETS = {
+    "Rapide": {"preset": "ultrafast", "crf": 26},
+    "Équilibré": {"preset": "veryfast", "crf": 23},
+    "Compact": {"preset": "slow", "crf": 21},
+}
+DEFAULT_ENCODER_PRESET = "Équilibré"
+
+# Positions de l'onglet Overlay (expressions du filtre overlay, marge m en pixels)
+OVERLAY_POSITIONS = {
+    "Coin supérieur droit": ("W-w-{m}", "{m}"),
+    "Coin supérieur gauche": ("{m}", "{m}"),
+    "Coin inférieur droit": ("W-w-{m}", "H-h-{m}"),
+    "Coin inférieur gauche": ("{m}", "H-h-{m}"),
+    "Centre": ("(W-w)/2", "(H-h)/2"),
+}
+# Largeur de l'image d'overlay, en proportion de la largeur de la vidéo
+OVERLAY_WIDTHS = {"Logo": 0.2, "Filigrane": 0.6}
+
+def escape_filter_value(value):
+    """
+    Protège une valeur d'option (un chemin de fichier par exemple) pour l'insérer dans un graphe de filtres.
+
+    Deux niveaux d'échappement : celui des options de filtre puis celui du graphe.
+    """
+    value = str(value).replace("\\", "\\\\").replace(":", "\\:").replace("'", "\\'")
+    for char in "\\'[],;":
+        value = value.replace(char, "\\" + char)
+    return value
+
+class FilterGraph:
+    """
+    Graphe de filtres ffmpeg construit chaîne par chaîne, avec des étiquettes uniques.
+    """
+
+    def __init__(self):
+        self._chains = []
+        self._labels = 0
+
+    def chain(self, inputs, filters, output=None):
+        """
+        Ajoute une chaîne de filtres.
+
+        Args:
+            inputs (list): Étiquettes d'entrée (par exemple ["0:v"]).
+            filters (list): Filtres appliqués dans l'ordre (par exemple ["scale=720:1280"]).
+            output (str or tuple, optional): Étiquette(s) de sortie. Une étiquette unique est générée si None.
+
+        Returns:
+            str or tuple: Étiquette(s) de sortie de la chaîne.
+        """
+        if output is None:
+            self._labels += 1
+            output = f"s{self._labels}"
+        outputs = output if isinstance(output, tuple) else (output,)
+        self._chains.append(
+            "".join(f"[{label}]" for label in inputs) + ",".join(filters) + "".join(f"[{label}]" for label in outputs)
+        )
+        return output
+
+    def __bool__(self):
+        return bool(self._chains)
+
+    def __str__(self):
+        return ";".join(self._chains)
+
+    def pretty(self):
+        """Représentation lisible du graphe (une chaîne par ligne)."""
+        return ";\n".join(self._chains)
+
+def overlay_settings(overlay_type, path, position="Coin inférieur droit", opacity=0.8):
+    """
+    Réglages d'overlay de l'onglet Overlay, ou None s'il n'y a rien à superposer.
+
+    Args:
+        overlay_type (str): "Aucun", "Logo", "Filigrane" ou "Sous-titres animés".
+        path (str): Image du logo ou du filigrane.
+        position (str, optional): Position choisie dans l'onglet.
+        opacity (float, optional): Opacité entre 0 et 1.
+
+    Returns:
+        dict: Réglages ("type", "path", "position", "opacity"), None pour les autres types ou sans image.
+    """
+    if overlay_type not in OVERLAY_WIDTHS or not path:
+        return None
+    return {"type": overlay_type, "path": path, "position": position, "opacity": float(opacity)}
+
+def compile_render_command(output_path, size, fps, duration, audio_path=None, overlay=None,
+                           subtitles_path=None, encoder_preset=DEFAULT_ENCODER_PRESET, source_size=None, start_time=0.0):
+    """
+    Compile les réglages de rendu en une commande ffmpeg qui lit des trames RGB brutes sur l'entrée standard.
+
+    Args:
+        output_path (str): Chemin du fichier MP4 de sortie.
+        size (tuple): Résolution de sortie (largeur, hauteur).
+        fps (int): Images par seconde.
+        duration (float): Durée de la vidéo en secondes.
+        audio_path (str, optional): Piste audio : voix off, mixage voix/musique (utils/audio_mixer.py) ou musique seule.
+        overlay (dict, optional): Logo ou filigrane (voir overlay_settings).
+        subtitles_path (str, optional): Sous-titres rendus par libass (SRT, WebVTT ou ASS karaoké).
+        encoder_preset (str, optional): "Rapide", "Équilibré" ou "Compact". Par défaut: "Équilibré".
+        source_size (tuple, optional): Résolution des trames envoyées (mise à l'échelle et recadrées vers size).
+        start_time (float, optional): Position des trames dans la vidéo complète (rendu par segments), pour caler les sous-titres.
+
+    Returns:
+        tuple: (arguments de la commande ffmpeg, graphe de filtres).
+    """
+    width, height = size
+    source_w, source_h = source_size or size
+    command = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{source_w}x{source_h}", "-r", str(fps), "-i", "-",
+    ]
+    inputs = 1
+
+    def add_input(path):
+        nonlocal inputs
+        command.extend(["-i", path])
+        inputs += 1
+        return inputs - 1
+
+    audio_index = add_input(audio_path) if audio_path else None
+    overlay_index = add_input(overlay["path"]) if overlay else None
+
+    graph = FilterGraph()
+    video = "0:v"
+
+    # Mise à l'échelle et recadrage des trames vers la résolution de sortie
+    if (source_w, source_h) != (width, height):
+        video = graph.chain([video], [
+            f"scale={width}:{height}:force_original_aspect_ratio=increase:flags=bicubic",
+            f"crop={width}:{height}",
+            "setsar=1",
+        ])
+
+    # Logo ou filigrane : redimensionné, rendu semi-transparent puis superposé
+    if overlay:
+        logo_width = max(2, int(width * OVERLAY_WIDTHS[overlay["type"]]) // 2 * 2)
+        logo = graph.chain([f"{overlay_index}:v"], [
+            "format=rgba",
+            f"scale={logo_width}:-1",
+            f"colorchannelmixer=aa={min(max(overlay['opacity'], 0.0), 1.0):.2f}",
+        ])
+        margin = round(width * 0.03)
+        x, y = (expr.format(m=margin) for expr in OVERLAY_POSITIONS.get(overlay["position"], OVERLAY_POSITIONS["Coin inférieur droit"]))
+        video = graph.chain([video, logo], [f"overlay=x={x}:y={y}:format=auto"])
+
+    # Sous-titres animés rendus par libass
+    if subtitles_path:
+        subtitles = [f"subtitles=filename={escape_filter_value(subtitles_path)}"]
+        if start_time:
+            # Segment d'une vidéo plus longue : horodatage décalé le temps du rendu des sous-titres
+            subtitles = [f"setpts=PTS+{start_time:.3f}/TB", *subtitles, "setpts=PTS-STARTPTS"]
+        video = graph.chain([video], subtitles)
+
+    if graph:
+        video = graph.chain([video], ["format=yuv420p"], output="v")
+
+    if graph:
+        command += ["-filter_complex", str(graph)]
+    command += ["-map", f"[{video}]" if video == "v" else video]
+    if audio_path:
+        command += ["-map", f"{audio_index}:a"]
+        # Une piste déjà encodée en AAC (mixage voix/musique) est recopiée sans second encodage
+        if audio_path.endswith(".m4a"):
+            command += ["-c:a", "copy"]
+        else:
+            command += ["-c:a", "aac", "-b:a", "192k"]
+
+    encoder = ENCODER_PRESETS.get(encoder_preset, ENCODER_PRESETS[DEFAULT_ENCODER_PRESET])
+    command += [
+        "-c:v", "libx264", "-preset", encoder["preset"], "-crf", str(encoder["crf"]), "-pix_fmt", "yuv420p", "-r", str(fps),
+        "-t", f"{duration:.3f}", "-movflags", "+faststart", output_path,
+    ]
+    return command, graph
+
+def print_dry_run(command, graph):
+    """Affiche le graphe de filtres et la commande ffmpeg compilés."""
+    print("Graphe de filtres :")
+    print(graph.pretty() if graph else "(aucun filtre)")
+    print("\nCommande ffmpeg :")
+    print(" ".join(f'"{arg}"' if " " in arg or ";" in arg else arg for arg in command))
+
+def main():
+    """Point d'entrée en ligne de commande : affiche le graphe compilé pour des réglages donnés (dry-run)."""
+    from utils.video_renderer import DEFAULT_FPS, resolution_for_ratio
+
+    parser = argparse.ArgumentParser(description="Compilation des réglages de rendu en un graphe de filtres ffmpeg")
+    parser.add_argument("--ratio", default="9:16", help="Ratio d'aspect (16:9, 9:16, 1:1, 4:5)")
+    parser.add_argument("--duration", type=float, default=30, help="Durée en secondes")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS, help="Images par seconde")
+    parser.add_argument("--audio", default=None, help="Voix off")
+    parser.add_argument("--overlay", default="Aucun", choices=["Aucun", *OVERLAY_WIDTHS], help="Type d'overlay")
+    parser.add_argument("--overlay-file", default=None, help="Image du logo ou du filigrane")
+    parser.add_argument("--position", default="Coin inférieur droit", choices=list(OVERLAY_POSITIONS), help="Position de l'overlay")
+    parser.add_argument("--opacity", type=float, default=0.8, help="Opacité de l'overlay")
+    parser.add_argument("--subtitles", default=None, help="Sous-titres rendus par libass")
+    parser.add_argument("--preset", default=DEFAULT_ENCODER_PRESET, choices=list(ENCODER_PRESETS), help="Réglage de l'encodeur")
+    parser.add_argument("--output", default="output.mp4", help="Fichier de sortie")
+    args = parser.parse_args()
+
+    command, graph = compile_render_command(
+        args.output, resolution_for_ratio(args.ratio), args.fps, args.duration,
+        audio_path=args.audio,
+        overlay=overlay_settings(args.overlay, args.overlay_file, args.position, args.opacity),
+        subtitles_path=args.subtitles, encoder_preset=args.preset
+    )
+    print_dry_run(command, graph)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+"""
+Ce module instrumente le pipeline de génération : spans (durée, octets, accès aux caches)
+autour de chaque étape, compteurs et histogrammes exportés au format texte Prometheus, et
+enregistrement optionnel d'une trace JSON par requête.
+
+Désactivée (par défaut), l'instrumentation se réduit à un test et au renvoi d'un span vide
+partagé : aucun chronométrage, aucune allocation, aucun verrou.
+
+Variables d'environnement :
+    SHORTGEN_METRICS=1          Active les métriques et le point d'accès /metrics.
+    SHORTGEN_TRACE_DIR=<dossier> Enregistre une trace JSON par requête dans ce dossier.
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+
+# Activation des métriques (histogrammes, compteurs et point d'accès /metrics)
+METRICS_ENABLED = os.getenv("SHORTGEN_METRICS", "0") == "1"
+# Dossier des traces par requête (vide pour désactiver)
+TRACE_DIR = os.getenv("SHORTGEN_TRACE_DIR") or None
+# L'instrumentation n'est active que si l'une des deux sorties est demandée
+INSTRUMENTATION_ENABLED = METRICS_ENABLED or TRACE_DIR is not None
+
+# Bornes (en secondes) des histogrammes de durée
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_lock = threading.Lock()
+_counters = {}    # (nom, étiquettes) -> valeur
+_histograms = {}  # (nom, étiquettes) -> {"buckets": [...], "sum": float, "count": int}
+_collectors = []  # (préfixe, fonction, nom de l'étiquette, description)
+_help = {
+    "shortgen_stage_duration_seconds": "Durée de chaque étape du pipeline",
+    "shortgen_stage_bytes_total": "Octets produits ou écrits par étape",
+    "shortgen_cache_requests_total": "Accès aux caches par étape (hit ou miss)",
+    "shortgen_coalesced_requests_total": "Requêtes identiques servies par un appel déjà en cours",
+}
+
+# Trace de la requête en cours (None hors requête ou si les traces sont désactivées)
+_current_trace = contextvars.ContextVar("shortgen_trace", default=None)
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+def increment(name, value=1, **labels):
+    """
+    Incrémente un compteur.
+
+    Args:
+        name (str): Nom de la métrique.
+        value (float, optional): Valeur ajoutée. Par défaut: 1.
+        **labels: Étiquettes de la série.
+    """
+    if not METRICS_ENABLED:
+        return
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, value, **labels):
+    """
+    Ajoute une observation à un histogramme de durée.
+
+    Args:
+        name (str): Nom de la métrique.
+        value (float): Valeur observée (en secondes).
+        **labels: Étiquettes de la série.
+    """
+    if not METRICS_ENABLED:
+        return
+    key = (name, _labels_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+def record_cache(stage, hit):
+    """
+    Compte un accès à un cache.
+
+    Args:
+        stage (str): Étape concernée ("tts", "whisper_model", "image", ...).
+        hit (bool): True si la donnée était en cache.
+    """
+    increment("shortgen_cache_requests_total", stage=stage, result="hit" if hit else "miss")
+
+class _NoopSpan:
+    """Span vide renvoyé lorsque l'instrumentation est désactivée."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class Span:
+    """
+    Mesure d'une étape : durée, statut et attributs (octets, accès au cache, modèle, ...).
+
+    Les attributs "bytes" et "cache_hit" alimentent aussi les compteurs Prometheus ; les autres
+    ne sont conservés que dans la trace de la requête.
+    """
+
+    __slots__ = ("name", "attributes", "start")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        status = "error" if exc_type else "ok"
+        observe("shortgen_stage_duration_seconds", duration, stage=self.name, status=status)
+        if "bytes" in self.attributes:
+            increment("shortgen_stage_bytes_total", self.attributes["bytes"], stage=self.name)
+        if "cache_hit" in self.attributes:
+            record_cache(self.name, self.attributes["cache_hit"])
+
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(self.name, self.start, duration, status, self.attributes)
+        return False
+
+    def set(self, **attributes):
+        """Ajoute des attributs au span (par exemple bytes=..., cache_hit=...)."""
+        self.attributes.update(attributes)
+
+def span(name, **attributes):
+    """
+    Mesure une étape du pipeline (à utiliser avec "with").
+
+    Args:
+        name (str): Nom de l'étape ("gemini", "tts_synthesis", "whisper_inference", ...).
+        **attributes: Attributs initiaux du span.
+
+    Returns:
+        Span: Le span, ou un span vide si l'instrumentation est désactivée.
+    """
+    if not INSTRUMENTATION_ENABLED:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+def record_span(name, duration, **attributes):
+    """
+    Enregistre une étape déjà chronométrée (par exemple une attente en file).
+
+    Args:
+        name (str): Nom de l'étape.
+        duration (float): Durée en secondes.
+        **attributes: Attributs du span.
+    """
+    if not INSTRUMENTATION_ENABLED:
+        return
+    observe("shortgen_stage_duration_seconds", duration, stage=name, status="ok")
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, time.perf_counter() - duration, duration, "ok", attributes)
+
+class Trace:
+    """
+    Trace d'une requête : liste des spans exécutés pendant son traitement, écrite en JSON à la fin.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.status = "ok"
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, start, duration, status, attributes):
+        entry = {
+            "name": name,
+            "start_s": round(start - self.start, 6),
+            "duration_s": round(duration, 6),
+            "status": status,
+            "thread": threading.current_thread().name,
+        }
+        entry.update({key: value for key, value in attributes.items() if isinstance(value, (str, int, float, bool)) or value is None})
+        with self._lock:
+            self.spans.append(entry)
+
+    def activate(self):
+        """Rend la trace courante dans le contexte actuel ; retourne la trace précédente pour deactivate()."""
+        previous = _current_trace.get()
+        _current_trace.set(self)
+        return previous
+
+    @staticmethod
+    def deactivate(previous):
+        # set() plutôt que reset() : un générateur peut reprendre dans un autre contexte
+        _current_trace.set(previous)
+
+    def save(self):
+        """Écrit la trace dans TRACE_DIR et retourne son chemin."""
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        path = os.path.join(TRACE_DIR, f"{stamp}_{self.name}_{self.trace_id}.json")
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_s"])
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "trace_id": self.trace_id,
+                "name": self.name,
+                "started_at": self.started_at,
+                "duration_s": round(time.perf_counter() - self.start, 6),
+                "status": self.status,
+                "spans": spans,
+            }, f, indent=2, ensure_ascii=False)
+        return path
+
+def _finish_trace(trace, failed):
+    if failed:
+        trace.status = "error"
+    try:
+        trace.save()
+    except Exception as e:
+        print(f"Échec de l'enregistrement de la trace {trace.trace_id} : {e}")
+
+def traced(fn):
+    """
+    Décorateur qui enregistre une trace par appel d'un gestionnaire (si SHORTGEN_TRACE_DIR est défini).
+
+    Les générateurs (synchrones ou asynchrones) réactivent la trace à chaque reprise : Gradio
+    peut les faire avancer depuis des contextes différents.
+
+    Args:
+        fn (callable): Gestionnaire d'événement.
+
+    Returns:
+        callable: Le gestionnaire instrumenté, ou fn inchangée si les traces sont désactivées.
+    """
+    if TRACE_DIR is None:
+        return fn
+    name = fn.__name__
+
+    if inspect.isasyncgenfunction(fn):
+        @functools.wraps(fn)
+        async def async_generator_wrapper(*args, **kwargs):
+            trace = Trace(name)
+            stream = fn(*args, **kwargs)
+            failed = True
+            try:
+                while True:
+                    previous = trace.activate()
+                    try:
+                        item = await stream.__anext__()
+                    except StopAsyncIteration:
+                        failed = False
+                        return
+                    finally:
+                        trace.deactivate(previous)
+                    yield item
+            finally:
+                _finish_trace(trace, failed)
+        return async_generator_wrapper
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def coroutine_wrapper(*args, **kwargs):
+            trace = Trace(name)
+            previous = trace.activate()
+            failed = True
+            try:
+                result = await fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                trace.deactivate(previous)
+                _finish_trace(trace, failed)
+        return coroutine_wrapper
+
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def generator_wrapper(*args, **kwargs):
+            trace = Trace(name)
+            stream = fn(*args, **kwargs)
+            failed = True
+            try:
+                while True:
+                    previous = trace.activate()
+                    try:
+                        item = next(stream)
+                    except StopIteration:
+                        failed = False
+                        return
+                    finally:
+                        trace.deactivate(previous)
+                    yield item
+            finally:
+                _finish_trace(trace, failed)
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        trace = Trace(name)
+        previous = trace.activate()
+        failed = True
+        try:
+            result = fn(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            trace.deactivate(previous)
+            _finish_trace(trace, failed)
+    return wrapper
+
+def propagate_context(fn):
+    """
+    Retourne une fonction qui s'exécute dans une copie du contexte courant (trace comprise).
+
+    À utiliser pour les fonctions confiées à un thread ou à un pool de threads.
+    """
+    if not INSTRUMENTATION_ENABLED:
+        return fn
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # Une copie par appel : un même contexte ne peut pas être actif dans deux threads à la fois
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+def register_collector(prefix, collect, label=None, help_text=None):
+    """
+    Enregistre une source de jauges lue à chaque export (statistiques des caches, files, pools).
+
+    Args:
+        prefix (str): Préfixe des métriques (par exemple "shortgen_scheduler").
+        collect (callable): Retourne un dictionnaire {métrique: valeur}, ou {étiquette: {métrique: valeur}} si label est fourni.
+        label (str, optional): Nom de l'étiquette des sous-dictionnaires (par exemple "resource").
+        help_text (str, optional): Description affichée dans l'export.
+    """
+    _collectors.append((prefix, collect, label, help_text))
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{key}="{str(value)}"'.replace("\n", " ") for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+def _collect_gauges():
+    """Lit les collecteurs enregistrés et retourne les séries {nom: [(étiquettes, valeur)]}."""
+    gauges = {}
+    for prefix, collect, label, help_text in _collectors:
+        try:
+            stats = collect()
+        except Exception as e:
+            print(f"Échec de la collecte des métriques {prefix} : {e}")
+            continue
+        groups = stats.items() if label else [(None, stats)]
+        for group, values in groups:
+            if not isinstance(values, dict):
+                continue
+            labels = ((label, group),) if label else ()
+            for key, value in values.items():
+                # Seules les valeurs numériques deviennent des jauges
+                if isinstance(value, bool) or isinstance(value, (int, float)):
+                    gauges.setdefault((f"{prefix}_{key}", help_text), []).append((labels, value))
+    return gauges
+
+def render_prometheus():
+    """
+    Exporte les métriques au format texte Prometheus (version 0.0.4).
+
+    Returns:
+        str: Le contenu de la réponse /metrics.
+    """
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]} for key, h in _histograms.items()}
+
+    for metric in sorted({name for name, _ in counters}):
+        lines.append(f"# HELP {metric} {_help.get(metric, metric)}")
+        lines.append(f"# TYPE {metric} counter")
+        for (name, labels), value in sorted(counters.items()):
+            if name == metric:
+                lines.append(f"{metric}{_format_labels(labels)} {_format_value(value)}")
+
+    for metric in sorted({name for name, _ in histograms}):
+        lines.append(f"# HELP {metric} {_help.get(metric, metric)}")
+        lines.append(f"# TYPE {metric} histogram")
+        for (name, labels), histogram in sorted(histograms.items()):
+            if name != metric:
+                continue
+            for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+            lines.append(f"{metric}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {histogram['count']}")
+
+    for (metric, help_text), series in sorted(_collect_gauges().items()):
+        lines.append(f"# HELP {metric} {help_text or metric}")
+        lines.append(f"# TYPE {metric} gauge")
+        for labels, value in series:
+            lines.append(f"{metric}{_format_labels(labels)} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+def mount_metrics_endpoint(demo, path="/metrics"):
+    """
+    Crée l'application FastAPI qui sert l'interface Gradio et le point d'accès des métriques.
+
+    Args:
+        demo (gr.Blocks): Interface Gradio.
+        path (str, optional): Chemin du point d'accès. Par défaut: "/metrics".
+
+    Returns:
+        fastapi.FastAPI: Application à servir avec uvicorn.
+    """
+    import gradio as gr
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse
+
+    app = FastAPI()
+
+    @app.get(path)
+    def metrics():
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    return gr.mount_gradio_app(app, demo, path="/")
@@ -0,0 +1,302 @@
+"""
+Ce module conserve les projets (script, voix off, sous-titres, vidéo) sous forme de graphe
+d'étapes dont chaque résultat est adressé par son contenu.
+
+Chaque artefact est copié une seule fois dans objects/ sous son empreinte SHA-256. Un
+manifeste décrit comment il a été produit : l'étape, les empreintes de ses entrées amont
+(script, audio, images...) et ses paramètres. La clé du manifeste est l'empreinte de cette
+description : relancer une étape dont ni les entrées ni les paramètres n'ont changé retrouve
+directement son artefact, et une entrée modifiée ne recalcule que les étapes situées en aval.
+
+    script ──► audio ──► subtitles ──► video
+                  └──────────────────────┘  (+ images, musique, overlay)
+
+Un projet associe chaque étape à son dernier manifeste ; il est enregistré sur disque et
+peut être rechargé dans l'interface après un redémarrage.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+# Dossier du magasin (artefacts, manifestes et projets)
+PROJECT_STORE_DIR = os.getenv("PROJECT_STORE_DIR", os.path.join(".cache", "projects"))
+
+# Étapes du pipeline et leurs entrées amont
+STAGES = {
+    "script": (),
+    "audio": ("script",),
+    "subtitles": ("audio", "script"),
+    "video": ("audio", "subtitles", "images", "music", "overlay"),
+}
+
+_file_hashes = {}
+_file_hashes_lock = threading.Lock()
+
+def hash_file(path):
+    """
+    Empreinte SHA-256 du contenu d'un fichier, mémorisée tant que sa taille et sa date de modification ne changent pas.
+
+    Partagée par le magasin de projets et le cache des segments vidéo (utils/render_cache.py).
+
+    Args:
+        path (str): Chemin du fichier.
+
+    Returns:
+        str: Empreinte hexadécimale.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _file_hashes_lock:
+        cached = _file_hashes.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    with _file_hashes_lock:
+        _file_hashes[key] = (signature, digest.hexdigest())
+    return _file_hashes[key][1]
+
+def hash_text(text):
+    """Empreinte SHA-256 d'un texte."""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def _write_json(path, data):
+    """Écriture atomique d'un fichier JSON."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+class ProjectStore:
+    """
+    Magasin d'artefacts adressés par leur contenu, de manifestes d'étapes et de projets.
+    """
+
+    def __init__(self, root=PROJECT_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _object_path(self, digest, ext):
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}{ext}")
+
+    def _manifest_path(self, key):
+        return os.path.join(self.root, "manifests", f"{key}.json")
+
+    def _project_path(self, project_id):
+        return os.path.join(self.root, "projects", f"{project_id}.json")
+
+    def put_file(self, path, companions=()):
+        """
+        Copie un fichier dans le magasin (une seule fois par contenu).
+
+        Args:
+            path (str): Fichier à conserver.
+            companions (tuple, optional): Fichiers associés (par exemple l'alignement d'un MP3),
+                copiés à côté de l'artefact avec le même suffixe.
+
+        Returns:
+            tuple: (empreinte, chemin de l'artefact dans le magasin).
+        """
+        digest = hash_file(path)
+        stem, ext = os.path.splitext(path)
+        object_path = self._object_path(digest, ext.lower())
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        targets = [(path, object_path)]
+        for companion in companions:
+            if companion.startswith(stem) and os.path.exists(companion):
+                targets.append((companion, os.path.splitext(object_path)[0] + companion[len(stem):]))
+        for source, target in targets:
+            if os.path.exists(target):
+                continue
+            # Copie (jamais de lien physique) : l'artefact ne doit pas changer si la source est réécrite
+            tmp_path = f"{target}.{uuid.uuid4().hex}.part"
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, target)
+        return digest, object_path
+
+    def put_text(self, text, ext=".md"):
+        """
+        Conserve un texte (un script par exemple) dans le magasin.
+
+        Returns:
+            tuple: (empreinte, chemin de l'artefact dans le magasin).
+        """
+        digest = hash_text(text)
+        object_path = self._object_path(digest, ext)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            tmp_path = f"{object_path}.{uuid.uuid4().hex}.part"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text or "")
+            os.replace(tmp_path, object_path)
+        return digest, object_path
+
+    @staticmethod
+    def stage_key(stage, inputs, params=None):
+        """
+        Clé d'une exécution d'étape : empreinte de l'étape, des empreintes amont et des paramètres.
+
+        Args:
+            stage (str): Nom de l'étape (voir STAGES).
+            inputs (dict): Empreintes des entrées amont (None pour une entrée absente).
+            params (dict, optional): Paramètres de l'étape (valeurs sérialisables en JSON).
+
+        Returns:
+            str: Empreinte SHA-256 hexadécimale.
+        """
+        payload = json.dumps([stage, inputs, params or {}], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, stage, inputs, params=None):
+        """
+        Retrouve le résultat d'une étape déjà exécutée avec les mêmes entrées et paramètres.
+
+        Returns:
+            dict: Manifeste (clés "key", "stage", "inputs", "params", "hash", "path"), None si l'étape est à recalculer.
+        """
+        manifest = _read_json(self._manifest_path(self.stage_key(stage, inputs, params)))
+        if manifest is None or not os.path.exists(os.path.join(self.root, manifest["path"])):
+            return None
+        return self._resolve(manifest)
+
+    def record(self, stage, inputs, params, artifact_path, companions=()):
+        """
+        Conserve le résultat d'une étape et son manifeste.
+
+        Args:
+            stage (str): Nom de l'étape.
+            inputs (dict): Empreintes des entrées amont.
+            params (dict): Paramètres de l'étape.
+            artifact_path (str): Fichier produit par l'étape.
+            companions (tuple, optional): Fichiers associés à conserver avec l'artefact.
+
+        Returns:
+            dict: Manifeste enregistré (chemin de l'artefact dans le magasin sous "path").
+        """
+        digest, object_path = self.put_file(artifact_path, companions)
+        return self._save_manifest(stage, inputs, params, digest, object_path)
+
+    def record_text(self, stage, text, inputs=None, params=None, ext=".md"):
+        """Conserve un texte produit par une étape (ou une source comme le script) et son manifeste."""
+        digest, object_path = self.put_text(text, ext)
+        return self._save_manifest(stage, inputs or {}, params, digest, object_path)
+
+    def _save_manifest(self, stage, inputs, params, digest, object_path):
+        key = self.stage_key(stage, inputs, params)
+        manifest = {
+            "key": key,
+            "stage": stage,
+            "inputs": inputs,
+            "params": params or {},
+            "hash": digest,
+            "path": os.path.relpath(object_path, self.root),
+            "created": time.time(),
+        }
+        _write_json(self._manifest_path(key), manifest)
+        return self._resolve(manifest)
+
+    def _resolve(self, manifest):
+        return {**manifest, "path": os.path.join(self.root, manifest["path"])}
+
+    def manifest(self, key):
+        """Manifeste d'une clé d'étape, None s'il est introuvable ou si son artefact a disparu."""
+        manifest = _read_json(self._manifest_path(key)) if key else None
+        if manifest is None or not os.path.exists(os.path.join(self.root, manifest["path"])):
+            return None
+        return self._resolve(manifest)
+
+    def save_project(self, project, stage=None, manifest=None, name=None, settings=None):
+        """
+        Enregistre un projet, en y rattachant éventuellement le dernier manifeste d'une étape.
+
+        Args:
+            project (dict): Projet courant (valeur d'un gr.State), None pour en créer un.
+            stage (str, optional): Étape mise à jour.
+            manifest (dict, optional): Manifeste de l'étape.
+            name (str, optional): Nom du projet.
+            settings (dict, optional): Réglages de l'interface à restaurer au rechargement.
+
+        Returns:
+            dict: Projet enregistré.
+        """
+        now = time.time()
+        project = dict(project or {"id": uuid.uuid4().hex[:12], "created": now, "stages": {}, "settings": {}})
+        project["stages"] = dict(project.get("stages", {}))
+        project["settings"] = {**project.get("settings", {}), **(settings or {})}
+        if stage and manifest:
+            project["stages"][stage] = manifest["key"]
+        if name:
+            project["name"] = name
+        project["updated"] = now
+        with self._lock:
+            _write_json(self._project_path(project["id"]), project)
+        return project
+
+    def load_project(self, project_id):
+        """
+        Recharge un projet et les artefacts de ses étapes.
+
+        Returns:
+            tuple: (projet, dictionnaire étape -> chemin de l'artefact), (None, {}) si le projet est introuvable.
+        """
+        project = _read_json(self._project_path(project_id)) if project_id else None
+        if project is None:
+            return None, {}
+        artifacts = {}
+        for stage, key in project.get("stages", {}).items():
+            manifest = self.manifest(key)
+            if manifest:
+                artifacts[stage] = manifest["path"]
+        return project, artifacts
+
+    def list_projects(self):
+        """Projets enregistrés, du plus récent au plus ancien."""
+        projects = []
+        for path in glob.glob(os.path.join(self.root, "projects", "*.json")):
+            project = _read_json(path)
+            if project:
+                projects.append(project)
+        return sorted(projects, key=lambda project: project.get("updated", 0), reverse=True)
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_project_store():
+    """Retourne le magasin de projets partagé."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ProjectStore()
+        return _store
+
+def project_name(script, length=40):
+    """Nom lisible d'un projet : début de la première ligne non vide du script."""
+    for line in (script or "").splitlines():
+        line = line.strip("#*- \t")
+        if line:
+            return line if len(line) <= length else line[:length - 1].rstrip() + "…"
+    return "Projet sans titre"
+
+def project_choices(projects):
+    """Choix (libellé, identifiant) d'un menu déroulant de projets."""
+    return [
+        (f"{project.get('name', 'Projet sans titre')} — {time.strftime('%d/%m %H:%M', time.localtime(project.get('updated', 0)))}", project["id"])
+        for project in projects
+    ]
@@ -0,0 +1,262 @@
+"""
+Ce module gère l'aperçu brouillon et le rendu final incrémental des vidéos.
+
+Le rendu final est découpé en segments de quelques secondes, encodés indépendamment et
+mis en cache sous l'empreinte de tout ce qui détermine leurs pixels (images visibles pendant
+le segment, sous-titres qui s'y affichent, overlay, résolution, encodeur...). Un réglage qui
+ne touche qu'un segment (une réplique modifiée par exemple) ne ré-encode que ce segment ;
+les segments sont ensuite concaténés sans ré-encodage et la piste audio est multiplexée.
+
+L'aperçu brouillon est rendu d'une traite en basse résolution et fréquence réduite.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import uuid
+
+from utils import metrics
+from utils.filtergraph import DEFAULT_ENCODER_PRESET
+from utils.project_store import hash_file
+from utils.video_renderer import CROSSFADE_SECONDS, DEFAULT_FPS, load_cover_image, render_video
+
+# Dossier des segments encodés
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR", os.path.join(".cache", "segments"))
+# Durée cible d'un segment (en secondes)
+RENDER_SEGMENT_SECONDS = float(os.getenv("RENDER_SEGMENT_SECONDS", "5"))
+# Nombre maximal de segments conservés avant éviction des moins récemment utilisés
+RENDER_CACHE_MAX_SEGMENTS = int(os.getenv("RENDER_CACHE_MAX_SEGMENTS", "500"))
+# Version du moteur de rendu, à incrémenter si le rendu d'une même entrée change
+RENDER_VERSION = 1
+
+# Aperçu brouillon : échelle de la résolution, images par seconde et réglage de l'encodeur
+DRAFT_SCALE = float(os.getenv("DRAFT_SCALE", "0.4"))
+DRAFT_FPS = int(os.getenv("DRAFT_FPS", "12"))
+DRAFT_ENCODER_PRESET = "Rapide"
+
+def draft_size(size, scale=DRAFT_SCALE):
+    """Résolution de l'aperçu brouillon (dimensions paires, exigées par yuv420p)."""
+    return tuple(max(2, int(side * scale) // 2 * 2) for side in size)
+
+def segment_ranges(duration, fps, segment_seconds=RENDER_SEGMENT_SECONDS):
+    """
+    Découpe la vidéo en segments de trames.
+
+    Args:
+        duration (float): Durée totale en secondes.
+        fps (int): Images par seconde.
+        segment_seconds (float, optional): Durée cible d'un segment.
+
+    Returns:
+        list: Intervalles (première trame, trame de fin exclue).
+    """
+    total_frames = int(round(duration * fps))
+    step = max(1, int(round(segment_seconds * fps)))
+    return [(start, min(start + step, total_frames)) for start in range(0, total_frames, step)]
+
+def _visible_images(count, duration, start_time, end_time):
+    """Indices des images visibles entre start_time et end_time (fondus enchaînés compris, voir iter_frames)."""
+    slot = duration / count
+    xfade = min(CROSSFADE_SECONDS, slot / 2)
+    first = min(int(start_time / slot), count - 1)
+    last = min(int((end_time + xfade) / slot), count - 1)
+    return range(first, last + 1)
+
+_ASS_TIME = re.compile(r"(\d+):(\d{2}):(\d{2})\.(\d{2})")
+_subtitle_events = {}
+
+def _ass_seconds(match):
+    hours, minutes, seconds, centiseconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds) + int(centiseconds) / 100
+
+def _ass_events(subtitles_path):
+    """
+    Découpe des sous-titres ASS en en-tête (styles, résolution...) et lignes Dialogue horodatées.
+
+    Le résultat est mémorisé par empreinte du fichier.
+
+    Returns:
+        tuple: (en-tête, liste de (début, fin, ligne Dialogue)), temps en secondes.
+    """
+    digest = hash_file(subtitles_path)
+    if digest not in _subtitle_events:
+        header, events = [], []
+        with open(subtitles_path, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = line.split(",", 3)
+                start = _ASS_TIME.fullmatch(fields[1].strip()) if line.startswith("Dialogue:") and len(fields) > 3 else None
+                end = _ASS_TIME.fullmatch(fields[2].strip()) if start else None
+                if start and end:
+                    events.append((_ass_seconds(start), _ass_seconds(end), line))
+                else:
+                    header.append(line)
+        _subtitle_events[digest] = ("".join(header), events)
+        while len(_subtitle_events) > 32:
+            _subtitle_events.pop(next(iter(_subtitle_events)))
+    return _subtitle_events[digest]
+
+def _subtitles_key(subtitles_path, start_time, end_time):
+    """Empreinte de l'en-tête ASS et des seules lignes Dialogue affichées entre start_time et end_time."""
+    header, events = _ass_events(subtitles_path)
+    lines = [line for start, end, line in events if start < end_time and end > start_time]
+    return hashlib.sha256((header + "".join(lines)).encode("utf-8")).hexdigest()
+
+def segment_key(image_paths, size, duration, fps, frames, captions=None, overlay=None, subtitles_path=None,
+                encoder_preset=DEFAULT_ENCODER_PRESET):
+    """
+    Calcule la clé de cache d'un segment à partir de tout ce qui détermine son rendu.
+
+    Args:
+        image_paths (list): Chemins des images de la vidéo.
+        size (tuple): Résolution de sortie.
+        duration (float): Durée totale de la vidéo (elle fixe le rythme des images).
+        fps (int): Images par seconde.
+        frames (tuple): Intervalle (première trame, trame de fin exclue) du segment.
+        captions (CaptionCompositor, optional): Sous-titres incrustés ; seules les répliques du segment comptent.
+        overlay (dict, optional): Logo ou filigrane.
+        subtitles_path (str, optional): Sous-titres animés (libass) ; seuls l'en-tête et les lignes du segment comptent.
+        encoder_preset (str, optional): Réglage de l'encodeur.
+
+    Returns:
+        str: Empreinte SHA-256 hexadécimale.
+    """
+    start_frame, end_frame = frames
+    start_time, end_time = start_frame / fps, end_frame / fps
+    images = [(i, hash_file(image_paths[i])) for i in _visible_images(len(image_paths), duration, start_time, end_time)]
+    cues = []
+    if captions is not None:
+        cues = [list(cue) for cue in captions.cues if cue[0] < end_time and cue[1] > start_time]
+    payload = {
+        "version": RENDER_VERSION,
+        "size": list(size),
+        "duration": round(float(duration), 3),
+        "fps": fps,
+        "frames": [start_frame, end_frame],
+        "images": [len(image_paths), images],
+        "captions": [list(captions.style.key) if captions is not None else None, cues],
+        "overlay": {**overlay, "path": hash_file(overlay["path"])} if overlay else None,
+        "subtitles": _subtitles_key(subtitles_path, start_time, end_time) if subtitles_path else None,
+        "encoder": encoder_preset,
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _enforce_cache_quota():
+    """Évince les segments les moins récemment utilisés au-delà de RENDER_CACHE_MAX_SEGMENTS."""
+    try:
+        # Les segments en cours d'encodage (.part.mp4) d'un rendu concurrent ne sont jamais évincés
+        entries = [entry for entry in os.scandir(RENDER_CACHE_DIR)
+                   if entry.name.endswith(".mp4") and not entry.name.endswith(".part.mp4")]
+    except FileNotFoundError:
+        return
+    dated = []
+    for entry in entries:
+        try:
+            dated.append((entry.stat().st_mtime, entry.path))
+        except FileNotFoundError:
+            # Segment évincé ou remplacé entre-temps par un rendu concurrent
+            continue
+    dated.sort(reverse=True)
+    for _, path in dated[RENDER_CACHE_MAX_SEGMENTS:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def concat_segments(segment_paths, output_path, duration, audio_path=None):
+    """
+    Concatène des segments MP4 sans ré-encodage et multiplexe la piste audio.
+
+    Args:
+        segment_paths (list): Segments dans l'ordre de lecture.
+        output_path (str): Chemin du fichier MP4 de sortie.
+        duration (float): Durée totale en secondes.
+        audio_path (str, optional): Piste audio (recopiée si déjà en AAC, encodée sinon).
+
+    Returns:
+        str: Chemin du fichier vidéo produit.
+
+    Raises:
+        RuntimeError: Si ffmpeg échoue.
+    """
+    list_path = f"{os.path.splitext(output_path)[0]}.segments.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    command = ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_path:
+        command += ["-i", audio_path, "-map", "0:v", "-map", "1:a"]
+        command += ["-c:a", "copy"] if audio_path.endswith(".m4a") else ["-c:a", "aac", "-b:a", "192k"]
+    command += ["-c:v", "copy", "-t", f"{duration:.3f}", "-movflags", "+faststart", output_path]
+    try:
+        result = subprocess.run(command, stderr=subprocess.PIPE)
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg a échoué : {result.stderr.decode('utf-8', errors='replace').strip()}")
+    return output_path
+
+def render_video_segmented(image_paths, output_path, size, duration, fps=DEFAULT_FPS, audio_path=None, load_base=load_cover_image,
+                           captions=None, overlay=None, subtitles_path=None, encoder_preset=DEFAULT_ENCODER_PRESET,
+                           segment_seconds=RENDER_SEGMENT_SECONDS):
+    """
+    Rend une vidéo segment par segment en réutilisant les segments déjà encodés avec les mêmes entrées.
+
+    Args:
+        image_paths (list): Chemins des images à animer.
+        output_path (str): Chemin du fichier MP4 de sortie.
+        size (tuple): Résolution de sortie (largeur, hauteur).
+        duration (float): Durée en secondes.
+        fps (int, optional): Images par seconde. Par défaut: 30.
+        audio_path (str, optional): Piste audio à multiplexer (voix off ou mixage voix/musique).
+        load_base (callable, optional): Source des images préparées (par exemple TemplateIndex.load_base).
+        captions (CaptionCompositor, optional): Sous-titres à incruster.
+        overlay (dict, optional): Logo ou filigrane (voir filtergraph.overlay_settings).
+        subtitles_path (str, optional): Sous-titres animés rendus par libass.
+        encoder_preset (str, optional): Réglage de l'encodeur.
+        segment_seconds (float, optional): Durée cible d'un segment.
+
+    Returns:
+        tuple: (chemin de la vidéo, dictionnaire {"segments", "rendered", "reused"}).
+
+    Raises:
+        RuntimeError: Si ffmpeg est introuvable ou échoue.
+    """
+    if not image_paths:
+        raise ValueError("Aucune image à animer")
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg est introuvable. Veuillez l'installer et l'ajouter au PATH")
+
+    os.makedirs(RENDER_CACHE_DIR, exist_ok=True)
+    stats = {"segments": 0, "rendered": 0, "reused": 0}
+    segment_paths = []
+    for frames in segment_ranges(duration, fps, segment_seconds):
+        key = segment_key(image_paths, size, duration, fps, frames, captions, overlay, subtitles_path, encoder_preset)
+        path = os.path.join(RENDER_CACHE_DIR, f"{key}.mp4")
+        hit = os.path.exists(path)
+        metrics.record_cache("render_segment", hit)
+        if hit:
+            # Marque le segment comme récemment utilisé
+            os.utime(path)
+            stats["reused"] += 1
+        else:
+            tmp_path = os.path.join(RENDER_CACHE_DIR, f"{key}.{uuid.uuid4().hex}.part.mp4")
+            try:
+                render_video(
+                    image_paths, tmp_path, size, duration, fps, load_base=load_base, captions=captions, overlay=overlay,
+                    subtitles_path=subtitles_path, encoder_preset=encoder_preset, start_frame=frames[0], end_frame=frames[1],
+                )
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            stats["rendered"] += 1
+        stats["segments"] += 1
+        segment_paths.append(path)
+
+    concat_segments(segment_paths, output_path, duration, audio_path)
+    _enforce_cache_quota()
+    return output_path, stats
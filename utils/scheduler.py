@@ -0,0 +1,245 @@
+"""
+Ce module répartit les traitements des événements Gradio en classes de ressources
+(réseau, transcription, diffusion, rendu). Chaque classe a sa propre limite de concurrence
+et une file d'attente bornée : une génération d'image lente ne bloque plus la génération
+de script, et une classe saturée refuse les nouvelles requêtes au lieu de les accumuler.
+"""
+
+import asyncio
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import gradio as gr
+
+from utils import metrics
+
+# Limites par défaut : (requêtes simultanées, requêtes en attente)
+# Surchargées par SHORTGEN_<CLASSE>_CONCURRENCY et SHORTGEN_<CLASSE>_QUEUE
+DEFAULT_LIMITS = {
+    "network": (8, 32),    # Gemini, ElevenLabs
+    "asr": (1, 8),         # Transcription Whisper
+    "diffusion": (4, 8),   # Génération d'images (regroupées en lots par utils/diffusion_service.py)
+    "render": (2, 8),      # Rendu vidéo ffmpeg
+}
+
+class QueueFullError(Exception):
+    """Levée lorsque la file d'attente d'une classe de ressources est pleine."""
+
+class ResourceClass:
+    """
+    Classe de ressources avec concurrence limitée et file d'attente bornée.
+    """
+
+    def __init__(self, name, concurrency, max_queue):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self._semaphore = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _enqueue(self, notify):
+        """Inscrit une requête dans la file d'attente, ou lève QueueFullError si elle est pleine."""
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(self.name)
+            self.queued += 1
+            position = self.queued
+        if notify:
+            notify(position)
+
+    def _dequeue(self):
+        with self._lock:
+            self.queued -= 1
+
+    def _started(self, start):
+        wait = time.perf_counter() - start
+        metrics.record_span("queue_wait", wait, resource=self.name)
+        with self._lock:
+            self.active += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def _finished(self):
+        with self._lock:
+            self.active -= 1
+            self.completed += 1
+        self._semaphore.release()
+
+    @contextmanager
+    def slot(self, notify=None):
+        """
+        Réserve un emplacement d'exécution, en attendant si la classe est saturée.
+
+        Args:
+            notify (callable, optional): Appelée avec la position dans la file si la requête doit attendre.
+
+        Raises:
+            QueueFullError: Si la file d'attente est pleine.
+        """
+        start = time.perf_counter()
+        if not self._semaphore.acquire(blocking=False):
+            self._enqueue(notify)
+            try:
+                self._semaphore.acquire()
+            finally:
+                self._dequeue()
+
+        self._started(start)
+        try:
+            yield
+        finally:
+            self._finished()
+
+    @asynccontextmanager
+    async def async_slot(self, notify=None, poll_interval=0.05):
+        """
+        Variante asynchrone de slot() : l'attente ne bloque jamais la boucle d'événements.
+
+        Args:
+            notify (callable, optional): Appelée avec la position dans la file si la requête doit attendre.
+            poll_interval (float, optional): Intervalle (en secondes) entre deux tentatives. Par défaut: 0.05.
+
+        Raises:
+            QueueFullError: Si la file d'attente est pleine.
+        """
+        start = time.perf_counter()
+        if not self._semaphore.acquire(blocking=False):
+            self._enqueue(notify)
+            try:
+                while not self._semaphore.acquire(blocking=False):
+                    await asyncio.sleep(poll_interval)
+            finally:
+                self._dequeue()
+
+        self._started(start)
+        try:
+            yield
+        finally:
+            self._finished()
+
+    def stats(self):
+        """Retourne l'état courant de la classe (profondeur de file, temps d'attente)."""
+        with self._lock:
+            started = self.completed + self.active
+            return {
+                "concurrency": self.concurrency,
+                "active": self.active,
+                "queued": self.queued,
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_s": round(self.total_wait / started, 3) if started else 0.0,
+                "max_wait_s": round(self.max_wait, 3),
+            }
+
+def _limit_from_env(name, kind, default):
+    return int(os.getenv(f"SHORTGEN_{name.upper()}_{kind}", str(default)))
+
+RESOURCE_CLASSES = {
+    name: ResourceClass(
+        name,
+        _limit_from_env(name, "CONCURRENCY", concurrency),
+        _limit_from_env(name, "QUEUE", max_queue),
+    )
+    for name, (concurrency, max_queue) in DEFAULT_LIMITS.items()
+}
+
+def _notify_position(resource):
+    def notify(position):
+        gr.Info(f"⏳ Serveur occupé ({resource}) : vous êtes en position {position} dans la file d'attente")
+    return notify
+
+@contextmanager
+def resource_slot(resource):
+    """
+    Exécute un bloc dans une classe de ressources, avec message de file d'attente dans l'interface.
+
+    Args:
+        resource (str): Nom de la classe ("network", "asr", "diffusion" ou "render").
+
+    Raises:
+        gr.Error: Si la file d'attente de la classe est pleine.
+    """
+    try:
+        with RESOURCE_CLASSES[resource].slot(notify=_notify_position(resource)):
+            yield
+    except QueueFullError:
+        raise gr.Error("Le serveur est saturé pour ce type de traitement. Veuillez réessayer dans quelques instants.")
+
+@asynccontextmanager
+async def async_resource_slot(resource):
+    """
+    Variante asynchrone de resource_slot() pour les gestionnaires async.
+
+    Args:
+        resource (str): Nom de la classe ("network", "asr", "diffusion" ou "render").
+
+    Raises:
+        gr.Error: Si la file d'attente de la classe est pleine.
+    """
+    try:
+        async with RESOURCE_CLASSES[resource].async_slot(notify=_notify_position(resource)):
+            yield
+    except QueueFullError:
+        raise gr.Error("Le serveur est saturé pour ce type de traitement. Veuillez réessayer dans quelques instants.")
+
+def scheduled(resource):
+    """
+    Décorateur qui place un gestionnaire d'événement Gradio dans une classe de ressources.
+
+    Les fonctions génératrices (réponses en streaming) gardent leur emplacement jusqu'à la fin du flux.
+    Les fonctions async attendent leur emplacement sans bloquer la boucle d'événements.
+    Chaque appel est tracé (attente en file comprise) si SHORTGEN_TRACE_DIR est défini.
+
+    Args:
+        resource (str): Nom de la classe ("network", "asr", "diffusion" ou "render").
+    """
+    def decorator(fn):
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def async_generator_wrapper(*args, **kwargs):
+                async with async_resource_slot(resource):
+                    async for item in fn(*args, **kwargs):
+                        yield item
+            return metrics.traced(async_generator_wrapper)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def coroutine_wrapper(*args, **kwargs):
+                async with async_resource_slot(resource):
+                    return await fn(*args, **kwargs)
+            return metrics.traced(coroutine_wrapper)
+
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                with resource_slot(resource):
+                    yield from fn(*args, **kwargs)
+            return metrics.traced(generator_wrapper)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with resource_slot(resource):
+                return fn(*args, **kwargs)
+        return metrics.traced(wrapper)
+    return decorator
+
+def get_scheduler_stats():
+    """
+    Retourne l'état de chaque classe de ressources.
+
+    Returns:
+        dict: Pour chaque classe, concurrence, requêtes actives et en attente, temps d'attente moyen et maximal.
+    """
+    return {name: resource.stats() for name, resource in RESOURCE_CLASSES.items()}
@@ -1,6 +1,318 @@
-import whisper
 import os  # Pour la gestion des chemins de fichiers
 import argparse  # Pour gérer les arguments de ligne de commande
+import functools  # Pour reporter les temps des morceaux sur l'audio complet
+import itertools  # Pour enchaîner les résultats des morceaux transcrits
+import threading  # Pour protéger le registre des modèles
+import re  # Pour normaliser les textes comparés (taux d'erreur par mot)
+import time  # Pour mesurer les temps de chargement
+from collections import OrderedDict  # Pour l'ordre LRU du registre
+from concurrent.futures import Future  # Pour attendre un modèle en cours de chargement
+from utils import metrics  # Pour mesurer le chargement et l'inférence
+from utils.subtitle_writer import SubtitleWriter, format_srt_time, srt_cue, to_milliseconds  # Pour écrire les sous-titres
+
+# Registre des modèles Whisper partagé par tout le processus.
+# Les clés sont des tuples (model_size, device, backend), les valeurs des dictionnaires
+# contenant le modèle, sa taille mémoire et son temps de chargement.
+_model_registry = OrderedDict()
+_model_registry_lock = threading.Lock()
+_model_registry_stats = {"hits": 0, "misses": 0, "evictions": 0, "load_times": {}}
+# Chargements en cours (clé -> Future), effectués hors du verrou du registre
+_model_loading = {}
+
+# Budget mémoire (en Mo) au-delà duquel les modèles les moins récemment utilisés sont évincés
+WHISPER_MEMORY_BUDGET_MB = int(os.getenv("WHISPER_MEMORY_BUDGET_MB", "4096"))
+# Taille du modèle à précharger au démarrage de l'application (vide pour désactiver)
+WHISPER_WARMUP_MODEL = os.getenv("WHISPER_WARMUP_MODEL", "base")
+# Backend de transcription par défaut ("fp32", "fp16" ou "int8")
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "fp32")
+
+# Codes de langue Whisper correspondant aux langues proposées dans l'onglet Idées
+LANGUAGE_CODES = {"Français": "fr", "Anglais": "en", "Espagnol": "es", "Allemand": "de"}
+
+# Limites de découpage des sous-titres construits à partir d'un alignement
+MAX_CUE_CHARS = 42
+MAX_CUE_DURATION = 5.0
+
+# Fenêtres de transcription incrémentale : durée visée et zone (fin de fenêtre) où chercher un silence pour couper
+TRANSCRIBE_WINDOW_SECONDS = float(os.getenv("TRANSCRIBE_WINDOW_SECONDS", "30"))
+WINDOW_CUT_SEARCH_SECONDS = 2.0
+# Transcription parallèle des longs audios : découpage sur les silences (VAD) et morceaux répartis sur le pool
+WHISPER_VAD_PARALLEL = os.getenv("WHISPER_VAD_PARALLEL", "0") == "1"
+
+def _default_device():
+    """
+    Détermine le périphérique par défaut pour l'inférence Whisper.
+
+    Returns:
+        str: "cuda" si un GPU est disponible, "cpu" sinon.
+    """
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def _model_memory_mb(model):
+    """
+    Estime la mémoire occupée par les paramètres et buffers d'un modèle.
+
+    Args:
+        model (torch.nn.Module): Modèle chargé.
+
+    Returns:
+        float: Taille estimée en Mo.
+    """
+    total_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+    total_bytes += sum(b.numel() * b.element_size() for b in model.buffers())
+    # Les couches quantifiées stockent leurs poids int8 hors des paramètres
+    for module in model.modules():
+        if callable(getattr(module, "weight", None)):
+            weight = module.weight()
+            total_bytes += weight.numel() * weight.element_size()
+    return total_bytes / (1024 * 1024)
+
+class ASRBackend:
+    """
+    Backend de transcription : chargement du modèle Whisper et options de décodage.
+
+    Les sous-classes redéfinissent load() (préparation du modèle) et la précision de décodage.
+    """
+
+    name = None
+    # Décodage en demi-précision (uniquement sur GPU, Whisper repasse en fp32 sur CPU)
+    fp16 = False
+
+    def resolve_device(self, device):
+        """Retourne le périphérique effectivement utilisé par ce backend."""
+        return device or _default_device()
+
+    def load(self, model_size, device):
+        """
+        Charge le modèle Whisper pour ce backend.
+
+        Args:
+            model_size (str): Taille du modèle Whisper.
+            device (str): Périphérique ("cpu" ou "cuda").
+
+        Returns:
+            whisper.model.Whisper: Le modèle prêt pour l'inférence.
+        """
+        # Import paresseux : whisper (et torch) ne sont chargés qu'à la première transcription
+        import whisper
+        return whisper.load_model(model_size, device=device)
+
+    def transcribe(self, model, audio, **options):
+        """
+        Transcrit un audio avec un modèle chargé par ce backend.
+
+        Args:
+            model (whisper.model.Whisper): Modèle retourné par load().
+            audio (str ou numpy.ndarray): Chemin du fichier audio ou signal à 16 kHz.
+            **options: Options transmises à model.transcribe (language, initial_prompt, word_timestamps, ...).
+
+        Returns:
+            dict: Résultat Whisper ("text", "language", "segments").
+        """
+        options.setdefault("fp16", self.fp16 and model.device.type == "cuda")
+        return model.transcribe(audio, **options)
+
+class Fp32Backend(ASRBackend):
+    """Modèle et décodage en pleine précision (référence)."""
+
+    name = "fp32"
+
+class Fp16Backend(ASRBackend):
+    """Décodage en demi-précision sur GPU ; identique à fp32 sur CPU."""
+
+    name = "fp16"
+    fp16 = True
+
+class Int8Backend(ASRBackend):
+    """
+    Quantification dynamique int8 des couches linéaires, pour l'inférence sur CPU.
+
+    Les poids des couches linéaires (attention et MLP, l'essentiel du calcul) sont stockés en int8
+    et les activations quantifiées à la volée ; le décodage reste en fp32.
+    """
+
+    name = "int8"
+
+    def resolve_device(self, device):
+        # Les noyaux de quantification dynamique de PyTorch ne tournent que sur CPU
+        return "cpu"
+
+    def load(self, model_size, device):
+        import torch
+        import whisper
+
+        model = whisper.load_model(model_size, device="cpu")
+        # whisper.model.Linear ne diffère de nn.Linear que par sa méthode forward (conversion de type) :
+        # les couches sont ramenées à nn.Linear pour être reconnues par quantize_dynamic
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear):
+                module.__class__ = torch.nn.Linear
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+# Backends disponibles, par nom
+ASR_BACKENDS = {backend.name: backend for backend in (Fp32Backend(), Fp16Backend(), Int8Backend())}
+
+def register_asr_backend(backend):
+    """
+    Ajoute (ou remplace) un backend de transcription.
+
+    Args:
+        backend (ASRBackend): Instance du backend ; son attribut name sert de clé.
+    """
+    ASR_BACKENDS[backend.name] = backend
+
+def get_asr_backend(name=None):
+    """
+    Retourne un backend de transcription.
+
+    Args:
+        name (str, optional): Nom du backend. Par défaut: la variable d'environnement WHISPER_BACKEND.
+
+    Returns:
+        ASRBackend: Le backend demandé.
+
+    Raises:
+        ValueError: Si le backend est inconnu.
+    """
+    name = name or WHISPER_BACKEND
+    if name not in ASR_BACKENDS:
+        raise ValueError(f"Backend de transcription inconnu : {name} (disponibles : {', '.join(ASR_BACKENDS)})")
+    return ASR_BACKENDS[name]
+
+def _evict_models(keep_key):
+    """
+    Évince les modèles les moins récemment utilisés tant que le budget mémoire est dépassé.
+    Doit être appelée avec le verrou du registre acquis.
+
+    Args:
+        keep_key (tuple): Clé du modèle qui vient d'être utilisé et qui ne doit pas être évincé.
+    """
+    total_mb = sum(entry["memory_mb"] for entry in _model_registry.values())
+    while total_mb > WHISPER_MEMORY_BUDGET_MB and len(_model_registry) > 1:
+        key, entry = next(iter(_model_registry.items()))
+        if key == keep_key:
+            break
+        del _model_registry[key]
+        total_mb -= entry["memory_mb"]
+        _model_registry_stats["evictions"] += 1
+        print(f"Modèle Whisper évincé du registre : {key[0]} ({key[1]}, {key[2]})")
+
+def get_whisper_model(model_size="base", device=None, backend=None):
+    """
+    Retourne un modèle Whisper chargé une seule fois par processus pour chaque (taille, périphérique, backend).
+
+    Args:
+        model_size (str, optional): Taille du modèle Whisper. Par défaut: "base".
+        device (str, optional): Périphérique ("cpu" ou "cuda"). Détecté automatiquement si None.
+        backend (str, optional): Nom du backend ("fp32", "fp16", "int8"). Par défaut: WHISPER_BACKEND.
+
+    Returns:
+        whisper.model.Whisper: Le modèle chargé.
+    """
+    asr_backend = get_asr_backend(backend)
+    device = asr_backend.resolve_device(device)
+    key = (model_size, device, asr_backend.name)
+
+    with _model_registry_lock:
+        entry = _model_registry.get(key)
+        if entry is not None:
+            _model_registry.move_to_end(key)
+            _model_registry_stats["hits"] += 1
+            metrics.record_cache("whisper_model", True)
+            return entry["model"]
+
+        loading = _model_loading.get(key)
+        if loading is None:
+            loading = _model_loading[key] = Future()
+            _model_registry_stats["misses"] += 1
+            metrics.record_cache("whisper_model", False)
+            owner = True
+        else:
+            owner = False
+
+    if not owner:
+        # Le même modèle est déjà en cours de chargement par un autre thread
+        return loading.result()
+
+    # Chargement hors du verrou : les autres modèles et les statistiques restent accessibles
+    start = time.perf_counter()
+    try:
+        with metrics.span("whisper_load", model=model_size, device=device, backend=asr_backend.name):
+            model = asr_backend.load(model_size, device)
+    except BaseException as e:
+        with _model_registry_lock:
+            del _model_loading[key]
+        loading.set_exception(e)
+        raise
+    load_time = time.perf_counter() - start
+
+    with _model_registry_lock:
+        _model_registry[key] = {
+            "model": model,
+            "memory_mb": _model_memory_mb(model),
+            "load_time": load_time,
+        }
+        _model_registry_stats["load_times"][f"{model_size}/{device}/{asr_backend.name}"] = load_time
+        _evict_models(key)
+        del _model_loading[key]
+    loading.set_result(model)
+    return model
+
+def warmup_whisper_model(model_size=None, device=None, backend=None):
+    """
+    Précharge un modèle Whisper dans le registre pour que la première transcription ne paie pas le chargement.
+
+    Args:
+        model_size (str, optional): Taille du modèle. Par défaut: la variable d'environnement WHISPER_WARMUP_MODEL.
+        device (str, optional): Périphérique ("cpu" ou "cuda"). Détecté automatiquement si None.
+        backend (str, optional): Nom du backend. Par défaut: WHISPER_BACKEND.
+
+    Returns:
+        bool: True si le modèle est prêt, False sinon.
+    """
+    model_size = model_size or WHISPER_WARMUP_MODEL
+    if not model_size:
+        return False
+
+    from utils.asr_pool import get_asr_pool, pool_enabled
+    if pool_enabled():
+        # Les modèles sont chargés dans les processus du pool, pas dans le serveur
+        get_asr_pool(model_size, device, backend)
+        print(f"Pool de transcription démarré (modèle '{model_size}')")
+        return True
+
+    try:
+        asr_backend = get_asr_backend(backend)
+        get_whisper_model(model_size, device, asr_backend.name)
+        load_key = f"{model_size}/{asr_backend.resolve_device(device)}/{asr_backend.name}"
+        load_time = _model_registry_stats["load_times"].get(load_key, 0.0)
+        print(f"Modèle Whisper '{model_size}' ({asr_backend.name}) préchargé en {load_time:.2f}s")
+        return True
+    except Exception as e:
+        print(f"Échec du préchargement du modèle Whisper '{model_size}' : {e}")
+        return False
+
+def get_model_registry_stats():
+    """
+    Retourne les statistiques du registre des modèles Whisper.
+
+    Returns:
+        dict: Nombre de hits/misses/évictions, temps de chargement et modèles actuellement chargés.
+    """
+    with _model_registry_lock:
+        return {
+            "hits": _model_registry_stats["hits"],
+            "misses": _model_registry_stats["misses"],
+            "evictions": _model_registry_stats["evictions"],
+            "load_times": dict(_model_registry_stats["load_times"]),
+            "loaded_models": [
+                {"model_size": size, "device": device, "backend": backend, "memory_mb": round(entry["memory_mb"], 1)}
+                for (size, device, backend), entry in _model_registry.items()
+            ],
+            "memory_mb": round(sum(entry["memory_mb"] for entry in _model_registry.values()), 1),
+            "memory_budget_mb": WHISPER_MEMORY_BUDGET_MB,
+        }
 
 def format_timestamp(seconds):
     """
@@ -12,12 +324,8 @@ def format_timestamp(seconds):
     Returns:
         str: Timestamp formaté.
     """
-    hours = int(seconds / 3600)
-    minutes = int((seconds % 3600) / 60)
-    seconds_remainder = seconds % 60
-    milliseconds = int((seconds_remainder - int(seconds_remainder)) * 1000)
-    
-    return f"{hours:02d}:{minutes:02d}:{int(seconds_remainder):02d},{milliseconds:03d}"
+    # Conversion unique en millisecondes entières : pas d'erreur d'arrondi flottant (1.001 -> ,001)
+    return format_srt_time(to_milliseconds(seconds))
 
 def generate_srt(segments):
     """
@@ -29,18 +337,288 @@ def generate_srt(segments):
     Returns:
         str: Le contenu au format SRT.
     """
-    srt_content = ""
-    for i, segment in enumerate(segments, start=1):
-        # Formatage du temps de début et de fin en format SRT (HH:MM:SS,mmm)
-        start_time = format_timestamp(segment["start"])
-        end_time = format_timestamp(segment["end"])
-        
-        # Ajout du numéro de segment, du timing et du texte
-        srt_content += f"{i}\n{start_time} --> {end_time}\n{segment['text'].strip()}\n\n"
-    
-    return srt_content.strip()
+    with metrics.span("srt_format", segments=len(segments)) as span:
+        # Blocs assemblés en une seule fois (pas de concaténations successives)
+        srt_content = "".join(
+            srt_cue(i, segment) for i, segment in enumerate(segments, start=1)
+        ).strip()
+        span.set(bytes=len(srt_content.encode("utf-8")))
+    return srt_content
+
+def language_code_from_label(label):
+    """
+    Convertit un libellé de langue de l'onglet Idées (par exemple "🇫🇷 Français") en code Whisper.
+
+    Args:
+        label (str): Libellé de la langue.
 
-def transcribe_audio(audio_file_path, model_size="base", language="fr", output_file=None, format="txt", quiet=False):
+    Returns:
+        str: Code de langue ("fr", "en", ...) ou "auto" si la langue est inconnue.
+    """
+    name = label.split(" ")[-1] if label else ""
+    return LANGUAGE_CODES.get(name, "auto")
+
+def alignment_to_segments(alignment, max_chars=MAX_CUE_CHARS, max_duration=MAX_CUE_DURATION):
+    """
+    Construit des segments de sous-titres à partir de l'horodatage des caractères fourni par la synthèse vocale.
+
+    Les mots sont regroupés en segments qui se terminent à la fin d'une phrase ou lorsque
+    le segment dépasse max_chars caractères ou max_duration secondes.
+
+    Args:
+        alignment (dict): Clés "characters", "character_start_times_seconds" et "character_end_times_seconds".
+        max_chars (int, optional): Nombre maximal de caractères par segment. Par défaut: 42.
+        max_duration (float, optional): Durée maximale d'un segment en secondes. Par défaut: 5.0.
+
+    Returns:
+        list: Segments au format Whisper ("start", "end", "text", "words").
+    """
+    characters = alignment["characters"]
+    starts = alignment["character_start_times_seconds"]
+    ends = alignment["character_end_times_seconds"]
+
+    # Regroupement des caractères en mots horodatés
+    words = []
+    current = None
+    for char, start, end in zip(characters, starts, ends):
+        if char.isspace():
+            current = None
+            continue
+        if current is None:
+            current = {"word": "", "start": start, "end": end}
+            words.append(current)
+        current["word"] += char
+        current["end"] = end
+
+    # Regroupement des mots en segments
+    segments = []
+    cue_words = []
+    for word in words:
+        if cue_words:
+            text = " ".join(w["word"] for w in cue_words + [word])
+            if len(text) > max_chars or word["end"] - cue_words[0]["start"] > max_duration:
+                segments.append(cue_words)
+                cue_words = []
+        cue_words.append(word)
+        if word["word"][-1] in ".!?…":
+            segments.append(cue_words)
+            cue_words = []
+    if cue_words:
+        segments.append(cue_words)
+
+    return [
+        {
+            "start": cue[0]["start"],
+            "end": cue[-1]["end"],
+            "text": " ".join(w["word"] for w in cue),
+            "words": cue,
+        }
+        for cue in segments
+    ]
+
+def align_script_to_audio(audio_file_path, script_text=None, language="auto", output_file=None, alignment=None, model_size="base", quiet=False, format="srt"):
+    """
+    Génère des sous-titres pour un audio dont le script est connu.
+
+    Les temps sont tirés de l'horodatage des caractères fourni par la synthèse vocale (fichier
+    .alignment.json enregistré à côté du MP3). Sans alignement disponible, une transcription Whisper
+    complète est utilisée en dernier recours, avec la langue connue (pas de détection) et le script
+    comme contexte initial.
+
+    Args:
+        audio_file_path (str): Chemin vers le fichier audio.
+        script_text (str, optional): Texte du script lu dans l'audio.
+        language (str, optional): Code de langue connu (par exemple "fr"). Par défaut: "auto".
+        output_file (str, optional): Chemin du fichier de sous-titres de sortie.
+        alignment (dict, optional): Alignement des caractères. Chargé depuis le fichier associé au MP3 si None.
+        model_size (str, optional): Taille du modèle Whisper utilisé en dernier recours. Par défaut: "base".
+        quiet (bool, optional): Si True, supprime les messages dans le terminal. Par défaut: False.
+        format (str, optional): Format des sous-titres ("srt", "vtt" ou "ass"). Par défaut: "srt".
+
+    Returns:
+        str: Le contenu des sous-titres, None en cas d'échec.
+    """
+    if alignment is None:
+        # Import local pour ne pas lier le module de sous-titres au client ElevenLabs
+        from utils.audio_utils import load_alignment
+        alignment = load_alignment(audio_file_path)
+
+    if not alignment or not alignment.get("characters"):
+        if not quiet:
+            print("Alignement indisponible, transcription Whisper complète")
+        return transcribe_audio(
+            audio_file_path,
+            model_size=model_size,
+            language=language,
+            output_file=output_file,
+            format=format,
+            quiet=quiet,
+            initial_prompt=script_text
+        )
+
+    with metrics.span("file_write", kind=format) as span, SubtitleWriter(output_file, format) as writer:
+        content = writer.write_all(alignment_to_segments(alignment))
+        span.set(bytes=len(content.encode("utf-8")), segments=writer.count)
+    if output_file and not quiet:
+        print(f"Sous-titres {format.upper()} (alignement) enregistrés dans : {output_file}")
+    return content
+
+def _quiet_cut(audio, start, end, sample_rate, search_seconds=WINDOW_CUT_SEARCH_SECONDS, frame_seconds=0.1):
+    """
+    Choisit où couper une fenêtre : au milieu de la trame la plus silencieuse des dernières
+    search_seconds secondes avant end, pour ne pas couper un mot en deux.
+
+    Returns:
+        int: Indice de l'échantillon où couper.
+    """
+    import numpy as np
+
+    frame = int(frame_seconds * sample_rate)
+    search_start = max(start + frame, end - int(search_seconds * sample_rate))
+    count = (end - search_start) // frame
+    if count < 1:
+        return end
+    frames = audio[search_start:search_start + count * frame].reshape(count, frame)
+    quietest = int(np.argmin(np.square(frames).mean(axis=1)))
+    return search_start + quietest * frame + frame // 2
+
+def _remap_segment(segment, index, to_global):
+    """Replace un segment d'une fenêtre ou d'un morceau (et ses mots) sur la chronologie de l'audio complet."""
+    segment = dict(segment, id=index, start=to_global(segment["start"]), end=to_global(segment["end"]))
+    if segment.get("words"):
+        segment["words"] = [dict(word, start=to_global(word["start"]), end=to_global(word["end"])) for word in segment["words"]]
+    return segment
+
+def _iter_vad_segments(audio, sample_rate, model_size, language, device, backend, initial_prompt, options, window_seconds, info):
+    """
+    Transcrit les zones de parole d'un signal en parallèle dans le pool de processus.
+
+    Les silences sont retirés : chaque morceau juxtapose des zones de parole et ses temps
+    sont reportés sur la chronologie de l'audio complet.
+    """
+    from utils.asr_pool import transcribe_chunks_in_pool
+    from utils.vad import chunk_audio, chunk_time_to_global, speech_chunks
+
+    with metrics.span("vad", audio_s=round(len(audio) / sample_rate, 2)) as span:
+        chunks = speech_chunks(audio, sample_rate, max_chunk_seconds=window_seconds)
+        speech = sum(end - start for pieces in chunks for start, end in pieces)
+        span.set(chunks=len(chunks), speech_s=round(speech / sample_rate, 2))
+    if not chunks:
+        return
+
+    signals = [chunk_audio(audio, pieces) for pieces in chunks]
+    first = []
+    if language is None:
+        # Langue détectée sur le premier morceau puis imposée aux autres, transcrits en parallèle
+        first = list(transcribe_chunks_in_pool(signals[:1], model_size, device, backend, initial_prompt, language=None, **options))
+        language = first[0].get("language")
+        initial_prompt = None
+    info["language"] = language
+
+    with metrics.span("whisper_inference", model=model_size, backend=backend or WHISPER_BACKEND, pool=True, chunks=len(chunks)):
+        remaining = transcribe_chunks_in_pool(signals[len(first):], model_size, device, backend, initial_prompt, language=language, **options)
+        index = 0
+        for pieces, result in zip(chunks, itertools.chain(first, remaining)):
+            to_global = functools.partial(chunk_time_to_global, pieces=pieces, sample_rate=sample_rate)
+            for segment in result["segments"]:
+                yield _remap_segment(segment, index, to_global)
+                index += 1
+
+def iter_transcription_segments(audio_file_path, model_size="base", language="fr", device=None, backend=None, initial_prompt=None, word_timestamps=True, window_seconds=TRANSCRIBE_WINDOW_SECONDS, info=None, vad=None):
+    """
+    Transcrit un audio fenêtre par fenêtre et produit les segments au fur et à mesure du décodage.
+
+    L'audio est découpé en fenêtres d'environ window_seconds secondes, coupées sur un silence ;
+    le texte de la fenêtre précédente sert de contexte au décodage de la suivante et la langue
+    détectée sur la première fenêtre est conservée pour les autres. Les temps (segments et mots)
+    sont exprimés par rapport au début de l'audio. Lorsque le pool de processus est activé,
+    l'audio est transcrit d'un bloc dans le pool et les segments sont produits ensuite.
+
+    Avec vad=True, les silences sont détectés et retirés, et les zones de parole sont
+    transcrites en parallèle dans le pool de processus (adapté aux longs audios).
+
+    Args:
+        audio_file_path (str): Chemin vers le fichier audio.
+        model_size (str, optional): Taille du modèle Whisper. Par défaut: "base".
+        language (str, optional): Code de langue, "auto" ou None pour la détection automatique. Par défaut: "fr".
+        device (str, optional): Périphérique ("cpu" ou "cuda"). Détecté automatiquement si None.
+        backend (str, optional): Backend de transcription. Par défaut: WHISPER_BACKEND.
+        initial_prompt (str, optional): Texte attendu fourni comme contexte à la première fenêtre.
+        word_timestamps (bool, optional): Horodatage de chaque mot (clé "words" des segments). Par défaut: True.
+        window_seconds (float, optional): Durée visée d'une fenêtre. Par défaut: TRANSCRIBE_WINDOW_SECONDS.
+        info (dict, optional): Reçoit la langue détectée (clé "language").
+        vad (bool, optional): Transcription parallèle des zones de parole. Par défaut: WHISPER_VAD_PARALLEL.
+
+    Yields:
+        dict: Segments au format Whisper ("id", "start", "end", "text", "words").
+    """
+    whisper_language = None if language in ("auto", None) else language
+    info = info if info is not None else {}
+    options = {"word_timestamps": word_timestamps}
+
+    if WHISPER_VAD_PARALLEL if vad is None else vad:
+        import whisper
+        audio = whisper.load_audio(audio_file_path)
+        yield from _iter_vad_segments(audio, whisper.audio.SAMPLE_RATE, model_size, whisper_language, device, backend, initial_prompt, options, window_seconds, info)
+        return
+
+    from utils.asr_pool import pool_enabled, transcribe_in_pool
+    if pool_enabled():
+        with metrics.span("whisper_inference", model=model_size, backend=backend or WHISPER_BACKEND, pool=True):
+            result = transcribe_in_pool(audio_file_path, model_size, device, backend, language=whisper_language, initial_prompt=initial_prompt, **options)
+        info["language"] = result.get("language")
+        for index, segment in enumerate(result["segments"]):
+            yield _remap_segment(segment, index, float)
+        return
+
+    import whisper
+
+    model = get_whisper_model(model_size, device, backend)
+    asr_backend = get_asr_backend(backend)
+    audio = whisper.load_audio(audio_file_path)
+    sample_rate = whisper.audio.SAMPLE_RATE
+    window = max(1, int(window_seconds * sample_rate))
+
+    start = 0
+    index = 0
+    prompt = initial_prompt
+    while start < len(audio):
+        end = len(audio) if len(audio) - start <= window else _quiet_cut(audio, start, start + window, sample_rate)
+        with metrics.span("whisper_inference", model=model_size, backend=backend or WHISPER_BACKEND, pool=False, window_s=round((end - start) / sample_rate, 2)):
+            result = asr_backend.transcribe(model, audio[start:end], language=whisper_language, initial_prompt=prompt, **options)
+        if whisper_language is None:
+            whisper_language = info["language"] = result.get("language")
+
+        offset = start / sample_rate
+        for segment in result["segments"]:
+            yield _remap_segment(segment, index, lambda t: t + offset)
+            index += 1
+        # Contexte de la fenêtre suivante : la fin du texte déjà transcrit
+        prompt = result["text"][-200:] or prompt
+        start = end
+
+def stream_subtitles(audio_file_path, output_file=None, format="srt", model_size="base", language="fr", device=None, backend=None, initial_prompt=None, vad=None):
+    """
+    Transcrit un audio et écrit ses sous-titres au fur et à mesure (fichier vidé après chaque segment).
+
+    Args:
+        audio_file_path (str): Chemin vers le fichier audio.
+        output_file (str, optional): Fichier de sous-titres à écrire.
+        format (str, optional): "srt", "vtt" ou "ass". Par défaut: "srt".
+        model_size, language, device, backend, initial_prompt, vad: Voir iter_transcription_segments.
+
+    Yields:
+        str: Sous-titres écrits jusqu'ici, après chaque nouveau segment.
+    """
+    segments = iter_transcription_segments(audio_file_path, model_size, language, device, backend, initial_prompt, word_timestamps=format == "ass", vad=vad)
+    with metrics.span("file_write", kind=format) as span, SubtitleWriter(output_file, format) as writer:
+        for segment in segments:
+            if writer.write(segment):
+                yield writer.content
+        span.set(bytes=len(writer.content.encode("utf-8")), segments=writer.count)
+    yield writer.content
+
+def transcribe_audio(audio_file_path, model_size="base", language="fr", output_file=None, format="txt", quiet=False, device=None, initial_prompt=None, backend=None, vad=None):
     """
     Transcrit un fichier audio en texte en utilisant Whisper.
 
@@ -50,11 +628,15 @@ def transcribe_audio(audio_file_path, model_size="base", language="fr", output_f
         language (str, optional): Code de langue (par exemple, "fr" pour le français, "en" pour l'anglais). 
                                  Utilisez "auto" ou None pour la détection automatique de la langue. Par défaut: "fr".
         output_file (str, optional): Chemin du fichier de sortie. Si non spécifié, affiche la transcription sur la console.
-        format (str, optional): Format de sortie ("txt" ou "srt"). Par défaut: "txt".
+        format (str, optional): Format de sortie ("txt", "srt", "vtt" ou "ass"). Par défaut: "txt".
         quiet (bool, optional): Si True, supprime les messages dans le terminal. Par défaut: False.
+        device (str, optional): Périphérique ("cpu" ou "cuda"). Détecté automatiquement si None.
+        initial_prompt (str, optional): Texte attendu (script connu) fourni comme contexte au décodeur.
+        backend (str, optional): Backend de transcription ("fp32", "fp16", "int8"). Par défaut: WHISPER_BACKEND.
+        vad (bool, optional): Silences retirés et zones de parole transcrites en parallèle. Par défaut: WHISPER_VAD_PARALLEL.
 
     Returns:
-        str: Le texte transcrit ou le contenu SRT si la transcription réussit, None sinon.
+        str: Le texte transcrit ou le contenu des sous-titres si la transcription réussit, None sinon.
     """
 
     # Vérification de l'existence du fichier
@@ -64,33 +646,35 @@ def transcribe_audio(audio_file_path, model_size="base", language="fr", output_f
         return None
 
     try:
-        # Chargement du modèle Whisper
-        model = whisper.load_model(model_size)
+        format = format.lower()
+        info = {}
+        # Segments produits fenêtre par fenêtre (dans le pool de processus s'il est activé)
+        segments = iter_transcription_segments(
+            audio_file_path, model_size, language, device, backend, initial_prompt,
+            word_timestamps=format == "ass", info=info, vad=vad
+        )
+
+        # Traitement en fonction du format demandé : les sous-titres sont écrits segment par segment
+        if format in ("srt", "vtt", "ass"):
+            with metrics.span("file_write", kind=format) as span, SubtitleWriter(output_file, format) as writer:
+                writer.write_all(segments)
+                content = writer.content
+                span.set(bytes=len(content.encode("utf-8")), segments=writer.count)
+            output_type = f"sous-titres {format.upper()}"
+        else:
+            content = "".join(segment["text"] for segment in segments)
+            output_type = "transcription"
+            if output_file:
+                with metrics.span("file_write", kind=format, bytes=len(content.encode("utf-8"))), open(output_file, "w", encoding="utf-8") as f:
+                    f.write(content)
 
-        # Gestion de la détection automatique de langue
-        whisper_language = None if language == "auto" else language
-        
-        # Transcription du fichier audio
-        result = model.transcribe(audio_file_path, language=whisper_language)
-        
         # Si la langue a été détectée automatiquement, afficher l'information
         if language == "auto" or language is None:
-            detected_language = result.get("language", "inconnue")
             if not quiet:
-                print(f"Langue détectée : {detected_language}")
-
-        # Traitement en fonction du format demandé
-        if format.lower() == "srt":
-            content = generate_srt(result["segments"])
-            output_type = "sous-titres SRT"
-        else:
-            content = result["text"]
-            output_type = "transcription"
+                print(f"Langue détectée : {info.get('language') or 'inconnue'}")
 
         # Gestion de la sortie (console ou fichier)
         if output_file:
-            with open(output_file, "w", encoding="utf-8") as f:
-                f.write(content)
             if not quiet:
                 print(f"{output_type.capitalize()} enregistrée dans : {output_file}")
         else:
@@ -104,3 +688,118 @@ def transcribe_audio(audio_file_path, model_size="base", language="fr", output_f
         if not quiet:
             print(f"Une erreur s'est produite lors de la transcription : {e}")
         return None
+
+def _normalize_words(text):
+    """Découpe un texte en mots en minuscules, sans ponctuation, pour le calcul du WER."""
+    return re.findall(r"\w+(?:'\w+)?", text.lower())
+
+def word_error_rate(reference, hypothesis):
+    """
+    Calcule le taux d'erreur par mot (WER) d'une transcription par rapport à une référence.
+
+    Args:
+        reference (str): Texte de référence.
+        hypothesis (str): Texte à évaluer.
+
+    Returns:
+        float: (substitutions + suppressions + insertions) / nombre de mots de la référence.
+    """
+    ref = _normalize_words(reference)
+    hyp = _normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+
+    # Distance d'édition sur les mots, une ligne de la matrice à la fois
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            ))
+        previous = current
+    return previous[-1] / len(ref)
+
+def compare_asr_backends(audio_file_path, model_size="base", language="fr", backends=None, reference_backend="fp32", device=None):
+    """
+    Compare les backends de transcription sur un fichier : facteur temps réel et WER par rapport au backend de référence.
+
+    Args:
+        audio_file_path (str): Chemin vers le fichier audio.
+        model_size (str, optional): Taille du modèle Whisper. Par défaut: "base".
+        language (str, optional): Code de langue, ou "auto". Par défaut: "fr".
+        backends (list, optional): Noms des backends à comparer. Par défaut: tous les backends enregistrés.
+        reference_backend (str, optional): Backend servant de référence pour le WER. Par défaut: "fp32".
+        device (str, optional): Périphérique ("cpu" ou "cuda"). Détecté automatiquement si None.
+
+    Returns:
+        list: Pour chaque backend, temps de chargement, temps de transcription, facteur temps réel (RTF),
+              mémoire du modèle, WER et texte transcrit.
+    """
+    import whisper
+
+    backends = list(backends or ASR_BACKENDS)
+    if reference_backend in backends:
+        # La référence est transcrite en premier pour calculer le WER des autres backends
+        backends.remove(reference_backend)
+    backends.insert(0, reference_backend)
+
+    audio_duration = len(whisper.load_audio(audio_file_path)) / whisper.audio.SAMPLE_RATE
+    whisper_language = None if language == "auto" else language
+
+    results = []
+    reference_text = None
+    for name in backends:
+        asr_backend = get_asr_backend(name)
+        start = time.perf_counter()
+        model = get_whisper_model(model_size, device, name)
+        load_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        text = asr_backend.transcribe(model, audio_file_path, language=whisper_language)["text"].strip()
+        transcribe_time = time.perf_counter() - start
+
+        if reference_text is None:
+            reference_text = text
+        results.append({
+            "backend": name,
+            "device": asr_backend.resolve_device(device),
+            "load_s": round(load_time, 2),
+            "transcribe_s": round(transcribe_time, 2),
+            "rtf": round(transcribe_time / audio_duration, 3) if audio_duration else None,
+            "memory_mb": round(_model_memory_mb(model), 1),
+            "wer": round(word_error_rate(reference_text, text), 4),
+            "text": text,
+        })
+    return results
+
+def main():
+    """Point d'entrée en ligne de commande : transcription ou comparaison des backends."""
+    parser = argparse.ArgumentParser(description="Transcription Whisper et comparaison des backends de transcription")
+    parser.add_argument("audio", help="Fichier audio à transcrire")
+    parser.add_argument("--model", default="base", help="Taille du modèle Whisper (tiny, base, small, medium, large)")
+    parser.add_argument("--language", default="fr", help="Code de langue, ou 'auto' pour la détection automatique")
+    parser.add_argument("--backend", default=None, choices=sorted(ASR_BACKENDS), help="Backend de transcription")
+    parser.add_argument("--device", default=None, help="Périphérique (cpu ou cuda)")
+    parser.add_argument("--format", default="txt", choices=["txt", "srt", "vtt", "ass"], help="Format de sortie")
+    parser.add_argument("--output", default=None, help="Fichier de sortie")
+    parser.add_argument("--vad", action="store_true", default=None,
+                        help="Retire les silences et transcrit les zones de parole en parallèle (longs audios)")
+    parser.add_argument("--compare", nargs="*", metavar="BACKEND",
+                        help="Compare les backends (tous par défaut) : facteur temps réel et WER par rapport à fp32")
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        results = compare_asr_backends(args.audio, args.model, args.language, args.compare or None, device=args.device)
+        print(f"{'Backend':<8} {'Périph.':<7} {'Charg.(s)':>9} {'Transcr.(s)':>11} {'RTF':>7} {'Mém.(Mo)':>9} {'WER':>7}")
+        for r in results:
+            print(f"{r['backend']:<8} {r['device']:<7} {r['load_s']:>9.2f} {r['transcribe_s']:>11.2f} "
+                  f"{r['rtf']:>7.3f} {r['memory_mb']:>9.1f} {r['wer']:>7.2%}")
+        return
+
+    transcribe_audio(args.audio, args.model, args.language, args.output, args.format, device=args.device, backend=args.backend, vad=args.vad)
+
+if __name__ == "__main__":
+    main()
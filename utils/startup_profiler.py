@@ -0,0 +1,65 @@
+"""
+Ce module mesure le temps passé dans chaque étape du démarrage de l'application
+(imports de modules, initialisation des moteurs, construction de l'interface).
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Active l'affichage du rapport de démarrage (SHORTGEN_PROFILE_STARTUP=1)
+PROFILE_STARTUP = os.getenv("SHORTGEN_PROFILE_STARTUP", "0") == "1"
+
+_process_start = time.perf_counter()
+_steps = []
+_steps_lock = threading.Lock()
+
+@contextmanager
+def profile_step(name, category="import"):
+    """
+    Mesure la durée d'une étape du démarrage.
+
+    Args:
+        name (str): Nom de l'étape (par exemple "gradio" ou "whisper:base").
+        category (str, optional): Catégorie de l'étape ("import", "init", "ui", "warmup"). Par défaut: "import".
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        with _steps_lock:
+            _steps.append({
+                "name": name,
+                "category": category,
+                "start": start - _process_start,
+                "duration": duration,
+                "thread": threading.current_thread().name,
+            })
+
+def get_startup_profile():
+    """
+    Retourne les étapes mesurées depuis le démarrage.
+
+    Returns:
+        list: Liste de dictionnaires (nom, catégorie, début relatif, durée, thread).
+    """
+    with _steps_lock:
+        return list(_steps)
+
+def print_startup_report(title="Profil de démarrage", force=False):
+    """
+    Affiche le rapport des étapes mesurées, triées par durée décroissante.
+
+    Args:
+        title (str, optional): Titre du rapport.
+        force (bool, optional): Affiche le rapport même si SHORTGEN_PROFILE_STARTUP n'est pas activé.
+    """
+    if not (PROFILE_STARTUP or force):
+        return
+    steps = get_startup_profile()
+    elapsed = time.perf_counter() - _process_start
+    print(f"⏱️ {title} ({elapsed:.2f}s depuis le lancement du processus)")
+    for step in sorted(steps, key=lambda s: s["duration"], reverse=True):
+        print(f"  {step['category']:<7} {step['name']:<32} {step['duration'] * 1000:8.1f} ms  [{step['thread']}]")
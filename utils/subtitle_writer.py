@@ -0,0 +1,203 @@
+"""
+Ce module écrit des sous-titres au fil de l'eau, segment par segment, aux formats SRT,
+WebVTT et ASS (karaoké mot à mot à partir de l'horodatage des mots).
+
+Les instants sont convertis une seule fois en millisecondes entières : les découpages en
+heures, minutes, secondes et millisecondes se font en arithmétique entière, sans erreur
+d'arrondi flottant (1.001 s donne bien 00:00:01,001).
+"""
+
+import os
+
+# Formats disponibles et extension des fichiers produits
+SUBTITLE_FORMATS = {"srt": ".srt", "vtt": ".vtt", "ass": ".ass"}
+
+# Libellés des formats proposés dans l'interface
+SUBTITLE_FORMAT_LABELS = {"SRT": "srt", "WebVTT": "vtt", "ASS (karaoké)": "ass"}
+
+# En-tête ASS : style par défaut des sous-titres animés (le texte passe du blanc au jaune mot à mot)
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: {width}
+PlayResY: {height}
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,{font_size},&H0000FFFF,&H00FFFFFF,&H00000000,&H80000000,-1,0,0,0,100,100,0,0,1,3,1,2,40,40,{margin_v},1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+def subtitle_format_from_label(label):
+    """
+    Convertit un libellé de format de l'interface (par exemple "WebVTT") en format ("srt", "vtt" ou "ass").
+
+    Args:
+        label (str): Libellé affiché, ou directement un format.
+
+    Returns:
+        str: Format des sous-titres, "srt" si le libellé est inconnu.
+    """
+    if label in SUBTITLE_FORMATS:
+        return label
+    return SUBTITLE_FORMAT_LABELS.get(label, "srt")
+
+def to_milliseconds(seconds):
+    """Convertit un instant en secondes en millisecondes entières (arrondi au plus proche, jamais négatif)."""
+    return max(0, int(round(seconds * 1000)))
+
+def _split_milliseconds(ms):
+    hours, ms = divmod(ms, 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    seconds, ms = divmod(ms, 1000)
+    return hours, minutes, seconds, ms
+
+def format_srt_time(ms):
+    """Formate des millisecondes au format SRT (HH:MM:SS,mmm)."""
+    hours, minutes, seconds, ms = _split_milliseconds(ms)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+def format_vtt_time(ms):
+    """Formate des millisecondes au format WebVTT (HH:MM:SS.mmm)."""
+    hours, minutes, seconds, ms = _split_milliseconds(ms)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{ms:03d}"
+
+def format_ass_time(ms):
+    """Formate des millisecondes au format ASS (H:MM:SS.cc, en centièmes de seconde)."""
+    hours, minutes, seconds, ms = _split_milliseconds(ms)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}.{ms // 10:02d}"
+
+def _segment_bounds(segment):
+    start = to_milliseconds(segment["start"])
+    return start, max(start, to_milliseconds(segment["end"]))
+
+def srt_cue(index, segment):
+    """Bloc SRT d'un segment (numéro, intervalle, texte et ligne vide)."""
+    start, end = _segment_bounds(segment)
+    return f"{index}\n{format_srt_time(start)} --> {format_srt_time(end)}\n{segment['text'].strip()}\n\n"
+
+def vtt_cue(segment):
+    """Bloc WebVTT d'un segment."""
+    start, end = _segment_bounds(segment)
+    text = segment["text"].strip().replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return f"{format_vtt_time(start)} --> {format_vtt_time(end)}\n{text}\n\n"
+
+def _ass_text(text):
+    # Les accolades introduisent des balises ASS et les retours à la ligne s'écrivent \N
+    return text.strip().replace("{", "(").replace("}", ")").replace("\n", "\\N")
+
+def ass_dialogue(segment, karaoke=True):
+    """
+    Ligne Dialogue ASS d'un segment ; avec karaoke=True et l'horodatage des mots, chaque mot
+    est surligné pendant sa durée (balises \\kf, en centièmes de seconde).
+    """
+    start, end = _segment_bounds(segment)
+    words = segment.get("words") or []
+    if karaoke and words:
+        parts = []
+        # Instant (en centièmes) jusqu'où le surlignage est déjà planifié, relatif au début du segment
+        cursor = 0
+        for i, word in enumerate(words):
+            word_start = (to_milliseconds(word["start"]) - start) // 10
+            if word_start > cursor:
+                # Silence avant le mot : rien n'est surligné
+                parts.append(f"{{\\k{word_start - cursor}}}")
+                cursor = word_start
+            next_start = to_milliseconds(words[i + 1]["start"]) if i + 1 < len(words) else to_milliseconds(word["end"])
+            duration = max(1, (min(next_start, end) - start) // 10 - cursor)
+            parts.append(f"{{\\kf{duration}}}{_ass_text(word['word'])} ")
+            cursor += duration
+        text = "".join(parts).rstrip()
+    else:
+        text = _ass_text(segment["text"])
+    return f"Dialogue: 0,{format_ass_time(start)},{format_ass_time(end)},Default,,0,0,0,,{text}\n"
+
+class SubtitleWriter:
+    """
+    Écrit des sous-titres segment par segment, dans un fichier (vidé après chaque segment)
+    et/ou en mémoire pour un affichage progressif.
+    """
+
+    def __init__(self, path=None, format="srt", karaoke=True, resolution=(720, 1280), font_size=64):
+        """
+        Args:
+            path (str, optional): Fichier de sortie. Si None, les sous-titres sont seulement gardés en mémoire.
+            format (str, optional): "srt", "vtt" ou "ass". Par défaut: "srt".
+            karaoke (bool, optional): Surlignage mot à mot en ASS lorsque l'horodatage des mots est disponible.
+            resolution (tuple, optional): Résolution de référence (largeur, hauteur) de l'en-tête ASS.
+            font_size (int, optional): Taille de police du style ASS par défaut.
+
+        Raises:
+            ValueError: Si le format est inconnu.
+        """
+        if format not in SUBTITLE_FORMATS:
+            raise ValueError(f"Format de sous-titres inconnu : {format}")
+        self.path = path
+        self.format = format
+        self.karaoke = karaoke
+        self.count = 0
+        self._parts = []
+        self._file = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, "w", encoding="utf-8")
+
+        if format == "vtt":
+            self._emit("WEBVTT\n\n")
+        elif format == "ass":
+            width, height = resolution
+            self._emit(ASS_HEADER.format(width=width, height=height, font_size=font_size, margin_v=height // 8))
+
+    def _emit(self, text):
+        self._parts.append(text)
+        if self._file:
+            self._file.write(text)
+            self._file.flush()
+
+    def write(self, segment):
+        """
+        Ajoute un segment ("start", "end", "text" et éventuellement "words").
+
+        Args:
+            segment (dict): Segment Whisper ou construit à partir d'un alignement.
+
+        Returns:
+            str: Le bloc écrit.
+        """
+        if not segment["text"].strip():
+            return ""
+        self.count += 1
+        if self.format == "srt":
+            cue = srt_cue(self.count, segment)
+        elif self.format == "vtt":
+            cue = vtt_cue(segment)
+        else:
+            cue = ass_dialogue(segment, self.karaoke)
+        self._emit(cue)
+        return cue
+
+    def write_all(self, segments):
+        """Ajoute plusieurs segments et retourne le contenu complet."""
+        for segment in segments:
+            self.write(segment)
+        return self.content
+
+    @property
+    def content(self):
+        """Sous-titres écrits jusqu'ici (sans les lignes vides finales)."""
+        return "".join(self._parts).rstrip() + ("\n" if self.format == "ass" else "")
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,213 @@
+"""
+Ce module maintient un index des images modèles (dossier Templates) prêtes pour le rendu.
+
+Pour chaque image et chaque résolution de sortie, l'index conserve un tableau RGB déjà décodé,
+recadré au ratio et redimensionné (marge de zoom comprise) dans un fichier .npy projeté en
+mémoire : le rendu et les aperçus lisent directement ces tableaux au lieu de décoder et
+redimensionner les JPEG à chaque fois. Des miniatures sont aussi produites pour l'interface.
+
+Une entrée est invalidée lorsque la date de modification du fichier source change et que
+son empreinte SHA-1 ne correspond plus.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+import numpy as np
+from PIL import Image
+
+from utils.file_utils import list_images
+from utils.video_renderer import load_cover_image
+
+# Dossier de l'index (tableaux projetés en mémoire, miniatures et manifeste)
+TEMPLATE_INDEX_DIR = os.getenv("TEMPLATE_INDEX_DIR", os.path.join(".cache", "templates"))
+# Largeur des miniatures affichées dans l'interface
+THUMBNAIL_WIDTH = 256
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def _file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class TemplateIndex:
+    """
+    Index des images modèles d'un dossier, pré-décodées à chaque résolution de sortie.
+    """
+
+    def __init__(self, template_dir="Templates", index_dir=TEMPLATE_INDEX_DIR):
+        self.template_dir = template_dir
+        self.index_dir = index_dir
+        self._manifest_path = os.path.join(index_dir, "manifest.json")
+        self._lock = threading.Lock()
+        self._manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _save_manifest(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        # Plusieurs processus (rendus par lots) partagent l'index : les entrées écrites entre-temps
+        # par les autres sont fusionnées avant l'écriture, via un fichier temporaire propre au processus
+        for key, entry in self._load_manifest().items():
+            ours = self._manifest.get(key)
+            if ours is None:
+                self._manifest[key] = entry
+            elif ours["sha1"] == entry["sha1"]:
+                ours["frames"] = {**entry.get("frames", {}), **ours["frames"]}
+                ours["thumbnail"] = ours.get("thumbnail") or entry.get("thumbnail")
+        tmp_path = f"{self._manifest_path}.{os.getpid()}.{uuid.uuid4().hex}.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _entry(self, path):
+        """Retourne l'entrée à jour d'une image (invalidée si son contenu a changé)."""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self._manifest.get(key)
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            return entry
+
+        # Date ou taille modifiée : l'empreinte décide si les données dérivées restent valides
+        sha1 = _file_sha1(path)
+        if entry and entry["sha1"] == sha1:
+            entry["mtime"], entry["size"] = stat.st_mtime, stat.st_size
+        else:
+            entry = {"mtime": stat.st_mtime, "size": stat.st_size, "sha1": sha1, "frames": {}, "thumbnail": None}
+        self._manifest[key] = entry
+        self._save_manifest()
+        return entry
+
+    def frame_source(self, path, size):
+        """
+        Retourne le tableau RGB pré-recadré d'une image pour une résolution, projeté en mémoire.
+
+        Args:
+            path (str): Chemin de l'image modèle.
+            size (tuple): Résolution de sortie (largeur, hauteur).
+
+        Returns:
+            numpy.memmap: Tableau (hauteur, largeur, 3) en lecture seule, marge de zoom comprise.
+        """
+        with self._lock:
+            entry = self._entry(path)
+            name = f"{size[0]}x{size[1]}"
+            array_path = entry["frames"].get(name)
+            if not array_path or not os.path.exists(array_path):
+                os.makedirs(self.index_dir, exist_ok=True)
+                array_path = os.path.join(self.index_dir, f"{entry['sha1']}_{name}.npy")
+                if not os.path.exists(array_path):
+                    # Écriture dans un fichier temporaire : un autre processus peut préparer la même image
+                    tmp_path = f"{array_path}.{os.getpid()}.{uuid.uuid4().hex}.part"
+                    image = np.asarray(load_cover_image(path, size))
+                    array = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=image.shape)
+                    array[:] = image
+                    array.flush()
+                    del array
+                    os.replace(tmp_path, array_path)
+                entry["frames"][name] = array_path
+                self._save_manifest()
+        return np.load(array_path, mmap_mode="r")
+
+    def cover_image(self, path, size):
+        """
+        Retourne l'image pré-recadrée sous forme d'image PIL.
+
+        Le JPEG n'est ni décodé ni redimensionné, mais PIL stocke le RGB sur 4 octets par pixel :
+        les pixels du tableau projeté sont copiés à chaque appel.
+
+        Args:
+            path (str): Chemin de l'image modèle.
+            size (tuple): Résolution de sortie (largeur, hauteur).
+
+        Returns:
+            PIL.Image.Image: Image RGB utilisable par le moteur de rendu.
+        """
+        return Image.fromarray(self.frame_source(path, size))
+
+    def load_base(self, path, size):
+        """
+        Source d'images du moteur de rendu : index pour les modèles, chargement direct pour les autres images.
+
+        Args:
+            path (str): Chemin de l'image.
+            size (tuple): Résolution de sortie (largeur, hauteur).
+
+        Returns:
+            PIL.Image.Image: Image RGB pré-recadrée.
+        """
+        if self.contains(path):
+            return self.cover_image(path, size)
+        return load_cover_image(path, size)
+
+    def thumbnail(self, path):
+        """
+        Retourne le chemin de la miniature JPEG d'une image (générée au premier appel).
+
+        Args:
+            path (str): Chemin de l'image modèle.
+
+        Returns:
+            str: Chemin de la miniature.
+        """
+        with self._lock:
+            entry = self._entry(path)
+            thumbnail_path = entry.get("thumbnail")
+            if not thumbnail_path or not os.path.exists(thumbnail_path):
+                os.makedirs(self.index_dir, exist_ok=True)
+                thumbnail_path = os.path.join(self.index_dir, f"{entry['sha1']}_thumb.jpg")
+                tmp_path = f"{thumbnail_path}.{os.getpid()}.{uuid.uuid4().hex}.part"
+                with Image.open(path) as img:
+                    img = img.convert("RGB")
+                    img.thumbnail((THUMBNAIL_WIDTH, THUMBNAIL_WIDTH * 4))
+                    img.save(tmp_path, "JPEG", quality=85)
+                os.replace(tmp_path, thumbnail_path)
+                entry["thumbnail"] = thumbnail_path
+                self._save_manifest()
+        return thumbnail_path
+
+    def thumbnails(self):
+        """Retourne les miniatures de toutes les images du dossier, dans l'ordre des fichiers."""
+        return [self.thumbnail(path) for path in list_images(self.template_dir)]
+
+    def contains(self, path):
+        """Indique si une image appartient au dossier indexé."""
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.template_dir)
+
+    def build(self, sizes):
+        """
+        Précalcule les tableaux et miniatures de toutes les images pour les résolutions données.
+
+        Args:
+            sizes (list): Résolutions (largeur, hauteur) à préparer.
+        """
+        for path in list_images(self.template_dir):
+            self.thumbnail(path)
+            for size in sizes:
+                self.frame_source(path, size)
+
+def get_template_index(template_dir="Templates"):
+    """
+    Retourne l'index partagé d'un dossier de modèles.
+
+    Args:
+        template_dir (str, optional): Dossier des images modèles. Par défaut: "Templates".
+
+    Returns:
+        TemplateIndex: L'index du dossier.
+    """
+    with _indexes_lock:
+        if template_dir not in _indexes:
+            _indexes[template_dir] = TemplateIndex(template_dir)
+        return _indexes[template_dir]
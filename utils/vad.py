@@ -0,0 +1,164 @@
+"""
+Ce module détecte la parole par l'énergie du signal (NumPy uniquement) et découpe un audio
+en morceaux transcriptibles indépendamment, sans les silences.
+
+Le seuil de parole s'adapte au niveau de bruit de l'enregistrement : il est placé quelques
+décibels au-dessus du bruit de fond estimé, sans descendre sous un plancher absolu.
+"""
+
+import os
+
+import numpy as np
+
+# Durée d'une trame d'analyse (en millisecondes)
+VAD_FRAME_MS = 30
+# Marge au-dessus du bruit de fond pour considérer une trame comme parlée (en dB)
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "10"))
+# Plancher absolu du seuil (en dBFS) : en dessous, une trame est toujours silencieuse
+VAD_FLOOR_DB = float(os.getenv("VAD_FLOOR_DB", "-50"))
+# Un silence plus court que cette durée est conservé dans la parole (pauses entre mots)
+VAD_MIN_SILENCE_MS = int(os.getenv("VAD_MIN_SILENCE_MS", "500"))
+# Une zone de parole plus courte que cette durée est ignorée (clics, respirations)
+VAD_MIN_SPEECH_MS = 200
+# Marge conservée autour de chaque zone de parole
+VAD_PAD_MS = 200
+
+def frame_energy_db(audio, sample_rate, frame_ms=VAD_FRAME_MS):
+    """
+    Calcule l'énergie de chaque trame en dBFS.
+
+    Args:
+        audio (numpy.ndarray): Signal mono en float32 (entre -1 et 1).
+        sample_rate (int): Fréquence d'échantillonnage.
+        frame_ms (int, optional): Durée d'une trame en millisecondes.
+
+    Returns:
+        tuple: (énergies en dB par trame, taille d'une trame en échantillons).
+    """
+    frame = max(1, sample_rate * frame_ms // 1000)
+    count = len(audio) // frame
+    if count == 0:
+        return np.empty(0, dtype=np.float32), frame
+    frames = audio[:count * frame].reshape(count, frame).astype(np.float32)
+    power = np.square(frames).mean(axis=1)
+    return 10 * np.log10(power + 1e-10), frame
+
+def _runs(mask):
+    """Retourne les intervalles [début, fin) des suites de True d'un masque booléen."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+def detect_speech(audio, sample_rate, margin_db=VAD_MARGIN_DB, floor_db=VAD_FLOOR_DB,
+                  min_silence_ms=VAD_MIN_SILENCE_MS, min_speech_ms=VAD_MIN_SPEECH_MS, pad_ms=VAD_PAD_MS):
+    """
+    Détecte les zones de parole d'un signal.
+
+    Args:
+        audio (numpy.ndarray): Signal mono en float32.
+        sample_rate (int): Fréquence d'échantillonnage.
+        margin_db (float, optional): Marge au-dessus du bruit de fond (en dB).
+        floor_db (float, optional): Plancher absolu du seuil (en dBFS).
+        min_silence_ms (int, optional): Silence minimal séparant deux zones de parole.
+        min_speech_ms (int, optional): Durée minimale d'une zone de parole.
+        pad_ms (int, optional): Marge ajoutée autour de chaque zone.
+
+    Returns:
+        list: Zones de parole (début, fin) en échantillons, triées et disjointes.
+    """
+    energy, frame = frame_energy_db(audio, sample_rate)
+    if not len(energy):
+        return []
+
+    # Bruit de fond : trames les plus calmes ; le seuil ne dépasse pas le niveau des passages forts
+    noise, loud = np.percentile(energy, [10, 95])
+    threshold = max(floor_db, min(noise + margin_db, loud - margin_db))
+    mask = energy > threshold
+
+    frame_ms = 1000 * frame / sample_rate
+    # Les pauses courtes restent dans la parole
+    for start, end in _runs(~mask):
+        if start > 0 and end < len(mask) and (end - start) * frame_ms < min_silence_ms:
+            mask[start:end] = True
+
+    pad = int(pad_ms * sample_rate / 1000)
+    regions = []
+    for start, end in _runs(mask):
+        if (end - start) * frame_ms < min_speech_ms:
+            continue
+        start, end = max(0, int(start) * frame - pad), min(len(audio), int(end) * frame + pad)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+def _split_region(audio, start, end, max_samples, sample_rate):
+    """Découpe une zone de parole trop longue sur les trames les plus calmes proches de chaque limite."""
+    parts = []
+    while end - start > max_samples:
+        # Recherche de la trame la plus calme dans les deux dernières secondes autorisées
+        search_start = start + max(max_samples - 2 * sample_rate, max_samples // 2)
+        energy, frame = frame_energy_db(audio[search_start:start + max_samples], sample_rate)
+        cut = search_start + int(np.argmin(energy)) * frame + frame // 2 if len(energy) else start + max_samples
+        parts.append((start, cut))
+        start = cut
+    parts.append((start, end))
+    return parts
+
+def speech_chunks(audio, sample_rate, max_chunk_seconds=30.0, regions=None):
+    """
+    Regroupe les zones de parole en morceaux d'au plus max_chunk_seconds secondes de parole.
+
+    Les silences entre zones ne sont pas inclus : un morceau est une liste de zones
+    (« pièces ») mises bout à bout au moment de la transcription.
+
+    Args:
+        audio (numpy.ndarray): Signal mono en float32.
+        sample_rate (int): Fréquence d'échantillonnage.
+        max_chunk_seconds (float, optional): Durée maximale de parole par morceau. Par défaut: 30.
+        regions (list, optional): Zones de parole déjà détectées. Détectées avec detect_speech si None.
+
+    Returns:
+        list: Morceaux, chacun étant une liste de pièces (début, fin) en échantillons.
+    """
+    if regions is None:
+        regions = detect_speech(audio, sample_rate)
+    max_samples = int(max_chunk_seconds * sample_rate)
+
+    chunks = []
+    current, length = [], 0
+    for start, end in regions:
+        for piece in _split_region(audio, start, end, max_samples, sample_rate):
+            size = piece[1] - piece[0]
+            if current and length + size > max_samples:
+                chunks.append(current)
+                current, length = [], 0
+            current.append(piece)
+            length += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+def chunk_audio(audio, pieces):
+    """Assemble le signal d'un morceau (pièces mises bout à bout)."""
+    return np.concatenate([audio[start:end] for start, end in pieces])
+
+def chunk_time_to_global(seconds, pieces, sample_rate):
+    """
+    Convertit un instant relatif au signal d'un morceau en instant de l'audio complet.
+
+    Args:
+        seconds (float): Instant dans le morceau (en secondes).
+        pieces (list): Pièces (début, fin) du morceau, en échantillons.
+        sample_rate (int): Fréquence d'échantillonnage.
+
+    Returns:
+        float: Instant dans l'audio complet (en secondes).
+    """
+    position = seconds * sample_rate
+    for start, end in pieces:
+        if position <= end - start:
+            return (start + position) / sample_rate
+        position -= end - start
+    # Au-delà de la dernière pièce (arrondis du décodeur) : fin du morceau
+    return pieces[-1][1] / sample_rate
@@ -0,0 +1,214 @@
+"""
+Ce module contient le moteur de rendu vidéo : les images sont animées (zoom/panoramique),
+enchaînées par fondus et envoyées image par image, sous forme de tampons NumPy,
+directement dans l'entrée standard d'un processus ffmpeg.
+
+Aucune image intermédiaire n'est écrite sur disque et seules les deux images source
+utilisées par la trame courante sont gardées en mémoire : la consommation mémoire est
+constante quelle que soit la durée ou la résolution.
+"""
+
+import math
+import shutil
+import subprocess
+
+import numpy as np
+from PIL import Image
+
+from utils.filtergraph import DEFAULT_ENCODER_PRESET, compile_render_command, print_dry_run
+
+# Résolutions de sortie pour chaque ratio proposé dans l'onglet Style
+RATIO_RESOLUTIONS = {
+    "16:9": (1280, 720),
+    "9:16": (720, 1280),
+    "1:1": (720, 720),
+    "4:5": (720, 900),
+}
+
+# Paramètres par défaut de l'animation
+DEFAULT_FPS = 30
+MAX_ZOOM = 1.12  # Zoom maximal appliqué pendant l'effet Ken Burns
+CROSSFADE_SECONDS = 0.6  # Durée des fondus enchaînés entre deux images
+
+def resolution_for_ratio(ratio_label):
+    """
+    Convertit un libellé de ratio (par exemple "9:16 (Stories/Shorts)") en résolution.
+
+    Args:
+        ratio_label (str): Libellé du ratio tel qu'affiché dans l'onglet Style.
+
+    Returns:
+        tuple: (largeur, hauteur) en pixels.
+    """
+    ratio = (ratio_label or "9:16").split(" ")[0]
+    return RATIO_RESOLUTIONS.get(ratio, RATIO_RESOLUTIONS["9:16"])
+
+def load_cover_image(path, size):
+    """
+    Charge une image et la redimensionne pour couvrir la zone de sortie agrandie du zoom maximal.
+
+    Args:
+        path (str): Chemin de l'image source.
+        size (tuple): Résolution de sortie (largeur, hauteur).
+
+    Returns:
+        PIL.Image.Image: Image RGB recadrée au ratio de sortie.
+    """
+    width, height = size
+    target_w, target_h = math.ceil(width * MAX_ZOOM), math.ceil(height * MAX_ZOOM)
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        scale = max(target_w / img.width, target_h / img.height)
+        resized = img.resize((math.ceil(img.width * scale), math.ceil(img.height * scale)), Image.LANCZOS)
+    left = (resized.width - target_w) // 2
+    top = (resized.height - target_h) // 2
+    return resized.crop((left, top, left + target_w, top + target_h))
+
+def _ken_burns_frame(base, size, index, progress):
+    """
+    Calcule une trame de l'effet zoom/panoramique pour une image.
+
+    Args:
+        base (PIL.Image.Image): Image préparée par load_cover_image.
+        size (tuple): Résolution de sortie (largeur, hauteur).
+        index (int): Position de l'image dans la séquence (alterne zoom avant/arrière et sens du panoramique).
+        progress (float): Avancement de l'animation entre 0 et 1.
+
+    Returns:
+        numpy.ndarray: Trame RGB (hauteur, largeur, 3) en uint8.
+    """
+    progress = min(max(progress, 0.0), 1.0)
+    # Zoom avant sur les images paires, arrière sur les impaires
+    zoom = 1.0 + (MAX_ZOOM - 1.0) * (progress if index % 2 == 0 else 1.0 - progress)
+    crop_w = base.width / zoom
+    crop_h = base.height / zoom
+
+    # Panoramique horizontal de gauche à droite (ou l'inverse) dans la marge disponible
+    direction = 1 if index % 4 < 2 else -1
+    pan = progress if direction > 0 else 1.0 - progress
+    left = (base.width - crop_w) * pan
+    top = (base.height - crop_h) / 2
+
+    # Recadrage et redimensionnement en une seule opération (boîte sub-pixel pour un mouvement fluide)
+    frame = base.resize(size, Image.BILINEAR, box=(left, top, left + crop_w, top + crop_h))
+    return np.asarray(frame)
+
+def iter_frames(image_paths, size, duration, fps=DEFAULT_FPS, start_frame=0, end_frame=None, load_base=load_cover_image):
+    """
+    Générateur des trames de la vidéo.
+
+    Chaque image occupe une part égale de la durée totale, avec un fondu enchaîné vers la suivante.
+
+    Args:
+        image_paths (list): Chemins des images à animer.
+        size (tuple): Résolution de sortie (largeur, hauteur).
+        duration (float): Durée totale en secondes.
+        fps (int, optional): Images par seconde. Par défaut: 30.
+        start_frame (int, optional): Première trame à produire. Par défaut: 0.
+        end_frame (int, optional): Trame de fin (exclue). Par défaut: la dernière trame.
+        load_base (callable, optional): Fonction (chemin, résolution) -> image préparée. Par défaut: load_cover_image.
+
+    Yields:
+        numpy.ndarray: Trame RGB (hauteur, largeur, 3) en uint8.
+    """
+    count = len(image_paths)
+    total_frames = int(round(duration * fps))
+    end_frame = total_frames if end_frame is None else min(end_frame, total_frames)
+    slot = duration / count
+    xfade = min(CROSSFADE_SECONDS, slot / 2)
+
+    # Cache de deux images préparées au maximum (l'image courante et la suivante pendant le fondu)
+    bases = {}
+
+    def base_for(i):
+        if i not in bases:
+            for old in [k for k in bases if k < i - 1 or k > i + 1]:
+                del bases[old]
+            bases[i] = load_base(image_paths[i], size)
+        return bases[i]
+
+    def frame_for(i, t):
+        # Avancement étendu pour que le mouvement commence pendant le fondu d'entrée
+        progress = (t - (i * slot - xfade)) / (slot + xfade)
+        return _ken_burns_frame(base_for(i), size, i, progress)
+
+    for n in range(start_frame, end_frame):
+        t = n / fps
+        i = min(int(t / slot), count - 1)
+        frame = frame_for(i, t)
+
+        fade_start = (i + 1) * slot - xfade
+        if i < count - 1 and t >= fade_start:
+            # Fondu enchaîné en arithmétique entière (poids sur 256) pour éviter les tampons flottants
+            weight = int(256 * (t - fade_start) / xfade)
+            following = frame_for(i + 1, t)
+            frame = ((frame.astype(np.uint16) * (256 - weight) + following.astype(np.uint16) * weight) >> 8).astype(np.uint8)
+
+        yield frame
+
+def render_video(image_paths, output_path, size, duration, fps=DEFAULT_FPS, audio_path=None, load_base=load_cover_image, captions=None,
+                 overlay=None, subtitles_path=None, encoder_preset=DEFAULT_ENCODER_PRESET, dry_run=False,
+                 start_frame=0, end_frame=None):
+    """
+    Rend une vidéo en envoyant les trames générées directement à ffmpeg.
+
+    Les effets appliqués par ffmpeg (overlay, sous-titres animés) sont compilés
+    en un seul graphe de filtres (voir utils/filtergraph.py) : une seule passe d'encodage.
+
+    Args:
+        image_paths (list): Chemins des images à animer.
+        output_path (str): Chemin du fichier MP4 de sortie.
+        size (tuple): Résolution de sortie (largeur, hauteur).
+        duration (float): Durée en secondes.
+        fps (int, optional): Images par seconde. Par défaut: 30.
+        audio_path (str, optional): Piste audio à multiplexer (voix off ou mixage voix/musique).
+        load_base (callable, optional): Source des images préparées (par exemple TemplateIndex.load_base).
+        captions (CaptionCompositor, optional): Sous-titres à incruster (voir utils/caption_compositor.py).
+        overlay (dict, optional): Logo ou filigrane (voir filtergraph.overlay_settings).
+        subtitles_path (str, optional): Sous-titres rendus par libass (sous-titres animés ASS).
+        encoder_preset (str, optional): Réglage de l'encodeur ("Rapide", "Équilibré", "Compact").
+        dry_run (bool, optional): Affiche le graphe de filtres et la commande sans rien rendre. Par défaut: False.
+        start_frame (int, optional): Première trame rendue (rendu d'un segment). Par défaut: 0.
+        end_frame (int, optional): Trame de fin (exclue). Par défaut: la dernière trame.
+
+    Returns:
+        str: Chemin du fichier vidéo produit (None en dry-run).
+
+    Raises:
+        RuntimeError: Si ffmpeg est introuvable ou échoue.
+    """
+    if not image_paths:
+        raise ValueError("Aucune image à animer")
+
+    total_frames = int(round(duration * fps))
+    end_frame = total_frames if end_frame is None else min(end_frame, total_frames)
+    command, graph = compile_render_command(
+        output_path, size, fps, (end_frame - start_frame) / fps, audio_path=audio_path,
+        overlay=overlay, subtitles_path=subtitles_path, encoder_preset=encoder_preset, start_time=start_frame / fps
+    )
+    if dry_run:
+        print_dry_run(command, graph)
+        return None
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg est introuvable. Veuillez l'installer et l'ajouter au PATH")
+
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        frames = iter_frames(image_paths, size, duration, fps, start_frame, end_frame, load_base=load_base)
+        for index, frame in enumerate(frames, start=start_frame):
+            if captions is not None:
+                frame = captions.composite(frame, index)
+            # Écriture sans copie supplémentaire du tampon de la trame
+            process.stdin.write(np.ascontiguousarray(frame).data)
+        process.stdin.close()
+    except BrokenPipeError:
+        # ffmpeg s'est arrêté prématurément : l'erreur est remontée ci-dessous via son code de retour
+        pass
+    except Exception:
+        process.kill()
+        process.wait()
+        raise
+    stderr = process.stderr.read().decode("utf-8", errors="replace")
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg a échoué : {stderr.strip()}")
+    return output_path